@@ -0,0 +1,61 @@
+"""Per frame cost of contour shape filtering done by LPDetectionProcess, one contour at a time and in a batch.
+Run from the project directory: python Benchmarks/ContourFiltering.py"""
+import os
+import sys
+import time
+import numpy as np
+import cv2
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [PROJECT_DIR, os.path.join(PROJECT_DIR, 'LPRUtil')]
+import LPRUtil.LPImage as LPRui
+import LPRUtil.Contour as LPRuc
+from LPDetectionProcess import LPDetectionProcess
+
+EXAMPLE_IMAGES_DIR = os.path.join(PROJECT_DIR, '..', '..', 'example_images', 'LPRV1')
+PROPORTIONS = [4.6, 2.0]  # Long single row and two row Polish license plates
+PROPORTIONS_SIGMA = 0.8
+MAX_PAR_ANGLE = 0.1
+MAX_PERP_ANGLE = 0.4
+REPEATS = 50
+
+
+def get_frames():
+    return [cv2.imread(os.path.join(EXAMPLE_IMAGES_DIR, name)) for name in sorted(os.listdir(EXAMPLE_IMAGES_DIR))
+            if name.endswith('_frame.png')]
+
+
+def check_random_quads(detector, n=20000, seed=0):
+    """Batch shape check has to accept exactly the same contours as the one by one check."""
+    rng = np.random.default_rng(seed)
+    corners = np.array([[0, 0], [0, 1], [1, 0], [1, 1]]) * rng.integers(5, 200, (n, 1, 2))
+    quads = (corners + rng.integers(-8, 9, (n, 4, 2))).astype(np.int32)
+    quads = quads[:, rng.permutation(4), :]
+    is_lp = LPRuc.check_contours_lp_shape(quads.copy(), PROPORTIONS, PROPORTIONS_SIGMA, MAX_PAR_ANGLE, MAX_PERP_ANGLE)
+    is_lp_one_by_one = np.array([detector.check_lp_shape(quad.reshape((4, 1, 2)).copy()) for quad in quads])
+    assert np.array_equal(is_lp, is_lp_one_by_one), 'Batch and one by one shape checks differ'
+    return int(np.sum(is_lp))
+
+
+def time_per_call(function, argument):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = function(argument)
+    return (time.perf_counter() - start) / REPEATS, result
+
+
+def main():
+    detector = LPDetectionProcess(None, None, PROPORTIONS, PROPORTIONS_SIGMA, MAX_PAR_ANGLE, MAX_PERP_ANGLE)
+    print('Random quads accepted by both checks:', check_random_quads(detector))
+    print('frame  contours  one by one [ms]  batch [ms]  speedup')
+    for i, frame in enumerate(get_frames()):
+        contours = LPRuc.get_contours(LPRui.binarize(frame))
+        one_by_one_time, one_by_one_boxes = time_per_call(detector.find_lp_in_contours_one_by_one, contours)
+        batch_time, batch_boxes = time_per_call(detector.find_lp_in_contours, contours)
+        assert one_by_one_boxes == batch_boxes, 'Accepted boxes differ on frame %d' % i
+        print('%5d  %8d  %15.3f  %10.3f  %7.2f' % (i, len(contours), one_by_one_time * 1000, batch_time * 1000,
+                                                   one_by_one_time / batch_time))
+
+
+if __name__ == '__main__':
+    main()
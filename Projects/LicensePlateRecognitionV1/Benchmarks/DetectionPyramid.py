@@ -0,0 +1,89 @@
+"""Recall, false positives and speed of license plate search on pyramid levels of a frame, checked against the ground
+truth of synthetic frames (see SyntheticPlates.py). Levels whose recall is below the full resolution search's recall
+are rejected, and the highest level that is not is compared with LPDetectionProcess.MAX_PYRAMID_LEVEL.
+Run from the project directory: python Benchmarks/DetectionPyramid.py"""
+import os
+import sys
+import time
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [PROJECT_DIR, os.path.join(PROJECT_DIR, 'LPRUtil'), os.path.dirname(os.path.abspath(__file__))]
+import LPRUtil.Rect as LPRur
+import LPRUtil.RectArray as LPRura
+from LPDetectionProcess import LPDetectionProcess
+import SyntheticPlates
+
+PROPORTIONS = [4.6, 2.0]  # Long single row and two row Polish license plates
+PROPORTIONS_SIGMA = 0.8
+MAX_PAR_ANGLE = 0.1
+MAX_PERP_ANGLE = 0.4
+PYRAMID_LEVELS = [0, 1, 2]
+MIN_IOU = 0.5  # Found box matches a ground truth box if their IoU is at least this
+# Frame size and plate heights of every workload, small plates are the first to be lost on downscaled frames
+WORKLOADS = [(1280, 720, (40, 70)), (1920, 1080, (60, 100)), (1920, 1080, (30, 50))]
+N_FRAMES = 20
+N_PLATES = 3
+
+
+def get_detector(level):
+    detector = LPDetectionProcess(None, None, PROPORTIONS, PROPORTIONS_SIGMA, MAX_PAR_ANGLE, MAX_PERP_ANGLE)
+    detector.pyramid_level = level  # Set after creation, levels above MAX_PYRAMID_LEVEL are what is checked
+    return detector
+
+
+def detect(detector, frame):
+    start = time.perf_counter()
+    boxes = LPRur.merge_overlapping_rects(detector.find_lp_in_frame(frame))
+    return time.perf_counter() - start, boxes
+
+
+def count_matches(true_boxes, boxes):
+    """Get the number of ground truth boxes that were found and the number of found boxes that match none of them."""
+    if len(true_boxes) == 0 or len(boxes) == 0:
+        return 0, len(boxes)
+    ious = LPRura.rects_iou_matrix(true_boxes, boxes)
+    return int(np.sum(np.max(ious, axis=1) >= MIN_IOU)), int(np.sum(np.max(ious, axis=0) < MIN_IOU))
+
+
+def main():
+    detectors = [get_detector(level) for level in PYRAMID_LEVELS]
+    times, matched, false_positives = (np.zeros(len(PYRAMID_LEVELS)) for _ in range(3))
+    n_true = 0
+    print('resolution  plate heights  level  time [ms]  recall  false positives')
+    for width, height, plate_heights in WORKLOADS:
+        frames = [SyntheticPlates.generate_frame(width, height, N_PLATES, plate_heights, seed=i)
+                  for i in range(N_FRAMES)]
+        workload_true = sum(len(true_boxes) for _, true_boxes, _ in frames)
+        n_true += workload_true
+        for j, detector in enumerate(detectors):
+            workload_time, workload_matched, workload_false_positives = 0.0, 0, 0
+            for frame, true_boxes, _ in frames:
+                frame_time, boxes = detect(detector, frame)
+                frame_matched, frame_false_positives = count_matches(true_boxes, boxes)
+                workload_time += frame_time
+                workload_matched += frame_matched
+                workload_false_positives += frame_false_positives
+            times[j] += workload_time
+            matched[j] += workload_matched
+            false_positives[j] += workload_false_positives
+            print('%10s  %13s  %5d  %9.2f  %6.2f  %15d' % ('%dx%d' % (width, height), '%d-%d' % plate_heights,
+                                                          PYRAMID_LEVELS[j], workload_time / N_FRAMES * 1000,
+                                                          workload_matched / workload_true, workload_false_positives))
+    recalls = matched / n_true
+    print('level  speedup  recall  false positives')
+    max_level = 0
+    for j, level in enumerate(PYRAMID_LEVELS):
+        rejected = recalls[j] < recalls[0]
+        if not rejected and level == max_level + 1:
+            max_level = level
+        print('%5d  %7.2f  %6.2f  %15d%s' % (level, times[0] / times[j], recalls[j], false_positives[j],
+                                            '  rejected, recall below level 0' if rejected else ''))
+    print('Highest level with level 0 recall: %d, LPDetectionProcess.MAX_PYRAMID_LEVEL: %d'
+          % (max_level, LPDetectionProcess.MAX_PYRAMID_LEVEL))
+    if max_level < LPDetectionProcess.MAX_PYRAMID_LEVEL:
+        sys.exit('LPDetectionProcess.MAX_PYRAMID_LEVEL allows levels with recall below level 0')
+
+
+if __name__ == '__main__':
+    main()
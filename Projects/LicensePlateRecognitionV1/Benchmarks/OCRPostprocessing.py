@@ -0,0 +1,81 @@
+"""Throughput of OCR output post-processing, the former regex implementation of process_ocr_result compared to
+compiled plate format rules for single lp numbers and for batches. Outputs of both must be exactly the same.
+Run from the project directory: python Benchmarks/OCRPostprocessing.py [N_OUTPUTS]"""
+import os
+import re
+import sys
+import time
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [PROJECT_DIR, os.path.join(PROJECT_DIR, 'LPRUtil')]
+import LPRUtil.OCR as LPRuo
+
+BATCH_SIZES = (1, 8, 64, 512)
+REPEATS = 5
+
+
+def digit_to_letter(match_obj):
+    return {'0': 'O', '1': 'I', '2': 'Z', '5': 'S', '7': 'Z', '8': 'B'}.get(match_obj.group(0), match_obj.group(0))
+
+
+def letter_to_digit(match_obj):
+    return {'B': '8', 'D': '0', 'I': '1', 'O': '0', 'Z': '2'}.get(match_obj.group(0), match_obj.group(0))
+
+
+def process_ocr_result_regex(ocr_result):
+    """process_ocr_result before plate formats, Polish rules written as regular expressions."""
+    ocr_result = re.sub(r'[^A-Z0-9 ]', '', ocr_result)
+    ocr_result = re.sub(r'^I1', '', ocr_result)
+    ocr_result = re.sub(r'(?:(?<=^)|(?<=^.))\d', digit_to_letter, ocr_result)
+    ocr_result = re.sub(r'(?:(?<=...)|(?<=....)|(?<=.....)|(?<=......)|(?<=.......))[BDIOZ]',
+                        letter_to_digit, ocr_result)
+    ocr_result = re.sub(r' ', '', ocr_result)
+    return ocr_result
+
+
+def get_ocr_outputs(rng, n):
+    """OCR outputs like Tesseract's: plate characters with spaces, noise, lowercase letters, line breaks and
+    non-ASCII characters, some starting with I1."""
+    chars = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789' * 4 + 'BDIOZ0125785  .-|\n\tabcÄé'))
+    ocr_outputs = [''.join(rng.choice(chars, int(rng.integers(0, 13)))) for _ in range(n)]
+    return [('I1' if rng.random() < 0.1 else '') + ocr_output for ocr_output in ocr_outputs]
+
+
+def time_function(function, ocr_outputs, batch_size):
+    batches = [ocr_outputs[i:i + batch_size] for i in range(0, len(ocr_outputs), batch_size)]
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for batch in batches:
+            function(batch)
+        times.append(time.perf_counter() - start)
+    return len(ocr_outputs) / min(times)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = np.random.default_rng(0)
+    ocr_outputs = get_ocr_outputs(rng, n)
+    expected = [process_ocr_result_regex(ocr_output) for ocr_output in ocr_outputs]
+    single = [LPRuo.process_ocr_result(ocr_output) for ocr_output in ocr_outputs]
+    mismatches = sum(a != b for a, b in zip(expected, single))
+    print('Single mismatches: %d of %d' % (mismatches, n))
+    for batch_size in BATCH_SIZES:
+        batches = [ocr_outputs[i:i + batch_size] for i in range(0, n, batch_size)]
+        batched = [lp_number for batch in batches for lp_number in LPRuo.process_ocr_results(batch)]
+        print('Batch of %3d mismatches: %d of %d' % (batch_size, sum(a != b for a, b in zip(expected, batched)), n))
+    print('\n%-24s %10s %14s %14s' % ('Batch size', 'Regex', 'Single', 'Batch'))
+    for batch_size in BATCH_SIZES:
+        regex_throughput = time_function(lambda batch: [process_ocr_result_regex(o) for o in batch], ocr_outputs,
+                                         batch_size)
+        single_throughput = time_function(lambda batch: [LPRuo.process_ocr_result(o) for o in batch], ocr_outputs,
+                                          batch_size)
+        batch_throughput = time_function(LPRuo.process_ocr_results, ocr_outputs, batch_size)
+        print('%-24d %8.0f/s %8.0f/s %4.1fx %8.0f/s %4.1fx' % (
+            batch_size, regex_throughput, single_throughput, single_throughput / regex_throughput, batch_throughput,
+            batch_throughput / regex_throughput))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Speed of license plate preprocessing for OCR, prepare_lp_for_ocr compared to prepare_lp_for_ocr_fast, and agreement
+of their results. If Tesseract is installed, OCR results of both are compared as well.
+Run from the project directory: python Benchmarks/OCRPreprocessing.py"""
+import os
+import sys
+import time
+import numpy as np
+import cv2
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [PROJECT_DIR, os.path.join(PROJECT_DIR, 'LPRUtil')]
+import LPRUtil.LPImage as LPRui
+import LPRUtil.OCR as LPRuo
+
+EXAMPLE_IMAGES_DIR = os.path.join(PROJECT_DIR, '..', '..', 'example_images', 'LPRV1')
+OCR_PARAMS = (44, 3, 8, 4, 6)  # Default parameters of execute_ocr
+REPEATS = 50
+
+
+def get_lp_images():
+    return [(name, cv2.imread(os.path.join(EXAMPLE_IMAGES_DIR, name)))
+            for name in sorted(os.listdir(EXAMPLE_IMAGES_DIR)) if '_lp' in name]
+
+
+def get_ocr_model():
+    try:
+        from OCRModel.PyTesseract import PyTesseract
+        return PyTesseract()
+    except Exception:  # OCR is optional, only preprocessing is compared without it
+        return None
+
+
+def time_per_call(prepare, lp_image):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = prepare(lp_image, *OCR_PARAMS)
+    return (time.perf_counter() - start) / REPEATS, result
+
+
+def get_agreement(image1, image2):
+    """Fraction of pixels with the same colour, after resizing image2 to the size of image1."""
+    if image1 is None or image2 is None:
+        return float(image1 is None and image2 is None)
+    image2 = cv2.resize(image2, (image1.shape[1], image1.shape[0]), interpolation=cv2.INTER_NEAREST)
+    return float(np.mean((image1 < 128) == (image2 < 128)))
+
+
+def main():
+    ocr_model = get_ocr_model()
+    print('license plate  size     time [ms]  fast time [ms]  speedup  agreement' +
+          ('  ocr  fast ocr' if ocr_model is not None else ''))
+    total_time, total_fast_time, ocr_matched = 0, 0, 0
+    lp_images = get_lp_images()
+    for name, lp_image in lp_images:
+        lp_time, prepared = time_per_call(LPRui.prepare_lp_for_ocr, lp_image)
+        fast_time, fast_prepared = time_per_call(LPRui.prepare_lp_for_ocr_fast, lp_image)
+        total_time += lp_time
+        total_fast_time += fast_time
+        line = '%13s  %7s  %9.2f  %14.2f  %7.2f  %9.3f' % (name, '%dx%d' % (lp_image.shape[1], lp_image.shape[0]),
+                                                          lp_time * 1000, fast_time * 1000, lp_time / fast_time,
+                                                          get_agreement(prepared, fast_prepared))
+        if ocr_model is not None:
+            lp_numbers = [LPRuo.process_ocr_result(ocr_model.run(image)) if image is not None else ''
+                          for image in (prepared, fast_prepared)]
+            ocr_matched += lp_numbers[0] == lp_numbers[1]
+            line += '  %s  %s' % tuple(lp_numbers)
+        print(line)
+    print('total time [ms]: %.2f, fast: %.2f, speedup: %.2f' % (total_time * 1000, total_fast_time * 1000,
+                                                               total_time / total_fast_time))
+    if ocr_model is not None:
+        print('same OCR results: %d/%d' % (ocr_matched, len(lp_images)))
+
+
+if __name__ == '__main__':
+    main()
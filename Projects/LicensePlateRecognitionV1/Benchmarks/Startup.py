@@ -0,0 +1,119 @@
+"""Startup time of subprocesses of every role: imports in a fresh interpreter, time from starting a process until it is
+ready for every start method, and time until OCR answers after its worker crashed, with and without a standby worker.
+OCR uses a simulated backend whose model takes SIMULATED_LOAD_SECONDS to load, unless a backend name is given. Crashes
+are always simulated. Forkserver preloads only modules, every OCR worker still loads its model, which standby workers
+do in advance.
+Run from the project directory: python Benchmarks/Startup.py [OCR_BACKEND]"""
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [PROJECT_DIR, os.path.join(PROJECT_DIR, 'LPRUtil')]
+from LPDetectionProcess import LPDetectionProcess
+from LPOCRPool import LPOCRPool
+from LPRecognition import PRELOAD_MODULES, start_forkserver
+from OCRModel.Backends import get_preload_modules
+from OCRModel.OCRModel import OCRModel
+
+ROLE_MODULES = {'main': 'LPRecognition', 'detection': 'LPDetectionProcess', 'tracker': 'LPTracker',
+                'ocr': 'LPOCRProcess'}
+HEAVY_MODULES = ('torch', 'easyocr', 'pandas', 'pytesseract')
+SIMULATED_LOAD_SECONDS = 2.0  # About the time EasyOCR takes to load its models on CPU
+REPEATS = 5
+IMPORT_CODE = '''import sys, time, json
+sys.path[:0] = %r
+start = time.perf_counter()
+import %s
+print(json.dumps([time.perf_counter() - start, [m for m in %r if m in sys.modules]]))'''
+
+
+class SimulatedOCRModel(OCRModel):
+    def __init__(self):
+        super().__init__()
+        time.sleep(SIMULATED_LOAD_SECONDS)
+
+    def run_batch(self, images):
+        """Black image crashes the process, like a crash of OCR backend."""
+        if any(np.max(image) == 0 for image in images):
+            os._exit(1)
+        return super().run_batch(images)
+
+
+def time_imports():
+    print('%-10s %-20s %10s  %s' % ('Role', 'Module', 'Import', 'Heavy modules'))
+    for role, module in ROLE_MODULES.items():
+        code = IMPORT_CODE % ([PROJECT_DIR, os.path.join(PROJECT_DIR, 'LPRUtil')], module, HEAVY_MODULES)
+        seconds, heavy_modules = json.loads(subprocess.check_output([sys.executable, '-c', code], cwd=PROJECT_DIR))
+        print('%-10s %-20s %8.0f ms  %s' % (role, module, seconds * 1000, ', '.join(heavy_modules) or '-'))
+
+
+def time_detection_process():
+    q_to, q_from = multiprocessing.Queue(), multiprocessing.Queue()
+    start = time.perf_counter()
+    process = LPDetectionProcess(q_to, q_from, [4.6, 2.0], 0.8, 0.1, 0.4)
+    process.start()
+    q_to.get(timeout=60)  # Status sent when the process is ready to take frames
+    seconds = time.perf_counter() - start
+    q_from.put({'frame': None, 'kill_process': True})
+    process.join(timeout=10)
+    return seconds
+
+
+def time_ocr_pool(ocr_backend):
+    start = time.perf_counter()
+    pool = LPOCRPool(1, 1, ocr_backend)
+    pool.start()
+    pool.wait_ready(timeout=120)
+    seconds = time.perf_counter() - start
+    pool.kill()
+    return seconds
+
+
+def time_startup(ocr_backend):
+    print('\n%-12s %-10s %12s %12s' % ('Start method', 'Role', 'First', 'Median'))
+    for start_method in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method(start_method, force=True)
+        if start_method == 'forkserver':
+            start_forkserver(PRELOAD_MODULES + get_preload_modules([ocr_backend]))
+        for role, time_process in (('detection', time_detection_process), ('ocr', lambda: time_ocr_pool(ocr_backend))):
+            times = [time_process() for _ in range(REPEATS if role == 'detection' else 2)]
+            print('%-12s %-10s %10.0f ms %10.0f ms' % (start_method, role, times[0] * 1000,
+                                                       np.median(times[1:]) * 1000))
+
+
+def time_ocr_failover(n_standby):
+    """Seconds from finding out that the only OCR worker crashed until OCR answers again."""
+    pool = LPOCRPool(1, 1, SimulatedOCRModel, n_standby=n_standby)
+    client = pool.get_client(0)
+    pool.start()
+    pool.wait_ready(timeout=120)
+    client.submit(0, 0, np.zeros((44, 200), dtype=np.uint8))
+    pool.workers[0].join()
+    start = time.perf_counter()
+    pool.replace_dead_workers()
+    client.submit(0, 0, np.full((44, 200), 255, dtype=np.uint8))
+    while len(client.receive()) == 0:
+        time.sleep(0.001)
+    seconds = time.perf_counter() - start
+    pool.kill()
+    return seconds
+
+
+def main():
+    ocr_backend = sys.argv[1] if len(sys.argv) > 1 else SimulatedOCRModel
+    time_imports()
+    time_startup(ocr_backend)
+    print('\n%-12s %10s %20s' % ('Start method', 'Standby', 'OCR failover'))
+    for start_method in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method(start_method, force=True)
+        for n_standby in (0, 1):
+            print('%-12s %10d %17.0f ms' % (start_method, n_standby, time_ocr_failover(n_standby) * 1000))
+
+
+if __name__ == '__main__':
+    main()
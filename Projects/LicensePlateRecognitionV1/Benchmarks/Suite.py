@@ -0,0 +1,353 @@
+"""Reproducible benchmarks of detection and OCR stages on synthetic frames (see SyntheticPlates.py) and frames per
+second of the detector loop with a stub OCR model. Results can be saved as JSON and compared with results of another
+commit, regressions above a threshold make the script exit with status 1. Results of a different workload (resolution,
+plates, seed, ...) are not compared and the script exits with status 2. Benchmarks run in several fresh processes and
+regressions are timed again before they are reported.
+Run from the project directory:
+python Benchmarks/Suite.py --output new.json [--compare old.json --threshold 0.25]"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import cv2
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [PROJECT_DIR, os.path.join(PROJECT_DIR, 'LPRUtil'), os.path.dirname(os.path.abspath(__file__))]
+import LPRUtil.Contour as LPRuc
+import LPRUtil.LPImage as LPRui
+import LPRUtil.OCR as LPRuo
+import LPRUtil.OCRMerge as LPRuom
+import LPRUtil.Rect as LPRur
+import LPRUtil.RectArray as LPRura
+from LPDetectionProcess import LPDetectionProcess
+from LPTracker import LPTracker
+from OCRModel.OCRModel import OCRModel
+import SyntheticPlates
+
+PROPORTIONS = [4.6, 2.0]  # Long single row and two row Polish license plates
+PROPORTIONS_SIGMA = 0.8
+MAX_PAR_ANGLE = 0.1
+MAX_PERP_ANGLE = 0.4
+MIN_LP_LENGTH = 7
+MAX_LP_LENGTH = 8
+MIN_IOU = 0.5  # Found box matches a rendered plate if their IoU is at least this
+OCR_PARAMS = (44, 3, 8, 4, 6)  # Default parameters of execute_ocr
+# Arguments which change inputs of benchmarks, results are comparable only if all of them are equal
+WORKLOAD_ARGS = ('frames', 'loop_frames', 'resolution', 'plates', 'skew', 'blur', 'noise', 'seed')
+
+
+# OCR model stub returning lp numbers without running OCR, so the detector loop is measured without an OCR backend
+class StubOCRModel(OCRModel):
+
+    def __init__(self, lp_number='WA12345'):
+        super().__init__()
+        self.lp_number = lp_number
+
+    def run(self, image):
+        return self.lp_number
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--output', help='JSON file to save results to')
+    parser.add_argument('--compare', help='JSON file with results to compare with, e.g. of the previous commit')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative slowdown of the fastest pass treated as a regression, 0.25 is 25%%')
+    parser.add_argument('--repeats', type=int, default=15, help='timed passes over inputs of every benchmark')
+    parser.add_argument('--processes', type=int, default=3, help='fresh processes running all benchmarks')
+    parser.add_argument('--frames', type=int, default=10, help='synthetic frames used by benchmarks')
+    parser.add_argument('--loop-frames', type=int, default=60, help='frames of the end-to-end detector loop')
+    parser.add_argument('--loop-repeats', type=int, default=3, help='runs of the detector loop, the fastest is kept')
+    parser.add_argument('--resolution', default='1280x720', help='WIDTHxHEIGHT of synthetic frames')
+    parser.add_argument('--plates', type=int, default=2, help='plates in every synthetic frame')
+    parser.add_argument('--skew', type=float, default=5.0, help='maximal skew of plates in degrees')
+    parser.add_argument('--blur', type=float, default=0.0, help='sigma of Gaussian blur of frames')
+    parser.add_argument('--noise', type=float, default=0.0, help='std of Gaussian noise of frames')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', help='run only benchmarks whose names contain this text')
+    return parser.parse_args()
+
+
+def get_frame_config(args):
+    width, height = (int(v) for v in args.resolution.lower().split('x'))
+    return {'width': width, 'height': height, 'n_plates': args.plates, 'max_skew': args.skew, 'blur': args.blur,
+            'noise': args.noise}
+
+
+def time_calls(function, arguments, repeats):
+    """Time repeats passes of function over all argument tuples. Returns statistics of milliseconds per call in
+    a pass, so every input has the same weight and a single slow call does not shift the median."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for args in arguments:
+            function(*args)
+        times.append((time.perf_counter() - start) / len(arguments))
+    return get_time_stats([t * 1000 for t in times], len(arguments))
+
+
+def get_time_stats(times_ms, inputs):
+    times = np.array(times_ms)
+    return {'median_ms': float(np.median(times)), 'min_ms': float(np.min(times)),
+            'p90_ms': float(np.percentile(times, 90)), 'times_ms': [float(t) for t in times], 'repeats': len(times),
+            'inputs': inputs}
+
+
+def get_fps_stats(fps_runs, frames, recall):
+    return {'fps': float(np.max(fps_runs)), 'median_fps': float(np.median(fps_runs)),
+            'p10_fps': float(np.percentile(fps_runs, 10)), 'fps_runs': [float(fps) for fps in fps_runs],
+            'frames': frames, 'recall': recall, 'repeats': len(fps_runs)}
+
+
+def get_crops(frames):
+    crops = []
+    for frame, boxes, _ in frames:
+        for x, y, w, h in boxes:
+            crop = frame[max(y, 0):y + h, max(x, 0):x + w]
+            if crop.size > 0:
+                crops.append(crop)
+    return crops
+
+
+def get_raw_ocr_outputs(rng, n=200):
+    """OCR outputs with characters that process_ocr_result has to remove or fix."""
+    chars = np.array(list(LPRuom.LP_CHARS + ' .-|abc'))
+    return [''.join(rng.choice(chars, int(rng.integers(5, 11)))) for _ in range(n)]
+
+
+def get_overlapping_rects(frames, rng):
+    """Boxes of plates with jittered duplicates, as found by contours of many binarizations."""
+    rects_lists = []
+    for _, boxes, _ in frames:
+        rects = [tuple(int(v) for v in np.array(box) + rng.integers(-3, 4, 4)) for box in boxes for _ in range(5)]
+        rects_lists.append(rects + [tuple(int(v) for v in rng.integers(0, 600, 4)) for _ in range(20)])
+    return rects_lists
+
+
+def get_tracker(ocr_outputs):
+    tracker = LPTracker()
+    tracker.min_lp_length, tracker.max_lp_length = MIN_LP_LENGTH, MAX_LP_LENGTH
+    for ocr_output in ocr_outputs:
+        tracker.add_ocr_output(ocr_output)
+    return tracker
+
+
+def get_noisy_readings(rng, lp_number, n=30):
+    readings = []
+    for _ in range(n):
+        reading = list(lp_number)
+        reading[int(rng.integers(len(reading)))] = str(rng.choice(list(LPRuom.LP_CHARS)))
+        readings.append(''.join(reading))
+    return readings
+
+
+def get_stage_benchmarks(args, frames, detector, names=None):
+    """Benchmarks selected by --only and names, as name -> (function, argument tuples)."""
+    rng = np.random.default_rng(args.seed)
+    images = [(frame,) for frame, _, _ in frames]
+    binary_images = [(detector.binarize(frame),) for frame, _, _ in frames]
+    crops = [(crop,) + OCR_PARAMS for crop in get_crops(frames)]
+    raw_outputs = [(ocr_output,) for ocr_output in get_raw_ocr_outputs(rng)]
+    rects = [(rects,) for rects in get_overlapping_rects(frames, rng)]
+    trackers = [(get_tracker(get_noisy_readings(rng, lp_number)),) for _, _, lp_numbers in frames
+                for lp_number in lp_numbers]
+    benchmarks = {
+        'binarize': (LPRui.binarize, images),
+        'get_contours': (LPRuc.get_contours, binary_images),
+        'find_lp_in_binary_image': (detector.find_lp_in_binary_image, binary_images),
+        'find_lp_in_frame': (detector.find_lp_in_frame, images),
+        'merge_overlapping_rects': (LPRur.merge_overlapping_rects, rects),
+        'prepare_lp_for_ocr': (LPRui.prepare_lp_for_ocr, crops),
+        'prepare_lp_for_ocr_fast': (LPRui.prepare_lp_for_ocr_fast, crops),
+        'process_ocr_result': (LPRuo.process_ocr_result, raw_outputs),
+        'process_ocr_results': (LPRuo.process_ocr_results, [([ocr_output for ocr_output, in raw_outputs],)]),
+        'LPTracker.merge_ocr_results': (LPTracker.merge_ocr_results, trackers),
+        'LPTracker.merge_trackers_ocr_results': (LPTracker.merge_trackers_ocr_results,
+                                                 [([tracker for tracker, in trackers],)]),
+    }
+    selected_benchmarks = {}
+    for name, (function, arguments) in benchmarks.items():
+        if (args.only is not None and args.only not in name) or (names is not None and name not in names):
+            continue
+        if len(arguments) == 0:
+            print('%-40s skipped, no inputs' % name)
+            continue
+        selected_benchmarks[name] = (function, arguments)
+    return selected_benchmarks
+
+
+def run_stage_benchmarks(args, benchmarks):
+    results = {}
+    for name, (function, arguments) in benchmarks.items():
+        function(*arguments[0])  # Warm up
+        results[name] = time_calls(function, arguments, args.repeats)
+    return results
+
+
+def run_detector_loop(args, detector):
+    """Run the detector loop loop_repeats times. Returns frames per second of the fastest run, which is the least
+    disturbed by other load of the machine, and recall of rendered plates."""
+    sequence = SyntheticPlates.generate_sequence(args.loop_frames, seed=args.seed, **get_frame_config(args))
+    runs = [time_detector_loop(sequence, detector) for _ in range(max(args.loop_repeats, 1))]
+    return get_fps_stats([len(sequence) / elapsed for elapsed, _ in runs], len(sequence), runs[0][1])
+
+
+def time_detector_loop(sequence, detector):
+    """Detection, association of boxes with trackers, crop selection, OCR with a stub model and merging of OCR
+    results of every frame in one process. Returns seconds and recall of rendered plates."""
+    ocr_model = StubOCRModel()
+    trackers, tracker_boxes = [], np.zeros((0, 4))
+    matched, total = 0, 0
+    start = time.perf_counter()
+    for frame, plate_boxes, _ in sequence:
+        boxes = np.array(LPRur.merge_overlapping_rects(detector.find_lp_in_frame(frame)), dtype=np.float64)
+        boxes = boxes.reshape((-1, 4))
+        if len(boxes) > 0:
+            matched += int(np.sum(np.max(LPRura.rects_iou_matrix(np.array(plate_boxes), boxes), axis=1) >= MIN_IOU))
+        total += len(plate_boxes)
+        # Box continues the track of the most overlapping box of the previous frame or starts a new one
+        ious = LPRura.rects_iou_matrix(boxes, tracker_boxes) if len(tracker_boxes) > 0 else np.zeros((len(boxes), 0))
+        next_trackers = []
+        for i, (x, y, w, h) in enumerate(boxes.astype(int)):
+            j = int(np.argmax(ious[i])) if ious.shape[1] > 0 else -1
+            tracker = trackers[j] if j >= 0 and ious[i, j] > 0 else get_tracker([])
+            tracker.add_crop(frame[max(y, 0):y + h, max(x, 0):x + w])
+            crops = tracker.pop_crops_for_ocr()
+            lp_numbers = LPRuo.execute_ocr_batch([crop for crop, _ in crops], ocr_model, *OCR_PARAMS)
+            for lp_number, (_, quality) in zip(lp_numbers, crops):
+                tracker.add_ocr_output(lp_number, quality)
+            tracker.merge_ocr_results()
+            next_trackers.append(tracker)
+        trackers, tracker_boxes = next_trackers, boxes
+    return time.perf_counter() - start, matched / max(total, 1)
+
+
+def get_metadata(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'opencv': cv2.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'args': vars(args)}
+
+
+def get_workload_differences(results, baseline):
+    """Names of workload arguments which differ between results, e.g. resolution of a baseline run with other
+    arguments or saved before arguments were recorded."""
+    args = results.get('metadata', {}).get('args', {})
+    baseline_args = baseline.get('metadata', {}).get('args', {})
+    return [name for name in WORKLOAD_ARGS if args.get(name) != baseline_args.get(name)]
+
+
+def run_benchmarks(args, names=None):
+    """Run benchmarks selected by --only and names in this process."""
+    frame_config = get_frame_config(args)
+    frames = [SyntheticPlates.generate_frame(seed=args.seed + i, **frame_config) for i in range(args.frames)]
+    detector = LPDetectionProcess(None, None, PROPORTIONS, PROPORTIONS_SIGMA, MAX_PAR_ANGLE, MAX_PERP_ANGLE)
+    cv2.setRNGSeed(args.seed)
+    benchmarks = run_stage_benchmarks(args, get_stage_benchmarks(args, frames, detector, names))
+    if (args.only is None or args.only in 'detector_loop') and (names is None or 'detector_loop' in names):
+        benchmarks['detector_loop'] = run_detector_loop(args, detector)
+    return benchmarks
+
+
+def run_in_processes(args, names=None):
+    """Run benchmarks in fresh processes one after another and merge their results. Speed of a whole process can
+    differ from another one's by tens of percent (memory layout, CPU it runs on), passes within a process do not
+    average this out."""
+    runs = []
+    for _ in range(max(args.processes, 1)):
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            runs.append(executor.submit(run_benchmarks, args, names).result())
+    return merge_results(runs)
+
+
+def merge_results(runs):
+    """Merge benchmark results of many runs, statistics are computed over passes of all of them."""
+    merged = {}
+    for name in runs[0]:
+        results = [run[name] for run in runs if name in run]
+        if 'fps' in results[0]:
+            merged[name] = get_fps_stats([fps for result in results for fps in result['fps_runs']],
+                                         results[0]['frames'], results[0]['recall'])
+        else:
+            merged[name] = get_time_stats([t for result in results for t in result['times_ms']], results[0]['inputs'])
+    return merged
+
+
+def print_results(benchmarks):
+    for name, result in benchmarks.items():
+        if 'fps' in result:
+            print('%-40s %9.2f fps  median %9.2f fps  recall %.2f' % (name, result['fps'], result['median_fps'],
+                                                                      result['recall']))
+        else:
+            print('%-40s %9.3f ms  min %9.3f ms  p90 %9.3f ms' % (name, result['median_ms'], result['min_ms'],
+                                                                    result['p90_ms']))
+
+
+def compare(results, baseline, threshold):
+    """Print relative change of every benchmark present in both results. Returns names of regressions. Times are
+    compared by the fastest pass, which noise can only make slower. Besides exceeding the threshold, a regression's
+    fastest pass has to be slower than 90% of passes of the baseline (fastest run of the detector loop than 90% of
+    its runs). Raises ValueError if the baseline ran a different workload."""
+    differences = get_workload_differences(results, baseline)
+    if len(differences) > 0:
+        raise ValueError('Baseline ran a different workload, arguments differ: ' + ', '.join(differences))
+    regressions = []
+    print('%-40s %12s %12s %9s' % ('benchmark', 'baseline', 'current', 'change'))
+    for name, result in results['benchmarks'].items():
+        baseline_result = baseline.get('benchmarks', {}).get(name)
+        if baseline_result is None:
+            continue
+        if 'fps' in result:  # Higher is better, fps of the fastest run
+            old, new, unit = baseline_result['fps'], result['fps'], 'fps'
+            change = old / new - 1 if new > 0 else float('inf')
+            is_regression = change > threshold and new < baseline_result.get('p10_fps', old)
+        else:
+            old, new, unit = baseline_result['min_ms'], result['min_ms'], 'ms'
+            change = new / old - 1 if old > 0 else 0.0
+            is_regression = change > threshold and new > baseline_result['p90_ms']
+        if is_regression:
+            regressions.append(name)
+        print('%-40s %9.3f %2s %9.3f %2s %+8.1f%%%s' % (name, old, unit, new, unit, change * 100,
+                                                         '  REGRESSION' if is_regression else ''))
+    return regressions
+
+
+def main():
+    args = parse_args()
+    benchmarks = run_in_processes(args)
+    print_results(benchmarks)
+    results = {'metadata': get_metadata(args), 'benchmarks': benchmarks}
+    regressions = []
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        try:
+            regressions = compare(results, baseline, args.threshold)
+        except ValueError as e:
+            print(e)
+            sys.exit(2)
+        if len(regressions) > 0:  # Confirmed only if they stay above the threshold with passes of more processes
+            print('Timing again: ' + ', '.join(regressions))
+            retimed = run_in_processes(args, regressions)
+            benchmarks.update(merge_results([{name: benchmarks[name] for name in regressions}, retimed]))
+            regressions = compare(results, baseline, args.threshold)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if len(regressions) > 0:
+        print('Regressions above %.0f%%: %s' % (args.threshold * 100, ', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
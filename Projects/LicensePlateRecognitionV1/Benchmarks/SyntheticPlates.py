@@ -0,0 +1,135 @@
+"""Generator of synthetic frames with rendered license plates, so benchmarks can run offline on any number of
+reproducible frames. Run from the project directory to save example frames:
+python Benchmarks/SyntheticPlates.py OUTPUT_DIR [N_FRAMES]"""
+import os
+import sys
+import numpy as np
+import cv2
+
+LP_LETTERS = 'ABCDEFGHIJKLMNOPRSTUVWXYZ'
+LP_DIGITS = '0123456789'
+LP_PROPORTION = 4.6  # Width to height of a long single row Polish license plate
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def random_lp_number(rng):
+    """Polish style lp number: 2 or 3 letters of the district and 5 or 4 characters, 7 characters in total."""
+    n_letters = int(rng.integers(2, 4))
+    district = ''.join(rng.choice(list(LP_LETTERS), n_letters))
+    return district + ''.join(rng.choice(list(LP_DIGITS), 7 - n_letters))
+
+
+def render_plate(lp_number, height):
+    """White license plate with a black rim, blue strip on the left and black characters."""
+    width = int(height * LP_PROPORTION)
+    plate = np.full((height, width, 3), 255, dtype=np.uint8)
+    strip_w = max(int(width * 0.08), 1)
+    plate[:, :strip_w] = (160, 60, 0)
+    rim = max(height // 20, 1)
+    cv2.rectangle(plate, (0, 0), (width - 1, height - 1), (0, 0, 0), rim)
+    thickness = max(height // 10, 1)
+    scale = cv2.getFontScaleFromHeight(FONT, int(height * 0.6), thickness)
+    (text_w, text_h), _ = cv2.getTextSize(lp_number, FONT, scale, thickness)
+    scale *= min((width - strip_w - 4 * rim) / text_w, 1.0)  # Long text is narrowed down to fit the plate
+    (text_w, text_h), _ = cv2.getTextSize(lp_number, FONT, scale, thickness)
+    origin = (strip_w + (width - strip_w - text_w) // 2, (height + text_h) // 2)
+    cv2.putText(plate, lp_number, origin, FONT, scale, (0, 0, 0), thickness, cv2.LINE_AA)
+    return plate
+
+
+def place_plate(frame, plate, center, skew):
+    """Draw plate rotated by skew degrees around center of the plate placed at center. Returns plate's bounding box."""
+    h, w = plate.shape[:2]
+    rm2d = cv2.getRotationMatrix2D((w / 2, h / 2), skew, 1)
+    rm2d[:, 2] += (center[0] - w / 2, center[1] - h / 2)
+    size = (frame.shape[1], frame.shape[0])
+    warped = cv2.warpAffine(plate, rm2d, size, flags=cv2.INTER_LINEAR)
+    mask = cv2.warpAffine(np.full((h, w), 255, dtype=np.uint8), rm2d, size, flags=cv2.INTER_NEAREST)
+    frame[mask > 0] = warped[mask > 0]
+    corners = cv2.transform(np.array([[[0, 0], [w, 0], [0, h], [w, h]]], dtype=np.float64), rm2d)
+    return cv2.boundingRect(corners.astype(np.float32))
+
+
+def draw_background(rng, width, height):
+    """Gray gradient with dark car-like boxes and bright clutter, so plates are not the only contours in a frame."""
+    gradient = np.linspace(70, 150, height, dtype=np.float32)[:, None]
+    frame = np.repeat(np.repeat(gradient, width, axis=1)[:, :, None], 3, axis=2).astype(np.uint8)
+    for _ in range(int(rng.integers(4, 10))):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        w, h = int(rng.integers(width // 20, width // 4)), int(rng.integers(height // 20, height // 4))
+        colour = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.rectangle(frame, (x, y), (x + w, y + h), colour, -1)
+    return frame
+
+
+def generate_frame(width=1280, height=720, n_plates=2, plate_heights=(40, 70), max_skew=5.0, blur=0.0, noise=0.0,
+                   seed=0):
+    """Get frame with n_plates random plates, their bounding boxes and lp numbers. Skew is drawn from
+    [-max_skew, max_skew] degrees, blur is sigma of Gaussian blur and noise is std of Gaussian noise."""
+    rng = np.random.default_rng(seed)
+    frame = draw_background(rng, width, height)
+    lp_numbers = [random_lp_number(rng) for _ in range(n_plates)]
+    plates = [render_plate(lp_number, int(rng.integers(plate_heights[0], plate_heights[1] + 1)))
+              for lp_number in lp_numbers]
+    centers = get_plate_centers(rng, width, height, plates)
+    skews = rng.uniform(-max_skew, max_skew, n_plates)
+    boxes = [place_plate(frame, plate, center, skew) for plate, center, skew in zip(plates, centers, skews)]
+    return distort_frame(rng, frame, blur, noise), boxes, lp_numbers
+
+
+def generate_sequence(n_frames, width=1280, height=720, n_plates=2, plate_heights=(40, 70), max_skew=5.0, blur=0.0,
+                      noise=0.0, speed=4, seed=0):
+    """Frames of the same plates moving across a static background by speed px per frame, e.g. for tracking."""
+    rng = np.random.default_rng(seed)
+    background = draw_background(rng, width, height)
+    lp_numbers = [random_lp_number(rng) for _ in range(n_plates)]
+    plates = [render_plate(lp_number, int(rng.integers(plate_heights[0], plate_heights[1] + 1)))
+              for lp_number in lp_numbers]
+    centers = np.array(get_plate_centers(rng, width, height, plates), dtype=np.float64)
+    skews = rng.uniform(-max_skew, max_skew, n_plates)
+    directions = rng.choice([-1, 1], (n_plates, 2)) * speed
+    frames = []
+    for i in range(n_frames):
+        frame = background.copy()
+        boxes = [place_plate(frame, plate, (center + i * direction) % (width, height), skew)
+                 for plate, center, direction, skew in zip(plates, centers, directions, skews)]
+        frames.append((distort_frame(rng, frame, blur, noise), boxes, lp_numbers))
+    return frames
+
+
+def get_plate_centers(rng, width, height, plates, max_attempts=100):
+    """Random centers of plates, which do not overlap each other if possible."""
+    centers, boxes = [], []
+    for plate in plates:
+        h, w = plate.shape[:2]
+        for _ in range(max_attempts):
+            x, y = int(rng.integers(w, max(width - w, w + 1))), int(rng.integers(h, max(height - h, h + 1)))
+            box = (x - w, y - h, 2 * w, 2 * h)  # With margin for skew
+            if all(abs(box[0] - b[0]) * 2 >= box[2] + b[2] or abs(box[1] - b[1]) * 2 >= box[3] + b[3]
+                   for b in boxes):
+                break
+        centers.append((x, y))
+        boxes.append(box)
+    return centers
+
+
+def distort_frame(rng, frame, blur, noise):
+    if blur > 0:
+        frame = cv2.GaussianBlur(frame, (0, 0), blur)
+    if noise > 0:
+        frame = np.clip(frame + rng.normal(0, noise, frame.shape), 0, 255).astype(np.uint8)
+    return frame
+
+
+def main():
+    output_dir = sys.argv[1]
+    n_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    os.makedirs(output_dir, exist_ok=True)
+    for i in range(n_frames):
+        frame, boxes, lp_numbers = generate_frame(seed=i)
+        cv2.imwrite(os.path.join(output_dir, 'synthetic_%03d.png' % i), frame)
+        print(i, lp_numbers, boxes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+from collections import deque
+from multiprocessing import Queue
+from queue import Empty
+import numpy as np
+from LPDetectionProcess import LPDetectionProcess
+from SharedFrameRing import SharedFrameRing
+
+
+# Pool of detection subprocesses. Frames are striped between workers and results are released in frame order. Frames of
+# many sources can share the pool, frame ids are then unique only within a source.
+class LPDetectionPool:
+
+    def __init__(self, n_workers, proportions, proportions_sigma, max_par_angle, max_perp_angle,
+                 policy='least_loaded', max_frames_per_worker=2, metrics=None, **detection_options):
+        if policy not in ('least_loaded', 'round_robin'):
+            raise ValueError('Unknown frame assignment policy: ' + policy)
+        self.policy = policy
+        self.max_frames_per_worker = max_frames_per_worker
+        self.q_from_workers = Queue()  # All workers send results through one queue, results are tagged by frame id
+        self.qs_to_workers = [Queue() for _ in range(n_workers)]
+        self.metrics = metrics  # Metrics of the main process, into which workers' metrics are merged
+        self.worker_args = (proportions, proportions_sigma, max_par_angle, max_perp_angle)
+        self.detection_options = detection_options
+        self.workers = [self._create_worker(i) for i in range(n_workers)]
+        self.loads = np.zeros(n_workers, dtype=np.int32)  # Number of frames sent to a worker and not yet returned
+        self.frame_workers = {}  # (source id, frame id) -> index of a worker processing that frame
+        self.submitted_frame_ids = {}  # Source id -> frame ids in order of submission, used to reorder results
+        self.submitted_counts = {}  # Source id -> number of frames submitted, used to share workers between sources
+        self.results = {}  # (source id, frame id) -> found lp bounding boxes
+        self.next_worker = 0
+        self.replaced_count = 0
+        self.removed = np.zeros(n_workers, dtype=bool)  # Dead workers which were not replaced
+
+    @property
+    def capacity(self):
+        """Maximum number of frames being processed at once."""
+        return len(self.workers) * self.max_frames_per_worker
+
+    def report_loads(self):
+        if self.metrics is not None:
+            for i, load in enumerate(self.loads):
+                self.metrics.set_gauge('detection_worker_load', int(load), worker=str(i))
+
+    def start(self):
+        SharedFrameRing.share_resource_tracker()
+        for worker in self.workers:
+            worker.start()
+
+    def has_free_worker(self):
+        return np.min(self.loads) < self.max_frames_per_worker
+
+    def submit(self, frame_data):
+        """Send frame to a worker chosen by the assignment policy. frame_data has to contain frame_id and can contain
+        source_id. Returns False if every worker is already at full load."""
+        if not self.has_free_worker():
+            return False
+        # Workers are checked starting after the last chosen one, so ties in load do not starve any worker
+        order = (np.arange(len(self.workers)) + self.next_worker) % len(self.workers)
+        if self.policy == 'least_loaded':
+            worker_idx = int(order[np.argmin(self.loads[order])])
+        else:  # Next worker in order which is not at full load
+            worker_idx = int(order[np.argmax(self.loads[order] < self.max_frames_per_worker)])
+        self.next_worker = (worker_idx + 1) % len(self.workers)
+        source_id = frame_data.get('source_id', 0)
+        self.qs_to_workers[worker_idx].put({**frame_data, 'kill_process': False})
+        self.loads[worker_idx] += 1
+        self.frame_workers[(source_id, frame_data['frame_id'])] = worker_idx
+        self.submitted_frame_ids.setdefault(source_id, deque()).append(frame_data['frame_id'])
+        self.submitted_counts[source_id] = self.submitted_counts.get(source_id, 0) + 1
+        return True
+
+    def receive(self):
+        """Collect all results that workers have sent so far without blocking."""
+        while True:
+            try:
+                response = self.q_from_workers.get_nowait()
+            except Empty:
+                break
+            if self.metrics is not None:  # Metrics are sent with results and in the last message of a worker
+                self.metrics.merge(response.get('metrics'))
+            frame_key = (response.get('source_id', 0), response.get('frame_id'))
+            if frame_key not in self.frame_workers:  # Status messages are not tagged with frame id
+                continue
+            self.loads[self.frame_workers.pop(frame_key)] -= 1
+            self.results[frame_key] = response['lp_bounding_boxes']
+
+    def pop_ordered_results(self, source_id=0):
+        """Get (frame id, lp bounding boxes) pairs of finished frames of a source. Results are returned in frame order,
+        so a frame finished early waits until all frames of the source submitted before it are finished too."""
+        submitted_frame_ids = self.submitted_frame_ids.get(source_id, ())
+        ordered_results = []
+        while len(submitted_frame_ids) > 0 and (source_id, submitted_frame_ids[0]) in self.results:
+            frame_id = submitted_frame_ids.popleft()
+            ordered_results.append((frame_id, self.results.pop((source_id, frame_id))))
+        return ordered_results
+
+    def replace_dead_workers(self, start_new=True):
+        """Replace workers that died, e.g. after a crash in OpenCV, by new workers. Frames which a dead worker took
+        get empty results, so results of frames submitted after them are still released. Without start_new no
+        process is started and dead workers are only removed, frames are then sent to the remaining ones. Returns
+        the number of replaced workers."""
+        self.receive()  # Results sent by a worker before it died are kept
+        replaced_count = 0
+        for i, worker in enumerate(self.workers):
+            if self.removed[i] or worker.is_alive():
+                continue
+            lost_frame_keys = [frame_key for frame_key, worker_idx in self.frame_workers.items() if worker_idx == i]
+            for frame_key in lost_frame_keys:
+                del self.frame_workers[frame_key]
+                self.results[frame_key] = []
+            if self.metrics is not None:
+                self.metrics.count('lost_detections', len(lost_frame_keys))
+            if not start_new:  # Worker at full load is never chosen
+                self.removed[i] = True
+                self.loads[i] = self.max_frames_per_worker
+                continue
+            self.loads[i] = 0
+            self.qs_to_workers[i] = Queue()  # Frames left in the dead worker's queue are lost with it
+            self.workers[i] = self._create_worker(i)
+            self.workers[i].start()
+            replaced_count += 1
+        if np.all(self.removed):
+            raise RuntimeError('All detection workers died')
+        self.replaced_count += replaced_count
+        return replaced_count
+
+    def kill(self):
+        for q_to_worker in self.qs_to_workers:
+            q_to_worker.put({'frame': None, 'kill_process': True})
+        for worker in self.workers:
+            worker.join(timeout=10)
+        self.receive()  # Workers' last metrics
+
+    def _create_worker(self, worker_idx):
+        metrics_enabled = self.metrics is not None and self.metrics.enabled
+        return LPDetectionProcess(self.q_from_workers, self.qs_to_workers[worker_idx], *self.worker_args,
+                                  metrics_enabled=metrics_enabled, metrics_name='detection_%d' % worker_idx,
+                                  **self.detection_options)
@@ -1,60 +1,206 @@
+import time
 from multiprocessing import Process
+import numpy as np
 import cv2
 import LPRUtil.LPImage as LPRui
 import LPRUtil.Contour as LPRuc
 import LPRUtil.Rect as LPRur
+import LPRUtil.Motion as LPRum
+from SharedFrameRing import is_source_task_frame_current, read_source_task_frame
+from LPMetrics import LPMetrics
 
 
 # Full class of a subprocess whose task is to find new license plates in a frame.
 class LPDetectionProcess(Process):
+    # Candidate search on downscaled frames misses plates that full resolution search finds (measured against the
+    # ground truth of synthetic frames by Benchmarks/DetectionPyramid.py), so only full resolution search is supported
+    MAX_PYRAMID_LEVEL = 0
 
-    def __init__(self, q_to, q_from, proportions, proportions_sigma, max_par_angle, max_perp_angle):
+    def __init__(self, q_to, q_from, proportions, proportions_sigma, max_par_angle, max_perp_angle,
+                 motion_gating=False, motion_scale=0.25, full_search_interval=25, pyramid_level=0, refine_margin=0.5,
+                 pyramid_relaxation=2.0, metrics_enabled=False, metrics_name='detection'):
         super(LPDetectionProcess, self).__init__()
+        if pyramid_level > self.MAX_PYRAMID_LEVEL:
+            raise ValueError('Pyramid level %d is above the highest supported level %d' % (pyramid_level,
+                                                                                          self.MAX_PYRAMID_LEVEL))
         self.daemon = True
         self.lp_bounding_boxes = []
         self.frame = None
+        self.frame_id = None
+        self.task_data = None
+        self.source_id = None
+        self.frame_rings = {}  # Shared memory frames of every source, attached when its first frame slot is received
         self.q_to = q_to  # Queue to send data to the main process
         self.q_from = q_from  # Queue to receive data from the main process
         self.proportions = proportions
         self.proportions_sigma = proportions_sigma
         self.max_par_angle = max_par_angle  # parallel
         self.max_perp_angle = max_perp_angle  # perpendicular
+        # With motion gating license plates are searched for only in regions that changed since the previous frame.
+        # Every full_search_interval frames entire frame is searched to find plates of cars that stopped moving.
+        self.motion_gating = motion_gating
+        self.motion_scale = motion_scale
+        self.full_search_interval = full_search_interval
+        # Motion is tracked separately for every source
+        self.prev_motion_frames = {}
+        self.frames_since_full_search = {}
+        # With pyramid_level > 0 candidates are searched for on a frame downscaled 2^pyramid_level times, with shape
+        # tolerances multiplied by pyramid_relaxation. License plates are then searched for at full resolution only in
+        # windows around candidates, enlarged by refine_margin of candidate's size on every side. Levels above
+        # MAX_PYRAMID_LEVEL are only set by the benchmark that checks them.
+        self.pyramid_level = pyramid_level
+        self.refine_margin = refine_margin
+        self.pyramid_relaxation = pyramid_relaxation
+        self.metrics = LPMetrics(metrics_enabled, metrics_name)  # Deltas are sent to the main process with results
+        self.created_time = time.time()
 
     def run(self):  # Main process loop
+        # Time from creating the process until it can take frames depends on the start method, see LPRecognition
+        self.metrics.observe('process_startup', time.time() - self.created_time)
         self._send_status(updating=False)
         while True:
             kill_process = self._receive_frame()
             if kill_process:
                 break
-            binary_frame = LPRui.binarize(self.frame)
-            self.lp_bounding_boxes = self.find_lp_in_binary_image(binary_frame)
-            self.lp_bounding_boxes = LPRur.merge_overlapping_rects(self.lp_bounding_boxes)
+            if self.frame is None:  # Frame slot was overwritten before it could be read
+                self.metrics.count('frames_overwritten')
+                self._send_found_lps()
+                continue
+            with self.metrics.time('detect_frame'):
+                if self.motion_gating:
+                    self.lp_bounding_boxes = self.find_lp_in_moving_regions(self.frame)
+                else:
+                    self.lp_bounding_boxes = self.find_lp_in_frame(self.frame)
+                with self.metrics.time('merge_overlapping_rects'):
+                    self.lp_bounding_boxes = LPRur.merge_overlapping_rects(self.lp_bounding_boxes)
+            if not is_source_task_frame_current(self.task_data, self.frame_rings):  # Overwritten while detecting
+                self.metrics.count('frames_overwritten')
+                self.lp_bounding_boxes = []
+                self._send_found_lps()
+                continue
+            self.metrics.count('frames_detected')
             self._send_found_lps()
+        self._send_final_metrics()
+        self.frame = None
+        for frame_ring in self.frame_rings.values():
+            if frame_ring is not None:
+                frame_ring.close()
 
     def _send_status(self, updating):
         response = {'updating': updating}
         self.q_to.put(response)
 
     def _receive_frame(self):
-        task_data = self.q_from.get(timeout=10)
-        self.frame = task_data['frame']
+        with self.metrics.time('queue_wait'):  # Process waits for frames until it gets a kill task, however long
+            task_data = self.q_from.get()
+        self.task_data = task_data
+        self.frame_id = task_data.get('frame_id')
+        self.source_id = task_data.get('source_id', 0)
+        self.frame = None  # Release the previous frame's view before the ring might get replaced
+        self.frame = read_source_task_frame(task_data, self.frame_rings)
         if task_data['kill_process']:
             return True
         return False
 
+    def _send_final_metrics(self):
+        """Send metrics collected since the last results, which are sent at most once per second."""
+        snapshot = self.metrics.pop_snapshot(min_interval=0)
+        if snapshot is not None:
+            self.q_to.put({'updating': False, 'metrics': snapshot})
+
     def _send_found_lps(self):
-        response = {'lp_bounding_boxes': self.lp_bounding_boxes, 'updating': False}
+        response = {'lp_bounding_boxes': self.lp_bounding_boxes, 'frame_id': self.frame_id,
+                    'source_id': self.source_id, 'updating': False, 'metrics': self.metrics.pop_snapshot()}
         self.q_to.put(response)
         self.lp_bounding_boxes = []
 
-    def find_lp_in_binary_image(self, binary_frame):
-        contours = LPRuc.get_contours(binary_frame)  # Get all contours from a frame
+    def binarize(self, image, threshold=None):
+        with self.metrics.time('binarize'):
+            return LPRui.binarize(image, threshold)
+
+    def find_lp_in_binary_image(self, binary_frame, aperture_size=7, relaxation=1.0):
+        with self.metrics.time('get_contours'):
+            contours = LPRuc.get_contours(binary_frame, aperture_size)  # Get all contours from a frame
+        with self.metrics.time('shape_filtering'):
+            return self.find_lp_in_contours(contours, relaxation)
+
+    def find_lp_in_frame(self, frame):
+        if self.pyramid_level > 0:
+            return self.find_lp_in_pyramid(frame)
+        binary_frame = self.binarize(frame)
+        return self.find_lp_in_binary_image(binary_frame)
+
+    def find_lp_in_moving_regions(self, frame):
+        """Search for license plates only in regions of interest where motion was found. Found bounding boxes are in
+        frame coordinates."""
+        motion_frame = LPRum.get_motion_frame(frame, self.motion_scale)
+        prev_motion_frame = self.prev_motion_frames.get(self.source_id)
+        frames_since_full_search = self.frames_since_full_search.get(self.source_id, 0)
+        rois = None
+        if prev_motion_frame is not None and frames_since_full_search < self.full_search_interval:
+            if prev_motion_frame.shape == motion_frame.shape:  # Source resolution can change
+                rois = LPRum.get_motion_rois(prev_motion_frame, motion_frame, self.motion_scale, frame.shape)
+        self.prev_motion_frames[self.source_id] = motion_frame
+        if rois is None:  # Periodic or cheaper full frame search
+            self.frames_since_full_search[self.source_id] = 0
+            return self.find_lp_in_frame(frame)
+        self.frames_since_full_search[self.source_id] = frames_since_full_search + 1
+        return self.find_lp_in_regions(frame, rois, LPRum.get_binarization_threshold(motion_frame))
+
+    def find_lp_in_pyramid(self, frame):
+        """Find candidates with a relaxed shape check on a downscaled frame and search for license plates at full
+        resolution only in windows around them."""
+        small_frame = frame
+        for _ in range(self.pyramid_level):
+            small_frame = cv2.pyrDown(small_frame)
+        scale_x, scale_y = frame.shape[1] / small_frame.shape[1], frame.shape[0] / small_frame.shape[0]
+        threshold = LPRum.get_binarization_threshold(cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY))
+        candidates = self.find_lp_in_binary_image(self.binarize(small_frame, threshold), aperture_size=3,
+                                                  relaxation=self.pyramid_relaxation)
+        windows = []
+        for x, y, w, h in LPRur.merge_overlapping_rects(candidates):
+            mx, my = (0.5 + self.refine_margin) * w * scale_x, (0.5 + self.refine_margin) * h * scale_y
+            cx, cy = (x + 0.5 * w) * scale_x, (y + 0.5 * h) * scale_y
+            x0, y0 = max(int(cx - mx), 0), max(int(cy - my), 0)
+            x1, y1 = min(int(np.ceil(cx + mx)), frame.shape[1]), min(int(np.ceil(cy + my)), frame.shape[0])
+            windows.append((x0, y0, x1 - x0, y1 - y0))
+        return self.find_lp_in_regions(frame, windows, threshold)
+
+    def find_lp_in_regions(self, frame, rois, threshold):
+        """Search for license plates in regions of a frame, which are binarized with the whole frame's threshold.
+        Found bounding boxes are in frame coordinates."""
+        lp_bounding_boxes = []
+        for x, y, w, h in rois:
+            binary_roi = self.binarize(frame[y:y + h, x:x + w], threshold)
+            lp_bounding_boxes.extend([(bx + x, by + y, bw, bh)
+                                      for bx, by, bw, bh in self.find_lp_in_binary_image(binary_roi)])
+        return lp_bounding_boxes
+
+    def find_lp_in_contours(self, contours, relaxation=1.0):
+        """Tolerances of the shape check are multiplied by relaxation, which is greater than 1 when candidates are
+        searched for on a downscaled frame, where contour points are less precise."""
+        approx_contours, approx_idx = [], []
+        for i, c in enumerate(contours):
+            contour_perimeter = cv2.arcLength(c, True)
+            approx = cv2.approxPolyDP(c, 0.05 * contour_perimeter, True)
+            if len(approx) == 4:  # Only approximations with 4 points can have rectangular shape
+                approx_contours.append(approx.reshape((4, 2)))
+                approx_idx.append(i)
+        if len(approx_contours) == 0:
+            return []
+        # If approximation of a contour has a rectangular shape and fits into proportion requirements
+        # it's most likely a license plate. All approximations are checked at once.
+        is_lp = LPRuc.check_contours_lp_shape(np.array(approx_contours), self.proportions,
+                                              relaxation * self.proportions_sigma, relaxation * self.max_par_angle,
+                                              relaxation * self.max_perp_angle)
+        return [cv2.boundingRect(contours[i]) for i in np.array(approx_idx)[is_lp]]
+
+    def find_lp_in_contours_one_by_one(self, contours):
+        """Contour by contour version of find_lp_in_contours, kept as a reference for benchmarks."""
         lp_bounding_boxes = []
         for c in contours:
             contour_perimeter = cv2.arcLength(c, True)
             approx = cv2.approxPolyDP(c, 0.05 * contour_perimeter, True)
-            # If approximation of a contour has a rectangular shape and fits into proportion requirements
-            # it's most likely a license plate
             if self.check_lp_shape(approx):
                 lp_bounding_boxes.extend([cv2.boundingRect(c)])
         return lp_bounding_boxes
@@ -0,0 +1,78 @@
+from collections import deque
+
+# States of a slot
+FREE = 0
+PENDING = 1  # Being written to
+AWAITING = 2  # Waiting for results of an update cycle, before it can be displayed
+DISPLAYABLE = 3
+
+POLICIES = ('drop_new', 'drop_displayable')
+
+
+# Fixed number of preallocated frames, which are kept by the main loop until they are displayed. Memory used by frames
+# is bounded by capacity, no matter how far behind subprocesses are. When all slots are taken, the overflow policy
+# decides which frame is not displayed:
+# - drop_new: new frame is not buffered,
+# - drop_displayable: the oldest displayable frame is dropped, so displayed frames skip ahead.
+class LPFrameBuffer:
+
+    def __init__(self, capacity, policy='drop_new'):
+        if policy not in POLICIES:
+            raise ValueError('Unknown frame buffer overflow policy: ' + policy)
+        self.policy = policy
+        self.frames = [None] * capacity  # Allocated on first use of a slot and reused for frames of the same shape
+        self.states = [FREE] * capacity
+        self.free_slots = deque(range(capacity))
+        self.awaiting_slots = deque()
+        self.displayable_slots = deque()
+        self.dropped_count = 0
+
+    def __len__(self):
+        """Number of frames waiting to be displayed."""
+        return len(self.awaiting_slots) + len(self.displayable_slots)
+
+    @property
+    def nbytes(self):
+        return sum(frame.nbytes for frame in self.frames if frame is not None)
+
+    def acquire(self):
+        """Get a free slot to write a new frame into, its array is in frames (None for an unused slot). Returns None if
+        the frame is dropped by the overflow policy."""
+        if len(self.free_slots) == 0:
+            self.dropped_count += 1
+            if self.policy == 'drop_new' or len(self.displayable_slots) == 0:
+                return None
+            self.release(self.displayable_slots.popleft())
+        slot = self.free_slots.popleft()
+        self.states[slot] = PENDING
+        return slot
+
+    def set_frame(self, slot, frame):
+        """Keep frame written into a slot. It is the slot's own array unless frame shape has changed."""
+        self.frames[slot] = frame
+
+    def set_awaiting(self, slot):
+        self.states[slot] = AWAITING
+        self.awaiting_slots.append(slot)
+
+    def set_displayable(self, slot):
+        self.states[slot] = DISPLAYABLE
+        self.displayable_slots.append(slot)
+
+    def release_awaiting(self):
+        """Make all frames awaiting results displayable, once an update cycle has finished. Returns their slots."""
+        slots = list(self.awaiting_slots)
+        self.awaiting_slots.clear()
+        for slot in slots:
+            self.set_displayable(slot)
+        return slots
+
+    def pop_displayable(self):
+        """Get slot of the oldest displayable frame or None. Slot has to be released after the frame is displayed."""
+        if len(self.displayable_slots) == 0:
+            return None
+        return self.displayable_slots.popleft()
+
+    def release(self, slot):
+        self.states[slot] = FREE
+        self.free_slots.append(slot)
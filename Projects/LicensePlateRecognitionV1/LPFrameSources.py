@@ -0,0 +1,34 @@
+from collections import deque
+from LPVideoReader import LPVideoReader
+
+
+# Many video files or streams read in turns, so every source gets the same share of processing. Frame ids are counted
+# separately for every source. Every source is decoded ahead on its own thread.
+class LPFrameSources:
+
+    def __init__(self, sources, policy='lossless', n_slots=8, frame_stride=1):
+        self.captures = [LPVideoReader(source, policy, n_slots, frame_stride) for source in sources]
+        self.frame_ids = [-1] * len(self.captures)  # Id of the last frame read from every source
+        self.active_sources = deque(i for i, cap in enumerate(self.captures) if cap.isOpened())
+
+    def __len__(self):
+        return len(self.captures)
+
+    def read(self):
+        """Read a frame from the next source in turn. Returns (source id, frame id, frame) or None when all sources
+        have ended."""
+        while len(self.active_sources) > 0:
+            source_id = self.active_sources.popleft()
+            ret, frame = self.captures[source_id].read()
+            if not ret:  # Ended sources are released and skipped from then on
+                self.captures[source_id].release()
+                continue
+            self.active_sources.append(source_id)
+            self.frame_ids[source_id] += 1
+            return source_id, self.frame_ids[source_id], frame
+        return None
+
+    def close(self):
+        for cap in self.captures:
+            cap.release()
+        self.active_sources.clear()
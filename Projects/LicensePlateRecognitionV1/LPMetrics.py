@@ -0,0 +1,198 @@
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+import json
+import os
+import time
+
+# Upper bounds of latency histogram buckets in seconds, the last bucket has no upper bound
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+# Per-stage latency histograms, counters and gauges. Every process has its own instance, subprocesses send deltas of
+# their metrics to the main process, which merges them labeled by process name and exports everything as JSON or
+# Prometheus text. A disabled instance does nothing, so instrumented code costs only a method call.
+class LPMetrics:
+
+    def __init__(self, enabled=True, process_name='main'):
+        self.enabled = enabled
+        self.process_name = process_name
+        self.histograms = {}  # (process, stage) -> [bucket counts, sum of seconds, count]
+        self.counters = {}  # (process, name) -> value
+        self.gauges = {}  # (name, sorted label items) -> value
+        self.last_pop_time = time.monotonic()
+        self.server = None
+        self.published = None  # Copy of metrics served over HTTP, see publish
+
+    def time(self, stage):
+        """Context manager measuring latency of a stage."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, stage)
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        self._add_to_histogram((self.process_name, stage), bisect_left(BUCKETS, seconds), seconds, 1)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        key = (self.process_name, name)
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def set_gauge(self, name, value, **labels):
+        """Gauges keep only the last value, e.g. a queue depth or load of a process."""
+        if not self.enabled:
+            return
+        self.gauges[(name, tuple(sorted({'process': self.process_name, **labels}.items())))] = value
+
+    def pop_snapshot(self, min_interval=1.0):
+        """Get metrics collected since the last call and reset them, to be sent to the main process. Returns None if
+        metrics are disabled or less than min_interval seconds passed since the last snapshot."""
+        if not self.enabled or time.monotonic() - self.last_pop_time < min_interval:
+            return None
+        snapshot = {'histograms': self.histograms, 'counters': self.counters, 'gauges': self.gauges}
+        self.histograms, self.counters, self.gauges = {}, {}, {}
+        self.last_pop_time = time.monotonic()
+        return snapshot
+
+    def merge(self, snapshot):
+        """Add a snapshot sent by a subprocess, its metrics keep their process labels."""
+        if not self.enabled or snapshot is None:
+            return
+        for key, (bucket_counts, seconds, n) in snapshot['histograms'].items():
+            histogram = self.histograms.setdefault(key, [[0] * (len(BUCKETS) + 1), 0.0, 0])
+            histogram[0] = [c1 + c2 for c1, c2 in zip(histogram[0], bucket_counts)]
+            histogram[1] += seconds
+            histogram[2] += n
+        for key, value in snapshot['counters'].items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        self.gauges.update(snapshot['gauges'])
+
+    def copy(self):
+        metrics = LPMetrics(self.enabled, self.process_name)
+        metrics.histograms = {key: [list(bucket_counts), seconds, n]
+                              for key, (bucket_counts, seconds, n) in self.histograms.items()}
+        metrics.counters = dict(self.counters)
+        metrics.gauges = dict(self.gauges)
+        return metrics
+
+    def publish(self):
+        """Make metrics collected so far visible to the HTTP server. Server thread renders only published copies, so it
+        never iterates dicts that the main loop changes. Published copy is never changed, so replacing the reference
+        is enough."""
+        if self.server is not None:
+            self.published = self.copy()
+
+    def _add_to_histogram(self, key, bucket_idx, seconds, n):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        histogram[0][bucket_idx] += n
+        histogram[1] += seconds
+        histogram[2] += n
+
+    def to_dict(self):
+        histograms = [{'process': process, 'stage': stage, 'buckets': dict(zip(BUCKETS + ('+Inf',), bucket_counts)),
+                       'sum': seconds, 'count': n, 'mean': seconds / n if n > 0 else 0.0}
+                      for (process, stage), (bucket_counts, seconds, n) in sorted(self.histograms.items())]
+        counters = [{'process': process, 'name': name, 'value': value}
+                    for (process, name), value in sorted(self.counters.items())]
+        gauges = [{'name': name, 'labels': dict(labels), 'value': value}
+                  for (name, labels), value in sorted(self.gauges.items())]
+        return {'histograms': histograms, 'counters': counters, 'gauges': gauges}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        lines = ['# TYPE lpr_stage_seconds histogram']
+        for (process, stage), (bucket_counts, seconds, n) in sorted(self.histograms.items()):
+            labels = 'process="%s",stage="%s"' % (process, stage)
+            cumulative_count = 0
+            for bound, bucket_count in zip(BUCKETS + ('+Inf',), bucket_counts):
+                cumulative_count += bucket_count
+                lines.append('lpr_stage_seconds_bucket{%s,le="%s"} %d' % (labels, bound, cumulative_count))
+            lines.append('lpr_stage_seconds_sum{%s} %.9f' % (labels, seconds))
+            lines.append('lpr_stage_seconds_count{%s} %d' % (labels, n))
+        for (process, name), value in sorted(self.counters.items()):
+            lines.append('lpr_%s_total{process="%s"} %s' % (name, process, value))
+        for (name, labels), value in sorted(self.gauges.items()):
+            lines.append('lpr_%s{%s} %s' % (name, ','.join('%s="%s"' % label for label in labels), value))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write metrics to a file, in Prometheus text format if its extension is .prom or .txt, otherwise as JSON.
+        File is replaced at once, so a reader never sees a partially written one."""
+        if not self.enabled:
+            return
+        text = self.to_prometheus() if os.path.splitext(path)[1] in ('.prom', '.txt') else self.to_json()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve metrics over HTTP in a background thread, /metrics in Prometheus text format and /metrics.json.
+        Metrics are served as they were at the last call of publish."""
+        if not self.enabled or self.server is not None:
+            return
+        self.published = self.copy()
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                published = metrics.published
+                if self.path == '/metrics':
+                    body, content_type = published.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = published.to_json(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.end_headers()
+                self.wfile.write(body.encode())
+
+            def log_message(self, format, *args):  # Requests are not logged to stderr
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class _StageTimer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
@@ -0,0 +1,166 @@
+import time
+from collections import deque
+from multiprocessing import Event, Queue
+from queue import Empty, Full
+from LPOCRProcess import LPOCRProcess
+
+
+# Pool of OCR subprocesses decoupled from trackers. Every process using the pool, e.g. a tracker process, gets its own
+# client which sends preprocessed license plates through a shared bounded queue and receives results asynchronously.
+# Standby workers load the model in advance and replace workers that died, so OCR resumes without loading the model.
+class LPOCRPool:
+
+    def __init__(self, n_workers, n_clients, ocr_model_class, max_queued=64, max_batch_size=16, n_standby=0):
+        self.q_to_workers = Queue(maxsize=max_queued)
+        self.qs_from_workers = [Queue() for _ in range(n_clients)]
+        self.q_status = Queue()  # Workers report here when they have loaded the model
+        self.ocr_model_class = ocr_model_class
+        self.max_batch_size = max_batch_size
+        self.n_workers = n_workers
+        self.n_standby = n_standby
+        self.workers = [self._create_worker() for _ in range(n_workers)]
+        self.standby_workers = deque(self._create_worker(standby=True) for _ in range(n_standby))
+        self.startup_times = {}  # Worker name -> seconds from creating the worker to loading its model
+        self.replaced_count = 0
+
+    def start(self):
+        for worker in self.workers + list(self.standby_workers):
+            worker.start()
+
+    def get_client(self, client_id, max_deferred=64):
+        """Client has to be passed to a subprocess before it is started."""
+        return LPOCRClient(client_id, self.q_to_workers, self.qs_from_workers[client_id], max_deferred)
+
+    def receive_status(self):
+        """Collect startup times reported by workers so far. Returns the number of workers which have loaded the
+        model."""
+        while True:
+            try:
+                status = self.q_status.get_nowait()
+            except Empty:
+                return len(self.startup_times)
+            self.startup_times[status['name']] = status['startup_seconds']
+
+    def wait_ready(self, timeout=None):
+        """Wait until all workers, including standby ones, have loaded the model. Returns False on timeout."""
+        workers = self.workers + list(self.standby_workers)
+        try:
+            while any(worker.name not in self.startup_times for worker in workers):
+                status = self.q_status.get(timeout=timeout)
+                self.startup_times[status['name']] = status['startup_seconds']
+        except Empty:
+            return False
+        return True
+
+    def replace_dead_workers(self, start_new=True):
+        """Replace workers that died, e.g. after a crash of the OCR backend, by standby workers, which start taking
+        tasks at once, and start new standby workers. Without standby workers new workers are started. Dead standby
+        workers are replaced too. Without start_new no process is started, so dead workers are replaced only by
+        standby ones and the pool runs with fewer workers until a later call starts new ones. Tasks taken by a dead
+        worker are lost. Returns the number of replaced workers."""
+        # Dead standby workers are dropped first, otherwise one of them could replace a worker
+        self.standby_workers = deque(worker for worker in self.standby_workers if worker.is_alive())
+        workers = [worker for worker in self.workers if worker.is_alive()]
+        replaced_count = 0
+        while len(workers) < self.n_workers and (start_new or len(self.standby_workers) > 0):
+            if len(self.standby_workers) > 0:
+                workers.append(self.standby_workers.popleft())
+                workers[-1].activated.set()
+            else:
+                workers.append(self._create_worker())
+                workers[-1].start()
+            replaced_count += 1
+        self.workers = workers
+        while start_new and len(self.standby_workers) < self.n_standby:
+            self.standby_workers.append(self._create_worker(standby=True))
+            self.standby_workers[-1].start()
+        self.replaced_count += replaced_count
+        return replaced_count
+
+    def kill(self, timeout=10):
+        """Stop workers without blocking on a full queue. Waiting tasks are cancelled and results which were not
+        received are discarded, a worker cannot exit while its queues still hold data it has sent. Workers that do
+        not stop within timeout seconds are terminated."""
+        self._drain(self.q_to_workers)
+        for _ in self.workers:
+            try:
+                self.q_to_workers.put_nowait({'kill_process': True})
+            except Full:  # Clients still submit tasks, workers that get no kill task are terminated
+                break
+        for worker in self.standby_workers:  # Standby workers do not take tasks, so they do not get kill tasks
+            worker.terminate()
+        workers = self.workers + list(self.standby_workers)
+        deadline = time.monotonic() + timeout
+        while any(worker.is_alive() for worker in workers) and time.monotonic() < deadline:
+            for q in self.qs_from_workers + [self.q_status]:
+                self._drain(q)
+            time.sleep(0.01)
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+    @staticmethod
+    def _drain(q):
+        while True:
+            try:
+                q.get_nowait()
+            except Empty:
+                return
+
+    def _create_worker(self, standby=False):
+        return LPOCRProcess(self.qs_from_workers, self.q_to_workers, self.ocr_model_class, self.max_batch_size,
+                            self.q_status, Event() if standby else None)
+
+
+class LPOCRClient:
+
+    def __init__(self, client_id, q_to_workers, q_from_workers, max_deferred=64):
+        self.client_id = client_id
+        self.q_to_workers = q_to_workers
+        self.q_from_workers = q_from_workers
+        # High priority tasks that did not fit into the queue wait here, oldest ones are dropped when it is full
+        self.deferred_tasks = deque()
+        self.max_deferred = max_deferred
+        self.dropped_count = 0
+        self.deferred_count = 0
+
+    def submit(self, track_id, frame_id, cropped_lp, high_priority=True, quality=1.0):
+        """Queue preprocessed license plate for OCR without blocking. When the queue is full, low priority plates
+        (e.g. of trackers which already have many OCR results) are dropped and high priority ones are deferred.
+        Quality of the crop is returned with the result. Returns False if the plate was dropped."""
+        self._send_deferred_tasks()
+        task = {'client_id': self.client_id, 'track_id': track_id, 'frame_id': frame_id, 'cropped_lp': cropped_lp,
+                'quality': quality, 'kill_process': False}
+        if len(self.deferred_tasks) == 0 and self._try_put(task):
+            return True
+        if not high_priority:
+            self.dropped_count += 1
+            return False
+        if len(self.deferred_tasks) >= self.max_deferred:
+            self.deferred_tasks.popleft()
+            self.dropped_count += 1
+        self.deferred_tasks.append(task)
+        self.deferred_count += 1
+        return True
+
+    def receive(self):
+        """Get all OCR results sent so far without blocking, as dicts with keys track_id, frame_id and lp_number."""
+        self._send_deferred_tasks()
+        results = []
+        while True:
+            try:
+                results.append(self.q_from_workers.get_nowait())
+            except Empty:
+                return results
+
+    def _send_deferred_tasks(self):
+        while len(self.deferred_tasks) > 0 and self._try_put(self.deferred_tasks[0]):
+            self.deferred_tasks.popleft()
+
+    def _try_put(self, task):
+        try:
+            self.q_to_workers.put_nowait(task)
+        except Full:
+            return False
+        return True
@@ -0,0 +1,68 @@
+import time
+from multiprocessing import Process
+from queue import Empty
+import LPRUtil.OCR as LPRuo
+import LPRUtil.LPImage as LPRui
+from OCRCache import OCRCache
+from OCRModel.Backends import load_ocr_model
+
+
+# Subprocess whose task is to run OCR on license plates preprocessed by tracker processes. A standby process loads its
+# model and waits until it is activated, e.g. to replace a crashed process without waiting for the model to load.
+class LPOCRProcess(Process):
+
+    def __init__(self, qs_to, q_from, ocr_model_class, max_batch_size=16, q_status=None, activated=None):
+        super(LPOCRProcess, self).__init__()
+        self.daemon = True
+        self.qs_to = qs_to  # Queues to send OCR results to every process using the pool, shared by all OCR processes
+        self.q_from = q_from  # Bounded queue of preprocessed license plates, shared by all OCR processes
+        self.ocr_model_class = ocr_model_class  # Model class or backend name, see OCRModel.Backends
+        self.ocr_model = None  # Model is loaded once, when the process starts
+        self.max_batch_size = max_batch_size
+        self.q_status = q_status  # Queue to report the time it took to start the process and load the model
+        self.activated = activated  # Event set when the process should start taking tasks, None if it is active
+        # Results of all clients are cached, so a plate read by one tracker is not read again for another one
+        self.ocr_cache = OCRCache()
+        self.created_time = time.time()
+
+    def run(self):  # Main process loop
+        self.ocr_model = load_ocr_model(self.ocr_model_class)
+        if self.q_status is not None:
+            self.q_status.put({'name': self.name, 'startup_seconds': time.time() - self.created_time})
+        if self.activated is not None:
+            self.activated.wait()
+        while True:
+            tasks, kill_process = self._receive_tasks()
+            if len(tasks) > 0:
+                self._send_ocr_results(tasks)
+            if kill_process:
+                break
+
+    def _receive_tasks(self):
+        """Wait for a task and take all other waiting tasks, up to max_batch_size, to run OCR on them in one call."""
+        tasks = [self.q_from.get()]
+        while len(tasks) < self.max_batch_size and not tasks[-1]['kill_process']:
+            try:
+                tasks.append(self.q_from.get_nowait())
+            except Empty:
+                break
+        kill_process = tasks[-1]['kill_process']
+        if kill_process:
+            tasks.pop()
+        return tasks, kill_process
+
+    def _send_ocr_results(self, tasks):
+        lp_hashes = [LPRui.get_dhash(task['cropped_lp']) for task in tasks]
+        lp_numbers = [self.ocr_cache.get(lp_hash) for lp_hash in lp_hashes]
+        missed = [i for i, lp_number in enumerate(lp_numbers) if lp_number is None]
+        if len(missed) > 0:  # Only plates which are not cached are read
+            ocr_results = self.ocr_model.run_batch([tasks[i]['cropped_lp'] for i in missed])
+            for i, lp_number in zip(missed, LPRuo.process_ocr_results(ocr_results)):
+                lp_numbers[i] = lp_number
+                if lp_number != '':  # Failed readings are not cached
+                    self.ocr_cache.put(lp_hashes[i], lp_number)
+        for task, lp_number in zip(tasks, lp_numbers):
+            # Quality of the crop is passed back to weight the OCR output's vote in the tracker
+            response = {'track_id': task['track_id'], 'frame_id': task['frame_id'], 'lp_number': lp_number,
+                        'quality': task.get('quality', 1.0)}
+            self.qs_to[task['client_id']].put(response)
@@ -1,7 +1,6 @@
 import numpy as np
 import cv2
 from Rect import is_rect_within
-from LPImage import image_padding, invert_binary_image
 
 
 def check_contour_angles(contour, max_par_angle, max_perp_angle):
@@ -45,15 +44,53 @@ def check_contour_proportions(contour, proportions, proportions_sigma):
     return cond
 
 
-def get_contours(binary_image):
-    """Get 60 largest contours from a binary image."""
-    edged_image = cv2.Canny(binary_image, 1, 30, apertureSize=7, L2gradient=True)
+def check_contours_angles(contours, max_par_angle, max_perp_angle):
+    """Batch version of check_contour_angles for reordered contours of shape (N, 4, 2). Returns a boolean mask."""
+    x, y = contours[:, :, 0], contours[:, :, 1]
+    has_width = (x[:, 0] - x[:, 2] != 0) & (x[:, 1] - x[:, 3] != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):  # Shapes without width are already rejected
+        slope_top = np.abs((y[:, 0] - y[:, 2]) / (x[:, 0] - x[:, 2]))
+        slope_bottom = np.abs((y[:, 1] - y[:, 3]) / (x[:, 1] - x[:, 3]))
+        is_parallel = ~(max_par_angle < np.arctan(np.abs(slope_top - slope_bottom)) / (1 + (slope_top * slope_bottom)))
+        slope_right = np.abs((y[:, 2] - y[:, 3]) / (x[:, 2] - x[:, 3]))
+        is_perpendicular = (x[:, 2] == x[:, 3]) | ~((np.pi / 2) - max_perp_angle > np.arctan(slope_right))
+    return has_width & is_parallel & is_perpendicular
+
+
+def check_contours_lp_shape(contours, proportions, proportions_sigma, max_par_angle, max_perp_angle):
+    """Assess similarity to a rectangle and proportions of many 4 point contours, array of shape (N, 4, 2), at once.
+    Returns a boolean mask equal to checking contours one by one."""
+    contours = reorder_contours_points(contours)
+    return (check_contours_proportions(contours, proportions, proportions_sigma) &
+            check_contours_angles(contours, max_par_angle, max_perp_angle))
+
+
+def check_contours_proportions(contours, proportions, proportions_sigma):
+    """Batch version of check_contour_proportions for reordered contours of shape (N, 4, 2). Returns a boolean mask."""
+    height = np.abs(contours[:, 3, 1] - contours[:, 2, 1])
+    width = np.abs(contours[:, 1, 0] - contours[:, 3, 0])
+    width_top = np.abs(contours[:, 2, 0] - contours[:, 0, 0])
+    with np.errstate(divide='ignore', invalid='ignore'):  # Shapes without height or width are already rejected
+        is_valid = (height != 0) & (width != 0) & (height <= width)
+        width_ratio = width_top / width
+        is_valid &= (0.8 <= width_ratio) & (width_ratio <= 1.2)
+        ratio = (width / height)[:, None]
+    proportions = np.asarray(proportions, dtype=np.float64)
+    fits_proportion = (proportions - proportions_sigma < ratio) & (ratio < proportions + proportions_sigma)
+    return is_valid & np.any(fits_proportion, axis=1)
+
+
+def get_contours(binary_image, aperture_size=7):
+    """Get 60 largest contours from a binary image. Smaller aperture_size keeps edges of small objects, e.g. license
+    plates in a downscaled frame, apart."""
+    edged_image = cv2.Canny(binary_image, 1, 30, apertureSize=aperture_size, L2gradient=True)
     contours, _ = cv2.findContours(edged_image, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
     return sorted(contours, key=cv2.contourArea, reverse=True)[:60]
 
 
 def get_lp_contour(lp_image, apply_filter=True):
     """Input image must be in grayscale."""
+    from LPImage import image_padding, invert_binary_image  # LPImage imports this module
     if apply_filter:  # Sometimes input image might be already filtered
         lp_image = cv2.bilateralFilter(lp_image, 5, 255, 255)
     lp_image = image_padding(lp_image, 1, 255)
@@ -116,7 +153,7 @@ def preprocess_contour_shape(contour):
 
 def reorder_contour_points(contour):
     """Put contour points in order: [[top-left], [bottom-left], [top-right], [bottom-right]]"""
-    sort_idx = np.argsort(contour[:, 0])
+    sort_idx = np.argsort(contour[:, 0], kind='stable')
     contour = contour[sort_idx, :]
     if contour[0, 1] > contour[1, 1]:
         buffer = contour[0, :]
@@ -127,3 +164,15 @@ def reorder_contour_points(contour):
         contour[2, :] = contour[3, :]
         contour[3, :] = buffer
     return contour
+
+
+def reorder_contours_points(contours):
+    """Batch version of reorder_contour_points for contours of shape (N, 4, 2). Gives the same result, including
+    the way reorder_contour_points swaps points through a view, which copies the lower point over the upper one."""
+    sort_idx = np.argsort(contours[:, :, 0], axis=1, kind='stable')
+    contours = np.take_along_axis(contours, sort_idx[:, :, None], axis=1)
+    swap_left = contours[:, 0, 1] > contours[:, 1, 1]
+    contours[swap_left, 0, :] = contours[swap_left, 1, :]
+    swap_right = contours[:, 2, 1] > contours[:, 3, 1]
+    contours[swap_right, 2, :] = contours[swap_right, 3, :]
+    return contours
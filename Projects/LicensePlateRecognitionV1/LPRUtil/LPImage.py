@@ -3,16 +3,67 @@ import cv2
 from Contour import get_lp_contour, is_contour_close_to_horizontal_axis
 
 
-def binarize(image):
-    """Blur grayscale image with bilateral filter and apply a threshold."""
+def binarize(image, threshold=None):
+    """Blur grayscale image with bilateral filter and apply a threshold. Threshold is found with Otsu's method, unless
+    it is given, e.g. when only a fragment of a frame is binarized, but it should be thresholded like the whole
+    frame."""
     grayscale_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     grayscale_image = cv2.bilateralFilter(grayscale_image, 2, 20, 1)
-    _, binary_image1 = cv2.threshold(grayscale_image, 200, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
+    if threshold is None:
+        _, binary_image1 = cv2.threshold(grayscale_image, 200, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
+    else:
+        _, binary_image1 = cv2.threshold(grayscale_image, threshold, 255, cv2.THRESH_BINARY)
     _, binary_image2 = cv2.threshold(grayscale_image, 70, 255, cv2.THRESH_BINARY)
     binary_image = binary_image1 + binary_image2
     return binary_image
 
 
+def finish_lp_for_ocr(lp_image, ih, mh, mw, btb, blr):
+    """Rescale binary license plate image to its final height and add margin and border."""
+    lp_image = rescale_lp_by_height(lp_image, ih)
+    lp_image[lp_image < 128] = 0  # Removes non-binary colours added as a result of interpolation
+    lp_image = image_padding(lp_image, (mw, mh), 255)  # Add white margin
+    lp_image = image_padding(lp_image, (btb, blr), 0)  # Add black border
+    return lp_image
+
+
+def get_box_angle(box):
+    """Angle of the longer edges of a box given by 4 points. Extreme angles give 0."""
+    box = box.reshape((-1, 1, 2)).astype(dtype=int)
+    vx, vy, x, y = cv2.fitLine(box, cv2.DIST_L2, 0, 0.01, 0.01)
+    angle = np.arctan(vy / vx)[0]
+    # Extreme angle suggests that something went wrong during contour extraction and in that case
+    # no change should be done
+    if np.abs(np.rad2deg(angle)) > 30:
+        angle = 0
+    return angle
+
+
+def get_dhash(image, hash_size=8):
+    """Perceptual difference hash of an image as an integer of hash_size^2 bits. Similar images have hashes with
+    small Hamming distance."""
+    if len(image.shape) > 2:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    image = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    diff = image[:, 1:] > image[:, :-1]
+    return int.from_bytes(np.packbits(diff).tobytes(), 'big')
+
+
+def get_diamond_kernel(radius):
+    """Kernel equal to radius iterations of 3x3 cross kernel, so one morphological operation can replace many."""
+    y, x = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    return (np.abs(y) + np.abs(x) <= radius).astype(np.uint8)
+
+
+def get_lp_box(lp_image):
+    """Corners of minimal area rectangle around license plate's contour or None. Input image must be filtered
+    grayscale."""
+    approx_c = get_lp_contour(lp_image, apply_filter=False)
+    if approx_c is None or len(approx_c) < 1:
+        return None
+    return cv2.boxPoints(cv2.minAreaRect(approx_c)) - 1  # Contour is found in image with 1 px padding
+
+
 def get_lp_skew_angle(lp_image, apply_filter=True):
     """Input image must be in grayscale."""
     if apply_filter:  # Sometimes input image might be already filtered
@@ -22,15 +73,15 @@ def get_lp_skew_angle(lp_image, apply_filter=True):
         return 0
     if len(approx_c) < 1:
         return 0
-    approx_c = cv2.boxPoints(cv2.minAreaRect(approx_c))
-    approx_c = approx_c.reshape((-1, 1, 2)).astype(dtype=int)
-    vx, vy, x, y = cv2.fitLine(approx_c, cv2.DIST_L2, 0, 0.01, 0.01)
-    angle = np.arctan(vy / vx)[0]
-    # Extreme angle suggests that something went wrong during contour extraction and in that case
-    # no change should be done
-    if np.abs(np.rad2deg(angle)) > 30:
-        angle = 0
-    return angle
+    return get_box_angle(cv2.boxPoints(cv2.minAreaRect(approx_c)))
+
+
+def get_rotation_crop(angle, h, w):
+    """Number of rows to crop from top and bottom of an image rotated by angle, to remove areas rotated into it."""
+    ang_len = int(np.abs(np.tan(angle) * w * 0.45))
+    if ang_len >= h * 0.5:  # Do not crop the rotated image if it would cause a loss of height greater than 50%
+        ang_len = 0
+    return ang_len
 
 
 def image_padding(image, px, bg_colour=255):
@@ -56,9 +107,8 @@ def invert_binary_image(image):
 
 
 def is_image_empty(image):
-    if len(np.unique(image)) < 2:
-        return False
-    return True
+    """True if image has at least 2 different values. Comparing min and max does not sort the image as np.unique."""
+    return image.size > 0 and np.min(image) != np.max(image)
 
 
 def level_lp(lp_image, apply_filter=True):
@@ -67,32 +117,69 @@ def level_lp(lp_image, apply_filter=True):
     return rotate_img(lp_image, angle)
 
 
-def prepare_lp_for_ocr(lp_image, ih, mh, mw, btb, blr):
+def level_lp_with_box(lp_image):
+    """Level license plate image like level_lp, but find its contour only once. Returns leveled image and corners of
+    license plate's box in it, which are None if the contour is not found. Input image must be filtered grayscale."""
+    lp_box = get_lp_box(lp_image)
+    if lp_box is None:
+        return lp_image, None
+    angle = get_box_angle(lp_box)
+    h, w = lp_image.shape
+    rm2d = cv2.getRotationMatrix2D((w / 2, h / 2), np.rad2deg(angle), 1)
+    # Areas rotated into the image are white, as margin of rotate_img, without copying the image into a margin
+    lp_image = cv2.warpAffine(lp_image, rm2d, (w, h), borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+    ang_len = get_rotation_crop(angle, h, w)
+    lp_box = cv2.transform(lp_box.reshape((-1, 1, 2)), rm2d).reshape((-1, 2)) - (0, ang_len)
+    return lp_image[ang_len:h - ang_len, :], lp_box
+
+
+def prepare_lp_for_ocr(lp_image, ih, mh, mw, btb, blr, metrics=None):
     """This function extracts a license plate from an image and returns processed version ready for ocr.
-    Parameter's full names: image height, margin width, margin height, border top/bottom, border left/right."""
+    Parameter's full names: image height, margin width, margin height, border top/bottom, border left/right.
+    If metrics (LPMetrics) are given, latency of every step is recorded."""
     if len(lp_image.shape) > 2:
         lp_image = cv2.cvtColor(lp_image, cv2.COLOR_BGR2GRAY)
-    lp_image = rescale_lp_by_height(lp_image, target_h=300)
-    lp_image = cv2.bilateralFilter(lp_image, 5, 255, 255)
-    lp_image = level_lp(lp_image, apply_filter=False)
-    lp_image = threshold_lp(lp_image)
-    lp_image = remove_non_lp_elements(lp_image)
+    lp_image = timed_step(metrics, 'prepare_lp.rescale', rescale_lp_by_height, lp_image, target_h=300)
+    lp_image = timed_step(metrics, 'prepare_lp.bilateral_filter', cv2.bilateralFilter, lp_image, 5, 255, 255)
+    lp_image = timed_step(metrics, 'prepare_lp.level', level_lp, lp_image, apply_filter=False)
+    lp_image = timed_step(metrics, 'prepare_lp.threshold', threshold_lp, lp_image)
+    lp_image = timed_step(metrics, 'prepare_lp.remove_non_lp_elements', remove_non_lp_elements, lp_image)
     if lp_image is None:
         return None
-    lp_image = remove_remaining_noise(lp_image)
+    lp_image = timed_step(metrics, 'prepare_lp.remove_remaining_noise', remove_remaining_noise, lp_image)
     # Sometimes poor quality of a lp image can lead to entire image be treated as noise
     if lp_image.shape[0] == 0 or lp_image.shape[1] == 0:
         return None
-    lp_image = rescale_lp_by_height(lp_image, ih)
-    lp_image[lp_image < 128] = 0  # Removes non-binary colours added as a result of interpolation
-    lp_image = image_padding(lp_image, (mw, mh), 255)  # Add white margin
-    lp_image = image_padding(lp_image, (btb, blr), 0)  # Add black border
-    return lp_image
+    return finish_lp_for_ocr(lp_image, ih, mh, mw, btb, blr)
+
+
+def prepare_lp_for_ocr_fast(lp_image, ih, mh, mw, btb, blr, work_scale=2.0, metrics=None):
+    """Faster counterpart of prepare_lp_for_ocr with nearly the same results. License plate is processed at
+    work_scale times the final height instead of 300 px, with kernel sizes scaled down accordingly, and its contour
+    is found once for both leveling and removal of non lp elements."""
+    if len(lp_image.shape) > 2:
+        lp_image = cv2.cvtColor(lp_image, cv2.COLOR_BGR2GRAY)
+    work_h = int(ih * work_scale)
+    scale = work_h / 300  # Kernel sizes of prepare_lp_for_ocr suit the height of 300 px
+    lp_image = timed_step(metrics, 'prepare_lp.rescale', rescale_lp_by_height, lp_image, target_h=work_h)
+    lp_image = timed_step(metrics, 'prepare_lp.bilateral_filter', cv2.bilateralFilter, lp_image, 3, 255, 255)
+    lp_image, lp_box = timed_step(metrics, 'prepare_lp.level', level_lp_with_box, lp_image)
+    lp_image = timed_step(metrics, 'prepare_lp.threshold', threshold_lp, lp_image)
+    # If the contour was not found before leveling, it is searched for in the binary image, as in prepare_lp_for_ocr
+    lp_image = timed_step(metrics, 'prepare_lp.remove_non_lp_elements', remove_non_lp_elements, lp_image, lp_box,
+                          max(round(10 * scale), 1))
+    if lp_image is None:
+        return None
+    lp_image = timed_step(metrics, 'prepare_lp.remove_remaining_noise', remove_remaining_noise, lp_image,
+                          max(round(4 * scale), 1))
+    if lp_image.shape[0] == 0 or lp_image.shape[1] == 0:
+        return None
+    return finish_lp_for_ocr(lp_image, ih, mh, mw, btb, blr)
 
 
 def remove_background(image):
     """Find outermost rows and columns that have only background color values and crop them out."""
-    if len(np.unique(image)) < 2:  #
+    if not is_image_empty(image):
         return image
     # Find indexes of first/last rows/columns with values equal 0 (other values being background)
     l_col, r_col = np.argwhere(np.min(image, axis=0) == 0)[[0, -1]].flatten()
@@ -100,25 +187,29 @@ def remove_background(image):
     return image[t_row:b_row, l_col:r_col]
 
 
-def remove_non_lp_elements(lp_image):
-    """Remove all elements outside of license plate's white background."""
+def remove_non_lp_elements(lp_image, lp_box=None, margin=10):
+    """Remove all elements outside of license plate's white background. Corners of license plate's box can be given,
+    if they are already known, otherwise they are found in the image. Box is shrunk by margin px on every side."""
     lp_image = invert_binary_image(lp_image)
-    lp_contour = get_lp_contour(lp_image, apply_filter=False)
-    if lp_contour is None:  # Sometimes lp's contour cannot be properly separated
-        return None
-    lp_contour = cv2.boxPoints(cv2.minAreaRect(lp_contour))
-    lp_contour = lp_contour.reshape((-1, 1, 2)).astype(dtype=int)
+    if lp_box is None:
+        lp_contour = get_lp_contour(lp_image, apply_filter=False)
+        if lp_contour is None:  # Sometimes lp's contour cannot be properly separated
+            return None
+        lp_box = cv2.boxPoints(cv2.minAreaRect(lp_contour))
+    lp_contour = lp_box.reshape((-1, 1, 2)).astype(dtype=int)
     mask = np.zeros_like(lp_image)
     mask = cv2.drawContours(mask, [lp_contour], -1, (255, 255, 255), cv2.FILLED)
-    # Reduce mask's size to get rid of most of the noise present on the edges of a license plate.
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3), (2, 2))
-    mask = cv2.erode(mask, kernel, iterations=10)
+    # Reduce mask's size to get rid of most of the noise present on the edges of a license plate. One erosion with
+    # a large kernel is equal to margin iterations with 3x3 kernel.
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * margin + 1, 2 * margin + 1))
+    mask = cv2.erode(mask, kernel)
     lp_image[mask == 0] = 0
     return invert_binary_image(lp_image)
 
 
-def remove_remaining_noise(lp_image):
-    """Remove contours far away from the central horizontal line and other very small ones."""
+def remove_remaining_noise(lp_image, kernel_radius=4):
+    """Remove contours far away from the central horizontal line and other very small ones, which fit in a kernel of
+    kernel_radius."""
     # Removal of contours far away from the center
     contours, _ = cv2.findContours(lp_image, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
     max_dist = 0.35
@@ -127,9 +218,8 @@ def remove_remaining_noise(lp_image):
     mask = cv2.drawContours(mask, contours, -1, (255, 255, 255), cv2.FILLED)
     lp_image[mask == 255] = 255
     # Removal of very small contours
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-    lp_image = cv2.dilate(lp_image, kernel, iterations=4)
-    lp_image = cv2.erode(lp_image, kernel, iterations=4)
+    # Closing with diamond kernel is equal to kernel_radius iterations of dilation and erosion with 3x3 ellipse kernel
+    lp_image = cv2.morphologyEx(lp_image, cv2.MORPH_CLOSE, get_diamond_kernel(kernel_radius))
     return remove_background(lp_image)
 
 
@@ -154,12 +244,22 @@ def rotate_img(img, angle):
     rm2d = cv2.getRotationMatrix2D((w / 2, h / 2), np.rad2deg(angle), 1)
     img_m = cv2.warpAffine(img_m, rm2d, (w, h), borderMode=cv2.BORDER_REPLICATE)
     img_m = img_m[hm05:old_h + hm05, wm05:old_w + wm05]  # Remove margin
-    ang_len = int(np.abs(np.tan(angle) * old_w * 0.45))
-    if ang_len >= old_h * 0.5:  # Do not crop the rotated image if it would cause a loss of height greater than 50%
-        ang_len = 0
+    ang_len = get_rotation_crop(angle, old_h, old_w)
     return img_m[ang_len:old_h - ang_len, :]
 
 
+def stack_images(images, gap=0, bg_colour=255):
+    """Stack grayscale images vertically into one left aligned image, separated by gap pixels of background.
+    Returns the stacked image and y offset of every image in it."""
+    heights = np.array([image.shape[0] for image in images])
+    offsets = np.concatenate(([0], np.cumsum(heights + gap)[:-1]))
+    stacked_image = np.full((offsets[-1] + heights[-1], max(image.shape[1] for image in images)), bg_colour,
+                            dtype=np.uint8)
+    for image, y in zip(images, offsets):
+        stacked_image[y:y + image.shape[0], :image.shape[1]] = image
+    return stacked_image, offsets
+
+
 def threshold_lp(lp_image):
     """Binarize license plate image."""
     h, w = lp_image.shape
@@ -172,3 +272,11 @@ def threshold_lp(lp_image):
     threshold, _ = cv2.threshold(cutout_for_thresholding, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     _, lp_image = cv2.threshold(lp_image, threshold, 255, cv2.THRESH_BINARY)
     return lp_image
+
+
+def timed_step(metrics, stage, function, *args, **kwargs):
+    """Call function and record its latency as a stage of metrics, unless metrics are None."""
+    if metrics is None:
+        return function(*args, **kwargs)
+    with metrics.time(stage):
+        return function(*args, **kwargs)
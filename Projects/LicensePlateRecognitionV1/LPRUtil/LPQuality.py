@@ -0,0 +1,47 @@
+import numpy as np
+import cv2
+from LPImage import get_lp_skew_angle
+
+QUALITY_HEIGHT = 32  # Crops are scored at this height, so sharpness does not depend on crop's size
+GOOD_HEIGHT = 40  # Crops at least this high have full height score, text of lower ones gets hard to read
+SHARP_LAPLACIAN_RATIO = 0.8  # Ratio of Laplacian variance to brightness variance at QUALITY_HEIGHT of a sharp crop
+GOOD_CONTRAST = 60  # Standard deviation of brightness of a license plate with clearly visible characters
+MAX_SKEW = np.deg2rad(30)  # Skew, at which a crop gets skew score 0
+
+
+def get_contrast_score(gray_image):
+    return min(float(np.std(gray_image)) / GOOD_CONTRAST, 1.0)
+
+
+def get_height_score(lp_image):
+    return min(lp_image.shape[0] / GOOD_HEIGHT, 1.0)
+
+
+def get_lp_quality(lp_image):
+    """Cheap estimate of how well a license plate crop can be read, from 0 to 1. It is a product of sharpness, height,
+    skew and contrast scores, so a crop bad in any of those gets a low quality."""
+    return float(np.prod(list(get_lp_quality_scores(lp_image).values())))
+
+
+def get_lp_quality_scores(lp_image):
+    """Every quality score of a license plate crop, from 0 to 1."""
+    if lp_image.shape[0] == 0 or lp_image.shape[1] == 0:
+        return {'sharpness': 0.0, 'height': 0.0, 'skew': 0.0, 'contrast': 0.0}
+    gray_image = cv2.cvtColor(lp_image, cv2.COLOR_BGR2GRAY) if len(lp_image.shape) > 2 else lp_image
+    width = max(int(gray_image.shape[1] * QUALITY_HEIGHT / gray_image.shape[0]), 1)
+    gray_image = cv2.resize(gray_image, (width, QUALITY_HEIGHT), interpolation=cv2.INTER_AREA)
+    return {'sharpness': get_sharpness_score(gray_image), 'height': get_height_score(lp_image),
+            'skew': get_skew_score(gray_image), 'contrast': get_contrast_score(gray_image)}
+
+
+def get_sharpness_score(gray_image):
+    """Variance of Laplacian is low for blurred images, which lack edges. It is divided by variance of brightness, so
+    low contrast is not counted as blur."""
+    variance = float(np.var(gray_image))
+    if variance == 0:
+        return 0.0
+    return min(float(cv2.Laplacian(gray_image, cv2.CV_64F).var()) / variance / SHARP_LAPLACIAN_RATIO, 1.0)
+
+
+def get_skew_score(gray_image):
+    return max(1.0 - abs(float(get_lp_skew_angle(gray_image))) / MAX_SKEW, 0.0)
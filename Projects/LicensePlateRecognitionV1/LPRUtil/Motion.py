@@ -0,0 +1,41 @@
+import numpy as np
+import cv2
+
+
+def get_binarization_threshold(motion_frame):
+    """Otsu's threshold of a downscaled frame, which is close to the one found by binarize for a full size frame.
+    Regions of a frame should be thresholded with it, as their own Otsu's thresholds can be very different."""
+    threshold, _ = cv2.threshold(motion_frame, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return threshold
+
+
+def get_motion_frame(frame, scale):
+    """Downscaled grayscale copy of a frame used to find moving regions."""
+    motion_frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if len(motion_frame.shape) > 2:
+        motion_frame = cv2.cvtColor(motion_frame, cv2.COLOR_BGR2GRAY)
+    return motion_frame
+
+
+def get_motion_rois(prev_motion_frame, motion_frame, scale, frame_shape, threshold=25, dilation=4, min_area=16,
+                    max_roi_fraction=0.5):
+    """Get regions of a full size frame where anything moved since the previous motion frame. Regions are dilated, so
+    a license plate on a moving car fits in them whole. Returns None if regions cover so much of the frame that
+    searching the full frame is cheaper."""
+    diff = cv2.GaussianBlur(cv2.absdiff(prev_motion_frame, motion_frame), (5, 5), 0)  # Blur removes sensor noise
+    _, mask = cv2.threshold(diff, threshold, 255, cv2.THRESH_BINARY)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * dilation + 1, 2 * dilation + 1))
+    mask = cv2.dilate(mask, kernel)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    h, w = frame_shape[:2]
+    rois = []
+    for c in contours:
+        if cv2.contourArea(c) < min_area:
+            continue
+        x, y, rw, rh = cv2.boundingRect(c)
+        x0, y0 = max(int(x / scale), 0), max(int(y / scale), 0)
+        x1, y1 = min(int(np.ceil((x + rw) / scale)), w), min(int(np.ceil((y + rh) / scale)), h)
+        rois.append((x0, y0, x1 - x0, y1 - y0))
+    if sum(rw * rh for _, _, rw, rh in rois) > max_roi_fraction * w * h:
+        return None
+    return rois
@@ -1,63 +1,69 @@
-import re
-from LPImage import is_image_empty, prepare_lp_for_ocr
+from LPImage import get_dhash, is_image_empty, prepare_lp_for_ocr, prepare_lp_for_ocr_fast, timed_step
+from PlateFormat import apply_plate_format, apply_plate_format_batch, get_compiled_plate_format
 
 
-def execute_ocr(cut_out_lp, ocr_model, ih=44, mh=3, mw=8, btb=4, blr=6):
+def execute_ocr(cut_out_lp, ocr_model, ih=44, mh=3, mw=8, btb=4, blr=6, ocr_caches=(), metrics=None, fast=False):
     """Parameters default values were found during experiments, they yield best OCR results. Parameter's full names:
-    image height, margin width, margin height, border top/bottom, border left/right."""
-    if not is_image_empty(cut_out_lp):
-        return ''
-    cropped_lp = prepare_lp_for_ocr(cut_out_lp, ih, mw, mh, btb, blr)  # Preprocessing
+    image height, margin width, margin height, border top/bottom, border left/right.
+    OCR caches (e.g. tracker's own and a global one) are checked in order, near duplicates of previously read images
+    skip preprocessing and OCR. Failed readings are not cached, so the next crop of the plate is read again.
+    If metrics (LPMetrics) are given, latency of preprocessing steps and OCR is recorded.
+    If fast is True, license plate is preprocessed with prepare_lp_for_ocr_fast."""
+    lp_hash = None
+    if len(ocr_caches) > 0:
+        lp_hash = get_dhash(cut_out_lp)
+        for i, ocr_cache in enumerate(ocr_caches):
+            lp_number = ocr_cache.get(lp_hash)
+            if lp_number is not None:
+                for missed_ocr_cache in ocr_caches[:i]:
+                    missed_ocr_cache.put(lp_hash, lp_number)
+                return lp_number
+    cropped_lp = preprocess_lp_for_ocr(cut_out_lp, ih, mh, mw, btb, blr, metrics, fast)
     if cropped_lp is None:
-        return ''
-    lp_number = ocr_model.run(cropped_lp)
-    lp_number = process_ocr_result(lp_number)
+        lp_number = ''
+    else:
+        lp_number = timed_step(metrics, 'ocr_model.run', ocr_model.run, cropped_lp)
+        lp_number = process_ocr_result(lp_number)
+    if lp_number != '':
+        for ocr_cache in ocr_caches:
+            ocr_cache.put(lp_hash, lp_number)
     return lp_number
 
 
-def digit_to_letter(match_obj):
-    if match_obj.group(0) == '0':
-        return 'O'
-    elif match_obj.group(0) == '1':
-        return 'I'
-    elif match_obj.group(0) == '2':
-        return 'Z'
-    elif match_obj.group(0) == '5':
-        return 'S'
-    elif match_obj.group(0) == '7':
-        return 'Z'
-    elif match_obj.group(0) == '8':
-        return 'B'
-    else:
-        return match_obj.group(0)
-
-
-def letter_to_digit(match_obj):
-    if match_obj.group(0) == 'B':
-        return '8'
-    if match_obj.group(0) == 'D':
-        return '0'
-    elif match_obj.group(0) == 'I':
-        return '1'
-    elif match_obj.group(0) == 'O':
-        return '0'
-    elif match_obj.group(0) == 'Z':
-        return '2'
-    else:
-        return match_obj.group(0)
-
-
-def process_ocr_result(ocr_result):
-    # Remove characters that cannot appear on a license plate
-    ocr_result = re.sub(r'[^A-Z0-9 ]', '', ocr_result)
-    # Remove characters I and 1 on first position, as those are almost always a result of preprocessing error,
-    # which is difficult to fix
-    ocr_result = re.sub(r'^I1', '', ocr_result)
-    # Change digits to letters in first 2 characters, as there can only be characters in those positions
-    ocr_result = re.sub(r'(?:(?<=^)|(?<=^.))\d', digit_to_letter, ocr_result)
-    # Change certain letters to digits in positions 3 to 8. This change is based on license plate regulations in Poland
-    ocr_result = re.sub(r'(?:(?<=...)|(?<=....)|(?<=.....)|(?<=......)|(?<=.......))[BDIOZ]',
-                        letter_to_digit, ocr_result)
-    # Remove unnecessary spaces
-    ocr_result = re.sub(r' ', '', ocr_result)
-    return ocr_result
+def execute_ocr_batch(cut_out_lps, ocr_model, ih=44, mh=3, mw=8, btb=4, blr=6, metrics=None, fast=False):
+    """Batch counterpart of execute_ocr. All license plates that pass preprocessing are sent to OCR model in one call.
+    Returns lp numbers in the same order as cut_out_lps."""
+    lp_numbers = [''] * len(cut_out_lps)
+    cropped_lps, cropped_lps_idx = [], []
+    for i, cut_out_lp in enumerate(cut_out_lps):
+        cropped_lp = preprocess_lp_for_ocr(cut_out_lp, ih, mh, mw, btb, blr, metrics, fast)
+        if cropped_lp is not None:
+            cropped_lps.append(cropped_lp)
+            cropped_lps_idx.append(i)
+    if len(cropped_lps) == 0:
+        return lp_numbers
+    ocr_results = timed_step(metrics, 'ocr_model.run_batch', ocr_model.run_batch, cropped_lps)
+    for i, lp_number in zip(cropped_lps_idx, process_ocr_results(ocr_results)):
+        lp_numbers[i] = lp_number
+    return lp_numbers
+
+
+def preprocess_lp_for_ocr(cut_out_lp, ih=44, mh=3, mw=8, btb=4, blr=6, metrics=None, fast=False):
+    """Get license plate image ready to be passed to OCR model or None if it cannot be read. Allows preprocessing and
+    OCR to run in different processes. Fast preprocessing works at a lower resolution, see prepare_lp_for_ocr_fast."""
+    if not is_image_empty(cut_out_lp):
+        return None
+    if fast:
+        return prepare_lp_for_ocr_fast(cut_out_lp, ih, mw, mh, btb, blr, metrics=metrics)
+    return prepare_lp_for_ocr(cut_out_lp, ih, mw, mh, btb, blr, metrics)
+
+
+def process_ocr_result(ocr_result, plate_format='PL'):
+    """Remove characters that cannot appear on a license plate and fix characters OCR confuses according to rules of
+    plate format registered in PlateFormat.PLATE_FORMATS, by default Polish license plate regulations."""
+    return apply_plate_format(ocr_result, get_compiled_plate_format(plate_format))
+
+
+def process_ocr_results(ocr_results, plate_format='PL'):
+    """Batch counterpart of process_ocr_result."""
+    return apply_plate_format_batch(ocr_results, get_compiled_plate_format(plate_format))
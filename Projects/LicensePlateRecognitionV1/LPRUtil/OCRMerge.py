@@ -0,0 +1,138 @@
+import numpy as np
+
+LP_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+# Pseudo probability added to positions i - 2, i - 1, i, i + 1, i + 2 by a character found at position i
+POSITION_OFFSETS = np.array([-2, -1, 0, 1, 2])
+POSITION_WEIGHTS = np.array([0.05, 0.1, 0.7, 0.1, 0.05])
+
+# Lookup table from ASCII code to index in LP_CHARS, -1 for characters that cannot appear on a license plate
+_CHAR_CODES = np.full(256, -1, dtype=np.int64)
+_CHAR_CODES[np.frombuffer(LP_CHARS.encode('ascii'), dtype=np.uint8)] = np.arange(len(LP_CHARS))
+_CHARS = np.array(list(LP_CHARS))
+
+
+def decode_lp_number(char_codes):
+    return ''.join(_CHARS[char_codes])
+
+
+def encode_ocr_outputs(ocr_outputs):
+    """Encode all OCR outputs at once. Returns character codes of all outputs concatenated, length of every output
+    and position of every character in its output."""
+    lengths = np.array([len(ocr_output) for ocr_output in ocr_outputs], dtype=np.int64)
+    joined = ''.join(ocr_outputs).encode('ascii', errors='replace')
+    codes = _CHAR_CODES[np.frombuffer(joined, dtype=np.uint8)]
+    if np.any(codes < 0):
+        raise ValueError('OCR outputs can only contain characters: ' + LP_CHARS)
+    starts = np.cumsum(lengths) - lengths
+    positions = np.arange(codes.size) - np.repeat(starts, lengths)
+    return codes, lengths, positions
+
+
+def get_lp_lengths(lengths, output_track_idx, n_tracks, min_lp_length, max_lp_length, output_weights=None):
+    """Most frequent OCR output length of every track, outputs are counted with their weights if given. Ties are
+    resolved in favour of the shorter length and tracks without outputs of valid length get min_lp_length."""
+    n_lengths = max_lp_length - min_lp_length + 1
+    valid = (min_lp_length <= lengths) & (lengths <= max_lp_length)
+    bins = output_track_idx[valid] * n_lengths + lengths[valid] - min_lp_length
+    if output_weights is not None:
+        output_weights = output_weights[valid]
+    length_counts = np.bincount(bins, weights=output_weights, minlength=n_tracks * n_lengths)
+    length_counts = length_counts.reshape((n_tracks, n_lengths))
+    return np.argmax(length_counts, axis=1) + min_lp_length
+
+
+def get_char_scores(codes, lengths, positions, output_track_idx, lp_lengths, output_weights=None):
+    """Pseudo probabilities of characters appearing at certain positions in lp, array of shape
+    (tracks, characters, max lp length). Scores are summed in the same order as character by character merging,
+    so the results are identical. Scores of every output are multiplied by its weight, if weights are given."""
+    n_tracks, n_chars = lp_lengths.size, len(LP_CHARS)
+    max_length = int(np.max(lp_lengths)) if n_tracks > 0 else 0
+    char_lp_lengths = np.repeat(lp_lengths[output_track_idx], lengths)
+    char_track_idx = np.repeat(output_track_idx, lengths)
+    # Weight of every output is reduced by its length's difference to lp's length
+    weights = POSITION_WEIGHTS / (np.abs(char_lp_lengths - np.repeat(lengths, lengths)) + 1)[:, None]
+    if output_weights is not None:
+        weights = weights * np.repeat(output_weights, lengths)[:, None]
+    target_positions = positions[:, None] + POSITION_OFFSETS
+    valid = (0 <= target_positions) & (target_positions < char_lp_lengths[:, None])
+    bins = (char_track_idx[:, None] * n_chars + codes[:, None]) * max_length + target_positions
+    scores = np.bincount(bins[valid], weights=weights[valid], minlength=n_tracks * n_chars * max_length)
+    return scores.reshape((n_tracks, n_chars, max_length))
+
+
+def merge_ocr_outputs(ocr_outputs, min_lp_length, max_lp_length, weights=None):
+    """Get the most probable lp number from OCR outputs of a single track. Votes of outputs can be weighted, e.g. by
+    quality of license plate images they were read from."""
+    tracks_weights = None if weights is None else [weights]
+    return merge_ocr_outputs_batch([ocr_outputs], min_lp_length, max_lp_length, tracks_weights)[0]
+
+
+def merge_ocr_outputs_batch(tracks_ocr_outputs, min_lp_length, max_lp_length, tracks_weights=None):
+    """Get the most probable lp numbers of many tracks in one call. Returns a list of lp numbers in the same order
+    as tracks_ocr_outputs. Weights of outputs, if given, have the same layout as tracks_ocr_outputs."""
+    if len(tracks_ocr_outputs) == 0:
+        return []
+    n_outputs = np.array([len(ocr_outputs) for ocr_outputs in tracks_ocr_outputs], dtype=np.int64)
+    output_track_idx = np.repeat(np.arange(n_outputs.size), n_outputs)
+    codes, lengths, positions = encode_ocr_outputs([o for ocr_outputs in tracks_ocr_outputs for o in ocr_outputs])
+    output_weights = None
+    if tracks_weights is not None:
+        output_weights = np.array([w for weights in tracks_weights for w in weights], dtype=np.float64)
+    lp_lengths = get_lp_lengths(lengths, output_track_idx, n_outputs.size, min_lp_length, max_lp_length,
+                                output_weights)
+    scores = get_char_scores(codes, lengths, positions, output_track_idx, lp_lengths, output_weights)
+    best_chars = np.argmax(scores, axis=1)
+    return [decode_lp_number(best_chars[i, :lp_length]) for i, lp_length in enumerate(lp_lengths)]
+
+
+def init_running_scores(min_lp_length, max_lp_length):
+    """Running pseudo probabilities for every candidate lp length, array of shape
+    (lengths, characters, max lp length), and weighted counts of OCR outputs of every candidate length."""
+    n_lengths = max_lp_length - min_lp_length + 1
+    return np.zeros((n_lengths, len(LP_CHARS), max_lp_length)), np.zeros(n_lengths)
+
+
+def add_to_running_scores(running_scores, length_counts, ocr_output, min_lp_length, weight=1.0):
+    """Add a single OCR output to running scores of every candidate lp length. Running scores of the voted length are
+    identical to the ones computed by merging all OCR outputs at once with the same weights."""
+    codes, lengths, positions = encode_ocr_outputs([ocr_output])
+    ocr_len = lengths[0]
+    if 0 <= ocr_len - min_lp_length < length_counts.size:
+        length_counts[ocr_len - min_lp_length] += weight
+    lp_lengths = np.arange(length_counts.size) + min_lp_length
+    weights = weight * POSITION_WEIGHTS / (np.abs(lp_lengths - ocr_len) + 1)[:, None, None]
+    target_positions = positions[:, None] + POSITION_OFFSETS
+    valid = (0 <= target_positions) & (target_positions < lp_lengths[:, None, None])
+    length_idx = np.broadcast_to(np.arange(lp_lengths.size)[:, None, None], valid.shape)
+    char_idx = np.broadcast_to(codes[None, :, None], valid.shape)
+    target_positions = np.broadcast_to(target_positions, valid.shape)
+    np.add.at(running_scores, (length_idx[valid], char_idx[valid], target_positions[valid]),
+              np.broadcast_to(weights, valid.shape)[valid])
+
+
+def get_running_confidences(running_scores, length_counts, min_lp_length):
+    """Share of the best character's score in the sum of scores at every position of the most probable lp number."""
+    length_idx = np.argmax(length_counts)
+    scores = running_scores[length_idx, :, :length_idx + min_lp_length]
+    totals = np.sum(scores, axis=0)
+    return np.divide(np.max(scores, axis=0), totals, out=np.zeros_like(totals), where=totals > 0)
+
+
+def get_running_lp_number(running_scores, length_counts, min_lp_length):
+    """Get most probable lp number from running scores and margins between the best and second-best character at
+    every position. Margins are relative to the sum of scores at a position."""
+    length_idx = np.argmax(length_counts)
+    scores = running_scores[length_idx, :, :length_idx + min_lp_length]
+    best_chars = np.argmax(scores, axis=0)
+    top_two = np.sort(scores, axis=0)[-2:, :]
+    totals = np.sum(scores, axis=0)
+    margins = np.divide(top_two[1] - top_two[0], totals, out=np.zeros_like(totals), where=totals > 0)
+    return decode_lp_number(best_chars), margins
+
+
+def get_running_lp_numbers(running_scores, length_counts, min_lp_length):
+    """Get most probable lp numbers of many tracks at once from their running scores stacked into arrays of shape
+    (tracks, lengths, characters, max lp length) and (tracks, lengths)."""
+    length_idx = np.argmax(length_counts, axis=1)
+    best_chars = np.argmax(running_scores[np.arange(length_idx.size), length_idx], axis=1)
+    return [decode_lp_number(best_chars[i, :length + min_lp_length]) for i, length in enumerate(length_idx)]
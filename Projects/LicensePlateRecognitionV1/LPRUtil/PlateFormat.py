@@ -0,0 +1,130 @@
+import numpy as np
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+DIGITS = '0123456789'
+# Characters OCR confuses, used to fix positions where only letters or only digits can appear
+DIGIT_TO_LETTER = {'0': 'O', '1': 'I', '2': 'Z', '5': 'S', '7': 'Z', '8': 'B'}
+LETTER_TO_DIGIT = {'B': '8', 'D': '0', 'I': '1', 'O': '0', 'Z': '2'}
+SEPARATOR = '\n'  # Separates lp numbers of a batch, it is never an allowed character
+MIN_VECTORIZED_BATCH = 32  # Smaller batches are faster fixed one lp number at a time
+
+# Plate formats declared as data. Rules are applied to OCR output in order:
+# 1. characters not in chars are removed,
+# 2. the first matching prefix of removed_prefixes is removed,
+# 3. characters in every range of positions [start, end) that are not in the range's allowed characters are replaced
+#    according to the range's remap, end None means the end of lp number,
+# 4. removed_chars are removed, positions of step 3 count them.
+# Lengths and allowed characters are not enforced, matches_plate_format checks them.
+PLATE_FORMATS = {
+    # Polish plates: 2 or 3 letters of the district and characters of the vehicle, which do not use B, D, I, O and Z
+    'PL': {
+        'chars': LETTERS + DIGITS + ' ',
+        'removed_prefixes': ('I1',),  # Almost always a result of preprocessing error, which is difficult to fix
+        'positions': [(0, 2, LETTERS, DIGIT_TO_LETTER),
+                      (3, None, ''.join(c for c in LETTERS + DIGITS if c not in 'BDIOZ'), LETTER_TO_DIGIT)],
+        'removed_chars': ' ',
+        'min_length': 4,
+        'max_length': 8,
+    },
+}
+
+_compiled_plate_formats = {}
+
+
+def apply_plate_format(lp_number, compiled_format):
+    """Fix a single OCR output with a compiled plate format. Every step is a translation of bytes."""
+    lp_bytes = lp_number.encode('ascii', 'ignore').translate(None, compiled_format['removed'])
+    for prefix in compiled_format['removed_prefixes']:
+        if lp_bytes.startswith(prefix):
+            lp_bytes = lp_bytes[len(prefix):]
+            break
+    lp_bytes = b''.join([lp_bytes[start:end].translate(table) for start, end, table in compiled_format['segments']])
+    return lp_bytes.translate(None, compiled_format['removed_chars']).decode('ascii')
+
+
+def apply_plate_format_batch(lp_numbers, compiled_format):
+    """Fix many OCR outputs at once. Characters of all lp numbers are translated together as one array of codes,
+    each by the table of its position in its lp number."""
+    joined = SEPARATOR.join(lp_numbers).encode('ascii', 'ignore')
+    # Separator inside an lp number would split it
+    if len(lp_numbers) < MIN_VECTORIZED_BATCH or joined.count(SEPARATOR.encode()) != len(lp_numbers) - 1:
+        return [apply_plate_format(lp_number, compiled_format) for lp_number in lp_numbers]
+    codes = np.frombuffer(joined.translate(None, compiled_format['removed_in_batch']), dtype=np.uint8)
+    is_separator = codes == ord(SEPARATOR)
+    separators = np.flatnonzero(is_separator)
+    starts = np.concatenate(([0], separators + 1))
+    lengths = np.append(separators, codes.size) - starts
+    padded_codes = np.append(codes, np.zeros(max(map(len, compiled_format['removed_prefixes']), default=0), np.uint8))
+    prefix_lengths = np.zeros(len(lp_numbers), dtype=np.int64)
+    for prefix in compiled_format['removed_prefixes']:  # Only the first matching prefix is removed
+        has_prefix = (prefix_lengths == 0) & (lengths >= len(prefix))
+        for i, prefix_code in enumerate(prefix):
+            has_prefix &= padded_codes[starts + i] == prefix_code
+        prefix_lengths[has_prefix] = len(prefix)
+    # Separator gets a negative position, as it precedes the start of the next lp number, so do removed prefixes
+    positions = np.arange(codes.size) - (starts + prefix_lengths)[np.cumsum(is_separator)]
+    tables = compiled_format['position_tables']
+    translated = tables[np.clip(positions, 0, len(tables) - 1), codes]
+    keep = is_separator | ((positions >= 0) & ~compiled_format['is_removed_char'][translated])
+    return translated[keep].tobytes().decode('ascii').split(SEPARATOR)
+
+
+def compile_plate_format(plate_format):
+    """Compile plate format rules into translation tables: bytes tables of ranges of positions for single lp numbers
+    and an array of tables of every position for batches, whose last table is used for all further positions."""
+    chars = plate_format['chars']
+    if not chars.isascii() or SEPARATOR in chars:
+        raise ValueError('Plate format characters must be ASCII without %r' % SEPARATOR)
+    removed = bytes(code for code in range(256) if chr(code) not in chars)
+    segments, position = [], 0
+    for start, end, allowed, remap in sorted(plate_format['positions'], key=lambda rule: rule[0]):
+        if start > position:
+            segments.append((position, start, None))
+        remap = {c: r for c, r in remap.items() if c not in allowed}
+        segments.append((start, end, bytes.maketrans(''.join(remap).encode(), ''.join(remap.values()).encode())))
+        if end is None:
+            break
+        position = end
+    if len(segments) == 0 or segments[-1][1] is not None:
+        segments.append((position, None, None))
+    identity = np.arange(256, dtype=np.uint8)
+    n_positions = max(segments[-1][0], 0) + 1
+    position_tables = np.repeat(identity[None, :], n_positions, axis=0)
+    for start, end, table in segments:
+        if table is not None:
+            position_tables[start:n_positions if end is None else end] = np.frombuffer(table, dtype=np.uint8)
+    return {'removed': removed,
+            'removed_in_batch': removed.replace(SEPARATOR.encode(), b''),
+            'removed_prefixes': tuple(prefix.encode('ascii') for prefix in plate_format.get('removed_prefixes', ())),
+            'segments': segments,
+            'position_tables': position_tables,
+            'removed_chars': plate_format.get('removed_chars', '').encode('ascii'),
+            'is_removed_char': np.isin(identity, np.frombuffer(plate_format.get('removed_chars', '').encode('ascii'),
+                                                               dtype=np.uint8)),
+            'positions': plate_format['positions'],
+            'min_length': plate_format.get('min_length', 0),
+            'max_length': plate_format.get('max_length', np.inf)}
+
+
+def get_compiled_plate_format(name):
+    """Plate format registered in PLATE_FORMATS, compiled on first use."""
+    compiled_format = _compiled_plate_formats.get(name)
+    if compiled_format is None:
+        compiled_format = _compiled_plate_formats[name] = compile_plate_format(PLATE_FORMATS[name])
+    return compiled_format
+
+
+def matches_plate_format(lp_number, compiled_format):
+    """Check if a fixed lp number has allowed length and only allowed characters in every position."""
+    if not compiled_format['min_length'] <= len(lp_number) <= compiled_format['max_length']:
+        return False
+    for start, end, allowed, _ in compiled_format['positions']:
+        if any(c not in allowed for c in lp_number[start:end]):
+            return False
+    return True
+
+
+def register_plate_format(name, plate_format):
+    """Add or replace a plate format, e.g. of another country."""
+    PLATE_FORMATS[name] = plate_format
+    _compiled_plate_formats.pop(name, None)
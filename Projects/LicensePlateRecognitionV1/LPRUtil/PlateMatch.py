@@ -0,0 +1,62 @@
+from itertools import combinations
+import numpy as np
+from PlateFormat import DIGIT_TO_LETTER, LETTER_TO_DIGIT
+
+# Characters OCR confuses, the same pairs plate formats fix
+CONFUSION_PAIRS = tuple(sorted(set(digit + letter for digit, letter in DIGIT_TO_LETTER.items()) |
+                              set(digit + letter for letter, digit in LETTER_TO_DIGIT.items())))
+# Confused characters connected by pairs, characters of a group are replaced by its first character in normalized lp
+# numbers. Normalization may join characters which are not a pair (e.g. 2 and 7), it only makes distance smaller.
+CONFUSION_GROUPS = ('0OD', '1I', '27Z', '5S', '8B')
+CONFUSION_COST = 0.25  # Cost of substituting a character with a confused one
+HASH_MULTIPLIER = np.uint64(1099511628211)
+
+_NORMALIZATION = str.maketrans({char: group[0] for group in CONFUSION_GROUPS for char in group[1:]})
+_CONFUSIONS = set(CONFUSION_PAIRS) | set(pair[::-1] for pair in CONFUSION_PAIRS)
+
+
+def get_deletion_hashes(codes, max_deletions):
+    """Hashes of all variants of equally long strings, array of shape (N, length) of character codes, with up to
+    max_deletions characters deleted. Returns array of shape (N, number of variants)."""
+    length = codes.shape[1]
+    hashes = []
+    for n_deletions in range(min(max_deletions, length) + 1):
+        for deleted in combinations(range(length), n_deletions):
+            hashes.append(hash_codes(np.delete(codes, deleted, axis=1)))
+    return np.stack(hashes, axis=1)
+
+
+def get_lp_distance(lp_number1, lp_number2, max_distance=np.inf):
+    """Edit distance in which substitutions of characters OCR confuses cost CONFUSION_COST and other operations cost 1.
+    Returns infinity as soon as the distance is known to be above max_distance."""
+    previous_row = [float(i) for i in range(len(lp_number2) + 1)]
+    for i, char1 in enumerate(lp_number1, 1):
+        row = [float(i)]
+        for j, char2 in enumerate(lp_number2, 1):
+            row.append(min(previous_row[j] + 1, row[j - 1] + 1,
+                           previous_row[j - 1] + get_substitution_cost(char1, char2)))
+        if min(row) > max_distance:
+            return np.inf
+        previous_row = row
+    return previous_row[-1] if previous_row[-1] <= max_distance else np.inf
+
+
+def get_substitution_cost(char1, char2):
+    if char1 == char2:
+        return 0.0
+    if char1 + char2 in _CONFUSIONS:
+        return CONFUSION_COST
+    return 1.0
+
+
+def hash_codes(codes):
+    """64-bit polynomial hashes of rows of character codes, the same in every process."""
+    hashes = np.full(codes.shape[0], codes.shape[1], dtype=np.uint64)
+    for column in codes.T.astype(np.uint64):
+        hashes = hashes * HASH_MULTIPLIER + column + np.uint64(1)
+    return hashes
+
+
+def normalize_lp_number(lp_number):
+    """Replace every character by the first character of its confusion group, so confused readings become equal."""
+    return lp_number.upper().translate(_NORMALIZATION)
@@ -1,5 +1,5 @@
-import cv2
 from itertools import compress
+from RectArray import group_rects, rects_overlap_any
 
 
 def get_non_overlapping_rects(rects1, rects2):
@@ -8,14 +8,13 @@ def get_non_overlapping_rects(rects1, rects2):
         return []
     if len(rects2) < 1:
         return rects1
-    gr = cv2.groupRectangles(rects1 + rects2, 1, 0.5)[0]
-    if len(gr) < 1:  # Condition is True if no rectangles are overlapping
+    grouped_rects = group_rects(rects1 + rects2, 1, 0.5)
+    if len(grouped_rects) < 1:  # Condition is True if no rectangles are overlapping
         return rects1
-    grouped_rects = list(zip(gr[:, 0], gr[:, 1], gr[:, 2], gr[:, 3]))
     # Get rects from rects1 that do not overlap grouped rects. This way less comparisons are required than
     # checking if a rect from rects1 overlaps any of rects from rects2
-    is_not_overlapping = list(map(is_rect_not_overlapping_rects, rects1, [grouped_rects] * len(rects1)))
-    return list(compress(rects1, is_not_overlapping))
+    is_overlapping = rects_overlap_any(rects1, grouped_rects)
+    return list(compress(rects1, ~is_overlapping))
 
 
 def is_rect_not_overlapping_rects(rect, rects):
@@ -34,8 +33,7 @@ def is_rect_within(outer_rect, inner_rect):
 def merge_overlapping_rects(rects):
     if len(rects) == 0:
         return []
-    rects.extend(rects.copy())
-    gr = cv2.groupRectangles(rects, 1, 0.5)[0]
+    gr = group_rects(rects, 1, 0.5, copies=2)  # Every rect is counted twice, so single rects are kept too
     return list(zip(gr[:, 0], gr[:, 1], gr[:, 2], gr[:, 3]))
 
 
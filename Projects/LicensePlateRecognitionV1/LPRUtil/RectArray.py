@@ -0,0 +1,131 @@
+import numpy as np
+
+# Rectangles are handled as int32 arrays of shape (N, 4) with columns x, y, width, height
+
+
+def as_rect_array(rects):
+    return np.asarray(rects, dtype=np.int32).reshape((-1, 4))
+
+
+def get_grid_candidate_pairs(rects1, rects2, cell_size):
+    """Get pairs (i, j) of rects1[i] and rects2[j] sharing at least one cell of a uniform grid. Any pair of touching
+    rectangles is among them, so only candidates need to be checked exactly instead of all N * M pairs."""
+    # Grid starts at the top-left corner of all rectangles and is wide enough for all of them
+    origin = np.minimum(np.min(rects1[:, :2], axis=0), np.min(rects2[:, :2], axis=0))
+    max_x = max(np.max(rects1[:, 0] + rects1[:, 2]), np.max(rects2[:, 0] + rects2[:, 2]))
+    grid_w = int((max_x - origin[0]) // cell_size) + 1
+    cells1, idx1 = _get_rect_cells(rects1, cell_size, origin, grid_w)
+    cells2, idx2 = _get_rect_cells(rects2, cell_size, origin, grid_w)
+    order = np.argsort(cells2, kind='stable')
+    cells2, idx2 = cells2[order], idx2[order]
+    starts = np.searchsorted(cells2, cells1, side='left')
+    counts = np.searchsorted(cells2, cells1, side='right') - starts
+    # Every cell entry of rects1 is paired with every entry of rects2 in the same cell
+    pair_idx1 = np.repeat(idx1, counts)
+    pair_idx2 = idx2[np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(np.sum(counts))]
+    pairs = np.unique(np.stack((pair_idx1, pair_idx2), axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _get_rect_cells(rects, cell_size, origin, grid_w):
+    """Ids of all grid cells covered by every rectangle, including its right and bottom edge."""
+    x, y = rects[:, 0].astype(np.int64) - origin[0], rects[:, 1].astype(np.int64) - origin[1]
+    x0, y0 = x // cell_size, y // cell_size
+    x1, y1 = (x + rects[:, 2]) // cell_size, (y + rects[:, 3]) // cell_size
+    n_x, n_y = x1 - x0 + 1, y1 - y0 + 1
+    n_cells = n_x * n_y
+    idx = np.repeat(np.arange(rects.shape[0]), n_cells)
+    cell_offsets = np.arange(np.sum(n_cells)) - np.repeat(np.cumsum(n_cells) - n_cells, n_cells)
+    cell_x = np.repeat(x0, n_cells) + cell_offsets % np.repeat(n_x, n_cells)
+    cell_y = np.repeat(y0, n_cells) + cell_offsets // np.repeat(n_x, n_cells)
+    return cell_y * grid_w + cell_x, idx
+
+
+def group_rects(rects, group_threshold=1, eps=0.5, copies=1):
+    """Same result as cv2.groupRectangles(rects * copies, group_threshold, eps)[0]. Passing every rectangle more than
+    once is a way to keep rectangles without similar ones, copies does it without duplicating the list."""
+    rects = as_rect_array(rects)
+    if rects.shape[0] == 0 or group_threshold <= 0:
+        return rects
+    labels = _partition_similar_rects(rects, eps)
+    n_classes = np.max(labels) + 1
+    weights = np.bincount(labels, minlength=n_classes) * copies
+    sums = np.zeros((n_classes, 4), dtype=np.int64)
+    np.add.at(sums, labels, rects.astype(np.int64) * copies)
+    # Average is computed in single precision and rounded to nearest even, like OpenCV does
+    scales = np.float32(1) / weights.astype(np.float32)
+    grouped = np.rint(sums.astype(np.float32) * scales[:, None]).astype(np.int32)
+    # Filter out rectangles which don't have enough similar rectangles and small ones inside large ones
+    is_kept = weights > group_threshold
+    dx = np.rint(grouped[:, 2] * eps).astype(np.int32)
+    dy = np.rint(grouped[:, 3] * eps).astype(np.int32)
+    x, y, w, h = grouped[:, 0:1], grouped[:, 1:2], grouped[:, 2:3], grouped[:, 3:4]
+    n1, n2 = weights[:, None], weights[None, :]
+    is_inside = ((x >= grouped[:, 0] - dx) & (y >= grouped[:, 1] - dy) &
+                 (x + w <= grouped[:, 0] + grouped[:, 2] + dx) & (y + h <= grouped[:, 1] + grouped[:, 3] + dy) &
+                 ((n2 > np.maximum(3, n1)) | (n1 < 3)) & is_kept[None, :])
+    np.fill_diagonal(is_inside, False)
+    return grouped[is_kept & ~np.any(is_inside, axis=1)]
+
+
+def _partition_similar_rects(rects, eps):
+    """Label connected groups of similar rectangles, labels are ordered by the first rectangle of a group."""
+    x1, y1, w, h = (rects[:, i].astype(np.int64) for i in range(4))
+    x2, y2 = x1 + w, y1 + h
+    delta = eps * (np.minimum(w[:, None], w) + np.minimum(h[:, None], h)) * 0.5
+    is_similar = ((np.abs(x1[:, None] - x1) <= delta) & (np.abs(y1[:, None] - y1) <= delta) &
+                  (np.abs(x2[:, None] - x2) <= delta) & (np.abs(y2[:, None] - y2) <= delta))
+    # Propagate the lowest index through similar rectangles until every group has a single label
+    labels = np.arange(rects.shape[0])
+    while True:
+        new_labels = np.min(np.where(is_similar, labels[None, :], rects.shape[0]), axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return np.unique(labels, return_inverse=True)[1].reshape(-1)
+
+
+def rects_iou_matrix(rects1, rects2):
+    """Intersection over union of every pair of rectangles, array of shape (N, M)."""
+    rects1, rects2 = as_rect_array(rects1).astype(np.float64), as_rect_array(rects2).astype(np.float64)
+    x1, y1, w1, h1 = (rects1[:, i:i + 1] for i in range(4))
+    x2, y2, w2, h2 = (rects2[:, i] for i in range(4))
+    inter_w = np.clip(np.minimum(x1 + w1, x2 + w2) - np.maximum(x1, x2), 0, None)
+    inter_h = np.clip(np.minimum(y1 + h1, y2 + h2) - np.maximum(y1, y2), 0, None)
+    intersection = inter_w * inter_h
+    union = w1 * h1 + w2 * h2 - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def rects_overlap(rects1, rects2):
+    """Elementwise Rect.rect_overlap of two arrays of rectangles of equal length."""
+    x11, y11, x21, y21 = rects1[..., 0], rects1[..., 1], rects2[..., 0], rects2[..., 1]
+    x12, y12, x22, y22 = x11 + rects1[..., 2], y11 + rects1[..., 3], x21 + rects2[..., 2], y21 + rects2[..., 3]
+    # A corner of one rectangle is inside the other if one of its x and one of its y coordinates are within bounds
+    r1_corner_in_r2 = (((x21 <= x11) & (x11 <= x22)) | ((x21 <= x12) & (x12 <= x22))) & \
+                      (((y21 <= y11) & (y11 <= y22)) | ((y21 <= y12) & (y12 <= y22)))
+    r2_corner_in_r1 = (((x11 <= x21) & (x21 <= x12)) | ((x11 <= x22) & (x22 <= x12))) & \
+                      (((y11 <= y21) & (y21 <= y12)) | ((y11 <= y22) & (y22 <= y12)))
+    return r1_corner_in_r2 | r2_corner_in_r1
+
+
+def rects_overlap_any(rects1, rects2, max_dense_pairs=4096):
+    """For every rectangle from rects1 check if it overlaps any rectangle from rects2, as Rect.rect_overlap does.
+    Large sets are checked only on candidate pairs from a uniform grid instead of the full overlap matrix."""
+    rects1, rects2 = as_rect_array(rects1), as_rect_array(rects2)
+    if rects1.shape[0] == 0 or rects2.shape[0] == 0:
+        return np.zeros(rects1.shape[0], dtype=bool)
+    if rects1.shape[0] * rects2.shape[0] <= max_dense_pairs:
+        return np.any(rects_overlap_matrix(rects1, rects2), axis=1)
+    # Grid cells about twice the size of an average rectangle keep the number of cells per rectangle small
+    cell_size = max(1, int(2 * np.mean(np.concatenate((rects1[:, 2:], rects2[:, 2:])))))
+    idx1, idx2 = get_grid_candidate_pairs(rects1, rects2, cell_size)
+    is_overlapping = np.zeros(rects1.shape[0], dtype=bool)
+    is_overlapping[idx1[rects_overlap(rects1[idx1], rects2[idx2])]] = True
+    return is_overlapping
+
+
+def rects_overlap_matrix(rects1, rects2):
+    """Rect.rect_overlap of every pair of rectangles, boolean array of shape (N, M)."""
+    rects1, rects2 = as_rect_array(rects1), as_rect_array(rects2)
+    return rects_overlap(rects1[:, None, :], rects2[None, :, :])
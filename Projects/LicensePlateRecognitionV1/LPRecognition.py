@@ -1,60 +1,511 @@
-import numpy as np
+import asyncio
+import importlib.util
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import sys
+import time
+from threading import Event
 import cv2
-from queue import Queue as qQueue
+from queue import Empty, Queue as qQueue
+from LPFrameBuffer import LPFrameBuffer
+from SharedFrameRing import SharedFrameRing
+from LPFrameSources import LPFrameSources
+from LPVideoReader import LPVideoReader
+from LPDetectionPool import LPDetectionPool
+from LPOCRPool import LPOCRPool
+from LPMetrics import LPMetrics
+from LPTrackerScheduler import LPTrackerScheduler
+from LPResultsStore import LPResultsStore
+from OCRModel.Backends import get_preload_modules
+
+# Modules imported by subprocesses of every role, a forkserver imports them once before forking subprocesses
+PRELOAD_MODULES = ['numpy', 'cv2', 'SharedFrameRing', 'LPMetrics', 'LPDetectionProcess', 'LPTracker', 'LPOCRProcess']
+
+
+def start_forkserver(preload_modules):
+    """Start a forkserver which imports preload_modules once. Forkserver skips modules it cannot import without any
+    error, so modules that cannot be found raise ImportError here. Forkserver of Python 3.11 does not use sys.path
+    sent by this process, so it gets sys.path through PYTHONPATH, otherwise project modules are not found."""
+    missing_modules = [name for name in preload_modules
+                       if name not in sys.modules and importlib.util.find_spec(name) is None]
+    if len(missing_modules) > 0:
+        raise ImportError('Modules cannot be preloaded: ' + ', '.join(missing_modules))
+    multiprocessing.set_forkserver_preload(preload_modules)
+    python_path = os.environ.get('PYTHONPATH')
+    os.environ['PYTHONPATH'] = os.pathsep.join(os.path.abspath(path) for path in sys.path)
+    try:
+        multiprocessing.forkserver.ensure_running()
+    finally:
+        if python_path is None:
+            del os.environ['PYTHONPATH']
+        else:
+            os.environ['PYTHONPATH'] = python_path
 
 
 # This is only a selected fragment of LPRecognition class
 class LPRecognition:
     def __init__(self):
-        pass
+        self.frame_rings = {}  # Shared memory slots of frames sent to subprocesses, one ring for every source
+        self.frame_ring_slots = 8
+        # With more than one detection worker frames are striped between a pool of detection processes
+        self.detection_workers = 1
+        self.detection_policy = 'least_loaded'
+        self.detection_pool = None
+        self.pooled_frames = {}  # (source id, frame id) -> task data of frames submitted to the pool
+        self.cycle_lp_bounding_boxes = {}  # Source id -> boxes found on the frame of the running update cycle
+        self.next_cycle_source_id = 0  # With many sources update cycles start with frames of sources in turns
+        self.detection_options = {}  # Optional LPDetectionProcess settings, e.g. {'motion_gating': True}
+        # With OCR workers tracker processes only preprocess license plates and OCR runs in a separate pool
+        self.ocr_workers = 0
+        self.ocr_pool = None
+        # Standby OCR processes load the model in advance and replace OCR processes that died
+        self.ocr_standby_workers = 0
+        # Trackers read only their ocr_top_k best crops of at least min_ocr_quality, see LPTracker.add_crop
+        self.ocr_top_k = 5
+        self.min_ocr_quality = 0.2
+        # Stage latencies, counters and loads of the main process and subprocesses, disabled metrics cost nothing.
+        # They are written every metrics_export_interval frames to metrics_path (.prom/.txt for Prometheus text
+        # format, JSON otherwise) and served over HTTP on metrics_port, if those are set.
+        self.metrics_enabled = False
+        self.metrics = LPMetrics(enabled=False)
+        self.metrics_path = None
+        self.metrics_port = None
+        self.metrics_export_interval = 100
+        # Headless mode makes no HighGUI calls, frames are processed as fast as subprocesses allow, unless pacing to
+        # source's timestamps is on, e.g. for live replay of a recording. Processing is stopped by calling stop().
+        self.headless = False
+        self.pace_to_source = False
+        self.stop_event = Event()
+        self.pacing_start = None  # (time.monotonic(), source timestamp in ms) of the first paced frame
+        # New trackers are placed by estimated cost, see LPTrackerScheduler
+        self.tracker_scheduler = None
+        # Frames are decoded ahead on a background thread, see LPVideoReader for policies of a full buffer
+        self.reader_policy = 'lossless'
+        self.reader_slots = 8
+        self.reader_frame_stride = 1
+        # Frames waiting to be displayed are kept in frame_q_size + max_awaiting_frames preallocated slots,
+        # see LPFrameBuffer for overflow policies
+        self.max_awaiting_frames = 32
+        self.frame_buffer_policy = 'drop_new'
+        # With results_path set, results of every main loop are written to a SQLite database by LPResultsStore
+        self.results_path = None
+        self.results_retention_days = None
+        self.results_store = None
+        # With watchlist set (LPWatchlist), results get 'watchlist_matches' within watchlist_distance of lp numbers
+        self.watchlist = None
+        self.watchlist_distance = 1.0
+        # Start method of subprocesses, None keeps the platform default. With 'forkserver' subprocesses are forked from
+        # a server process which has imported PRELOAD_MODULES and libraries of the OCR backend. Dead pool workers are
+        # replaced by new processes only with a start method other than 'fork', see replace_dead_workers.
+        self.start_method = None
 
-    def distribute_new_track_windows_to_processes(self, track_windows):
-        """Distribute new track windows to tracker processes based on the load they are under."""
-        loads = np.array([trackers_process.load for trackers_process in self.trackers_processes], dtype=np.uint8)
+    def distribute_new_track_windows_to_processes(self, track_windows, source_id=None):
+        """Distribute new track windows to tracker processes based on estimated costs of the windows and of trackers
+        the processes already run. Windows that do not fit anywhere are counted as dropped. With many sources
+        windows are sent as (source id, track window), so trackers are created in their source's namespace and are
+        updated only with its frames."""
+        if self.tracker_scheduler is None:
+            self.tracker_scheduler = LPTrackerScheduler(len(self.trackers_processes), self.max_trackers_per_process)
+        loads = [trackers_process.load for trackers_process in self.trackers_processes]
+        dropped_count = self.tracker_scheduler.dropped_count
         distributed_track_windows = [[] for _ in range(len(self.trackers_processes))]
-        for track_window in track_windows:
-            if np.min(loads) < self.max_trackers_per_process:  # Send new tracker to sub_process with the lowest load
-                min_load_idx = np.argmin(loads)
-                distributed_track_windows[min_load_idx].extend([track_window])
-                loads[min_load_idx] += 1
+        for track_window, process_idx in zip(track_windows, self.tracker_scheduler.assign(track_windows, loads)):
+            if process_idx is None:
+                continue
+            if source_id is not None:
+                track_window = (source_id, track_window)
+            distributed_track_windows[process_idx].extend([track_window])
+        self.metrics.count('dropped_track_windows', self.tracker_scheduler.dropped_count - dropped_count)
         return distributed_track_windows
 
-    def detect_lp_in_video(self, path):
-        cap = cv2.VideoCapture(path)
-        self.init_sub_processes()
-        frame_q = qQueue()
-        frames_to_put_in_q = []
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            if cv2.waitKey(25) & 0xFF == ord('q'):
-                break
-            if frame_q.qsize() + len(frames_to_put_in_q) < self.frame_q_size:  # First fill buffer queue
-                frame_q.put(frame)
-                continue
-            # If all processes are ready start a new update cycle
-            if not self.all_updating():  # max 0.00018s
-                self.send_frame_to_detector(frame)
-                self.update_trackers(frame)
-            if self.any_updating():  # max 0.00001s
-                frames_to_put_in_q.extend([frame])
-            # Check if any process has sent any new information
-            self.receive_detector_data()  # max 0.00008s
-            self.receive_tracker_data()  # max 0.00008s
-            # If all trackers finished updating positions send new trackers to be initialized
-            if self.received_all_data():  # max 0.007s
-                track_windows = self.get_track_windows()
-                self.start_new_trackers(self.get_lp_bounding_boxes(), track_windows)
-                self.save_results(self.get_ocr_results())
-                if self.show_detections:
-                    self.draw_tracked_objects(frames_to_put_in_q[0], track_windows,
-                                              self.detection_color, self.detection_thickness)
-                self.load_frames_to_q(frames_to_put_in_q, frame_q)
-                frames_to_put_in_q = []
-            popped_frame = frame_q.get(timeout=5)
-            if self.show_detections:
-                cv2.namedWindow('License plate detections', cv2.WINDOW_NORMAL)
-                cv2.imshow('License plate detections', popped_frame)
+    def collect_subprocess_metrics(self, response):
+        """Merge metrics sent by a subprocess along with its response. Tracker processes and a single detection
+        process send them like detection pool workers do, under 'metrics' key."""
+        self.metrics.merge(response.get('metrics'))
+
+    def export_metrics(self, frame_q_depth, video_readers=()):
+        self.metrics.set_gauge('frame_q_depth', frame_q_depth)
+        for i, video_reader in enumerate(video_readers):
+            for name, value in video_reader.get_stats().items():
+                self.metrics.set_gauge('reader_' + name, value, source=str(i))
+        for i, trackers_process in enumerate(self.trackers_processes):
+            self.metrics.set_gauge('trackers_process_load', int(trackers_process.load), trackers_process=str(i))
+        if self.detection_pool is not None:
+            self.detection_pool.report_loads()
+            self.metrics.set_gauge('detection_workers_replaced', self.detection_pool.replaced_count)
+            self.metrics.set_gauge('detection_workers_removed', int(self.detection_pool.removed.sum()))
+        if self.ocr_pool is not None:
+            self.ocr_pool.receive_status()
+            for name, startup_seconds in self.ocr_pool.startup_times.items():
+                self.metrics.set_gauge('ocr_worker_startup_seconds', startup_seconds, worker=name)
+            self.metrics.set_gauge('ocr_workers_replaced', self.ocr_pool.replaced_count)
+            self.metrics.set_gauge('ocr_workers_missing', self.ocr_pool.n_workers - len(self.ocr_pool.workers))
+        if self.results_store is not None:
+            for name, value in self.results_store.get_stats().items():
+                self.metrics.set_gauge('results_store_' + name, value)
+        self.metrics.publish()
+        if self.metrics_path is not None:
+            self.metrics.write(self.metrics_path)
+
+    def pace_frame(self, cap):
+        """Wait until the time of the last read frame's source timestamp relative to the first paced frame."""
+        timestamp_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if self.pacing_start is None:
+            self.pacing_start = (time.monotonic(), timestamp_ms)
+            return
+        delay = self.pacing_start[0] + (timestamp_ms - self.pacing_start[1]) / 1000 - time.monotonic()
+        if delay > 0:
+            self.stop_event.wait(delay)  # Stop signal interrupts waiting
+
+    def stop(self):
+        """Stop processing a video, can be called from another thread."""
+        self.stop_event.set()
+
+    def get_frame_task_data(self, frame, frame_id, source_id=0):
+        """Put frame in shared memory and get data which subprocesses use to map it instead of receiving a copy."""
+        frame_ring = self.frame_rings.get(source_id)
+        if frame_ring is None or not frame_ring.fits(frame):  # Source resolution can change
+            if frame_ring is not None:
+                frame_ring.close()
+            frame_ring = self.frame_rings[source_id] = SharedFrameRing(self.frame_ring_slots, frame.shape,
+                                                                       frame.dtype)
+        return {**frame_ring.task_data(frame, frame_id), 'source_id': source_id}
+
+    def init_detection_pool(self):
+        self.detection_pool = LPDetectionPool(self.detection_workers, self.proportions, self.proportions_sigma,
+                                              self.max_par_angle, self.max_perp_angle, policy=self.detection_policy,
+                                              metrics=self.metrics, **self.detection_options)
+        # Frames processed by the pool stay in their slots until they are released, the newest released frame until
+        # trackers are updated with it, so there can be up to twice as many frames written as the pool processes
+        self.frame_ring_slots = max(self.frame_ring_slots, 2 * self.detection_pool.capacity + 2)
+        self.pooled_frames = {}
+        self.cycle_lp_bounding_boxes = {}
+        self.detection_pool.start()
+
+    def init_start_method(self):
+        """Has to be called before any subprocess or queue is created. The forkserver is started once, later calls
+        only keep the start method."""
+        if self.start_method is None:
+            return
+        multiprocessing.set_start_method(self.start_method, force=True)
+        if self.start_method == 'forkserver':
+            preload_modules = PRELOAD_MODULES
+            if self.ocr_workers > 0:
+                preload_modules = preload_modules + get_preload_modules([self.ocr_model_class])
+            start_forkserver(preload_modules)
+
+    def init_metrics(self):
+        """Metrics have to be initialized before subprocesses, which enable their own metrics if these are enabled."""
+        self.metrics = LPMetrics(enabled=self.metrics_enabled)
+
+    def start_metrics_server(self):
+        """Metrics server is started after subprocesses, so none of them is forked while its thread runs."""
+        if self.metrics_port is not None:
+            self.metrics.serve(self.metrics_port)
+
+    def replace_dead_workers(self):
+        """Replace dead workers of the detection and OCR pools. Threads of the video reader, results store and metrics
+        server run at this point and a forked process would inherit their locks in whatever state they are. So with
+        the 'fork' start method no process is started, dead workers are replaced only by standby OCR workers and the
+        pools go on with fewer workers."""
+        start_new = multiprocessing.get_start_method() != 'fork'
+        if self.detection_pool is not None:  # Otherwise frames taken by a dead worker stop detection
+            self.detection_pool.replace_dead_workers(start_new)
+        if self.ocr_pool is not None:
+            self.ocr_pool.replace_dead_workers(start_new)
+
+    def init_ocr_pool(self):
+        """OCR pool has to be started before tracker processes, every one of them gets its own pool client."""
+        self.ocr_pool = LPOCRPool(self.ocr_workers, self.n_trackers_processes, self.ocr_model_class,
+                                  n_standby=self.ocr_standby_workers)
+        self.ocr_pool.start()
+
+    def init_results_store(self):
+        """Results store is opened after subprocesses are started, so none of them is forked while its writer thread
+        runs."""
+        if self.results_path is not None:
+            self.results_store = LPResultsStore(self.results_path, retention_days=self.results_retention_days)
+
+    def store_results(self, ocr_results):
+        """Queue results for the results store. They are written by its writer thread, so the main loop never waits
+        for the database."""
+        if self.results_store is not None:
+            with self.metrics.time('save_results'):
+                self.results_store.put_many(ocr_results)
+
+    def close_sub_processes(self):
         self.kill_detector_process()
+        if self.detection_pool is not None:
+            self.detection_pool.kill()
+            self.detection_pool = None
         self.close_trackers()
+        if self.ocr_pool is not None:
+            self.ocr_pool.kill()
+            self.ocr_pool = None
+        for frame_ring in self.frame_rings.values():
+            frame_ring.close()
+        self.frame_rings = {}
+        if self.results_store is not None:  # Queued results are written before the last export of its stats
+            self.results_store.close()
+        self.export_metrics(0)
+        self.results_store = None
+        self.metrics.close()
+
+    def submit_to_detection_pool(self, frame, frame_id, source_id=0, active_source_ids=None):
+        """Send frame to the detection pool if any of its workers is free. With active_source_ids, frame is sent only if
+        its source has not submitted more frames than any other active source, so a source whose frames are read
+        just when workers become free cannot take the pool from the others. Returns task data of a submitted frame."""
+        if not self.detection_pool.has_free_worker():
+            return None
+        if active_source_ids is not None:
+            submitted_counts = self.detection_pool.submitted_counts
+            if submitted_counts.get(source_id, 0) > min(submitted_counts.get(i, 0) for i in active_source_ids):
+                return None
+        frame_data = self.get_frame_task_data(frame, frame_id, source_id)
+        self.detection_pool.submit(frame_data)
+        self.pooled_frames[(source_id, frame_id)] = frame_data
+        return frame_data
+
+    def start_pooled_update_cycle(self, source_id=0):
+        """Update trackers of a source with the newest frame for which the pool has released results, so boxes passed
+        to start_new_trackers at the end of the cycle were found on the same frame as track windows. Results of older
+        released frames are superseded, trackers are never updated with those frames. Returns False if no frame was
+        released since the last cycle or the frame was already overwritten in its ring."""
+        ordered_results = self.detection_pool.pop_ordered_results(source_id)
+        frames_data = [self.pooled_frames.pop((source_id, frame_id)) for frame_id, _ in ordered_results]
+        if len(ordered_results) == 0:
+            return False
+        self.metrics.count('superseded_detections', len(ordered_results) - 1)
+        frame_data = frames_data[-1]
+        frame_ring = self.frame_rings.get(source_id)
+        if frame_ring is None or frame_ring.spec() != frame_data['frame_ring'] or \
+                frame_ring.get(frame_data['slot'], frame_data['frame_id']) is None:
+            self.metrics.count('overwritten_detections')
+            return False
+        self.cycle_lp_bounding_boxes[source_id] = ordered_results[-1][1]
+        self.update_trackers(frame_data)
+        return True
+
+    def start_next_pooled_update_cycle(self, n_sources):
+        """Start an update cycle with the next source in turn which has a released frame, so trackers of every source
+        are updated equally often. Returns False if no source has a released frame."""
+        for i in range(n_sources):
+            source_id = (self.next_cycle_source_id + i) % n_sources
+            if self.start_pooled_update_cycle(source_id):
+                self.next_cycle_source_id = source_id + 1
+                return True
+        return False
+
+    def get_pooled_lp_bounding_boxes(self, source_id=0):
+        """Get boxes found on the frame with which trackers of a source were updated in the finished update cycle."""
+        return self.cycle_lp_bounding_boxes.pop(source_id, [])
+
+    def match_watchlist(self, ocr_results):
+        """Add (watchlist plate, distance) matches to OCR results of tracks finished in an update cycle. All results are
+        queried at once, while the watchlist can be reloaded in the background."""
+        if self.watchlist is None:
+            return ocr_results
+        with self.metrics.time('match_watchlist'):
+            matches = self.watchlist.query_batch([ocr_result['lp_number'] for ocr_result in ocr_results],
+                                                 self.watchlist_distance)
+        for ocr_result, lp_matches in zip(ocr_results, matches):
+            ocr_result['watchlist_matches'] = lp_matches
+            if len(lp_matches) > 0:
+                self.metrics.count('watchlist_matches')
+        return ocr_results
+
+    def stream(self, source):
+        """Yield plate events (see LPTracker.get_plate_event) as tracks finish. Video is read only as fast as events
+        are consumed, closing the generator stops processing."""
+        for plate_events in self.process_video(source):
+            yield from plate_events
+
+    async def astream(self, source, max_buffered_events=64):
+        """Asynchronous version of stream. Video is processed in a worker thread, which waits while
+        max_buffered_events events are not consumed yet. To stop processing when leaving the loop early, iterate
+        inside contextlib.aclosing."""
+        events = qQueue(maxsize=max_buffered_events)
+        stream_end = object()
+
+        def produce_events():
+            try:
+                for plate_event in self.stream(source):
+                    events.put(plate_event)
+            finally:
+                events.put(stream_end)
+
+        loop = asyncio.get_running_loop()
+        producer = loop.run_in_executor(None, produce_events)
+        try:
+            while True:
+                plate_event = await loop.run_in_executor(None, events.get)
+                if plate_event is stream_end:
+                    break
+                yield plate_event
+        finally:
+            self.stop()
+            while not producer.done():  # Producer can be waiting for free space in the buffer
+                try:
+                    events.get_nowait()
+                except Empty:
+                    await asyncio.sleep(0.01)
+            await producer
+
+    def detect_lp_in_video(self, path):
+        """Process a video and save its results. With results_path set, results are written to the results store by
+        process_video and can be queried with LPResultsStore opened on results_path."""
+        for ocr_results in self.process_video(path):
+            if self.results_path is None:
+                self.save_results(ocr_results)
+
+    def process_video(self, path):
+        """Generator running the main loop, which yields OCR results of tracks finished in every update cycle. Loop
+        advances only when the next results are requested, so a slow consumer slows down reading the video instead
+        of results piling up. Subprocesses are closed when the generator is exhausted or closed."""
+        self.init_start_method()
+        self.init_metrics()
+        SharedFrameRing.share_resource_tracker()
+        if self.ocr_workers > 0:
+            self.init_ocr_pool()
+        if self.detection_workers > 1:
+            self.init_detection_pool()
+        self.init_sub_processes(start_detector=self.detection_pool is None)
+        self.init_results_store()
+        self.start_metrics_server()
+        # Decoding thread is started after subprocesses, so none of them is forked while it runs
+        cap = LPVideoReader(path, self.reader_policy, self.reader_slots, self.reader_frame_stride)
+        frame_buffer = LPFrameBuffer(self.frame_q_size + self.max_awaiting_frames, self.frame_buffer_policy)
+        frame_id = -1
+        self.stop_event.clear()
+        self.pacing_start = None
+        show_detections = self.show_detections and not self.headless
+        if show_detections:
+            cv2.namedWindow('License plate detections', cv2.WINDOW_NORMAL)
+        try:
+            while cap.isOpened() and not self.stop_event.is_set():
+                slot = frame_buffer.acquire()  # Frame is decoded straight into a buffer slot, if one is available
+                with self.metrics.time('frame_read'):
+                    ret, frame = cap.read(out=None if slot is None else frame_buffer.frames[slot])
+                if not ret:
+                    if slot is not None:
+                        frame_buffer.release(slot)
+                    break
+                if slot is not None:
+                    frame_buffer.set_frame(slot, frame)
+                frame_id += 1
+                self.metrics.count('frames_read')
+                if self.pace_to_source:
+                    self.pace_frame(cap)
+                if not self.headless and cv2.waitKey(25) & 0xFF == ord('q'):
+                    break
+                if len(frame_buffer) < self.frame_q_size:  # First fill the buffer
+                    if slot is not None:
+                        frame_buffer.set_displayable(slot)
+                    continue
+                # Detection pool receives every frame while any of its workers is free, not once per update cycle
+                if self.detection_pool is not None:
+                    self.submit_to_detection_pool(frame, frame_id)
+                    self.detection_pool.receive()
+                # If all processes are ready start a new update cycle
+                if not self.all_updating():
+                    if self.detection_pool is None:  # Only slot and frame id go through queues
+                        frame_data = self.get_frame_task_data(frame, frame_id)
+                        self.send_frame_to_detector(frame_data)
+                        self.update_trackers(frame_data)
+                    else:  # Trackers are updated with a frame on which detection has already finished
+                        self.start_pooled_update_cycle()
+                if slot is not None:
+                    if self.any_updating():  # Frame waits for results of the update cycle before it is displayed
+                        frame_buffer.set_awaiting(slot)
+                    else:
+                        frame_buffer.release(slot)
+                # Check if any process has sent any new information
+                with self.metrics.time('receive_detector_data'):
+                    self.receive_detector_data()
+                with self.metrics.time('receive_tracker_data'):
+                    self.receive_tracker_data()
+                # If all trackers finished updating positions send new trackers to be initialized
+                if self.received_all_data():
+                    with self.metrics.time('finish_update_cycle'):
+                        track_windows = self.get_track_windows()
+                        if self.detection_pool is None:
+                            lp_bounding_boxes = self.get_lp_bounding_boxes()
+                        else:
+                            lp_bounding_boxes = self.get_pooled_lp_bounding_boxes()
+                        self.start_new_trackers(lp_bounding_boxes, track_windows)
+                        ocr_results = self.get_ocr_results()
+                        released_slots = frame_buffer.release_awaiting()
+                        if show_detections and len(released_slots) > 0:
+                            self.draw_tracked_objects(frame_buffer.frames[released_slots[0]], track_windows,
+                                                      self.detection_color, self.detection_thickness)
+                    if len(ocr_results) > 0:
+                        ocr_results = self.match_watchlist(ocr_results)
+                        self.store_results(ocr_results)
+                        yield ocr_results
+                if frame_id % self.metrics_export_interval == 0:
+                    self.replace_dead_workers()
+                    self.metrics.set_gauge('frame_buffer_dropped', frame_buffer.dropped_count)
+                    self.export_metrics(len(frame_buffer), [cap])
+                displayed_slot = frame_buffer.pop_displayable()
+                if displayed_slot is not None:
+                    if show_detections:
+                        cv2.imshow('License plate detections', frame_buffer.frames[displayed_slot])
+                    frame_buffer.release(displayed_slot)
+        finally:
+            cap.release()
+            self.close_sub_processes()
+
+    def process_sources(self, sources):
+        """Multi-source version of process_video. Sources are read in turns and their frames share the detection pool,
+        tracker processes and the OCR pool, so the number of processes depends on settings, not on the number of
+        sources. Sources take equal shares of detection workers and update cycles. Frame ids, frame rings, detection
+        results and tracker namespaces are kept separately for every source. Yields OCR results of tracks finished
+        in every update cycle."""
+        self.init_start_method()
+        self.init_metrics()
+        SharedFrameRing.share_resource_tracker()
+        if self.ocr_workers > 0:
+            self.init_ocr_pool()
+        self.init_detection_pool()  # Pool tags detection results with source ids, even with a single worker
+        self.init_sub_processes(start_detector=False)
+        self.init_results_store()
+        self.start_metrics_server()
+        # Decoding threads are started after subprocesses, so none of them is forked while they run
+        frame_sources = LPFrameSources(sources, self.reader_policy, self.reader_slots, self.reader_frame_stride)
+        self.stop_event.clear()
+        self.next_cycle_source_id = 0
+        frames_read = 0
+        try:
+            while not self.stop_event.is_set():
+                with self.metrics.time('frame_read'):
+                    source_frame = frame_sources.read()
+                if source_frame is None:
+                    break
+                source_id, frame_id, frame = source_frame
+                frames_read += 1
+                self.metrics.count('frames_read')
+                self.submit_to_detection_pool(frame, frame_id, source_id, frame_sources.active_sources)
+                self.detection_pool.receive()
+                # Update cycles start with frames of sources in turns, only trackers of the frame's source are updated
+                if not self.all_updating():
+                    self.start_next_pooled_update_cycle(len(frame_sources))
+                with self.metrics.time('receive_tracker_data'):
+                    self.receive_tracker_data()
+                if self.received_all_data():
+                    with self.metrics.time('finish_update_cycle'):
+                        for updated_source_id in list(self.cycle_lp_bounding_boxes):
+                            lp_bounding_boxes = self.get_pooled_lp_bounding_boxes(updated_source_id)
+                            track_windows = self.get_track_windows(updated_source_id)
+                            self.start_new_trackers(lp_bounding_boxes, track_windows, updated_source_id)
+                        ocr_results = self.get_ocr_results()
+                    if len(ocr_results) > 0:
+                        ocr_results = self.match_watchlist(ocr_results)
+                        self.store_results(ocr_results)
+                        yield ocr_results
+                if frames_read % self.metrics_export_interval == 0:
+                    self.replace_dead_workers()
+                    self.export_metrics(0, frame_sources.captures)
+        finally:
+            frame_sources.close()
+            self.close_sub_processes()
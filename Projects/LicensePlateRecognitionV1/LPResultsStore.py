@@ -0,0 +1,237 @@
+import sqlite3
+import time
+from queue import Empty, Full, Queue
+from threading import Event, Thread, local
+import numpy as np
+import cv2
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS plates (
+    id INTEGER PRIMARY KEY,
+    lp_number TEXT NOT NULL,
+    source_id INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    confidence REAL,
+    first_frame_id INTEGER,
+    last_frame_id INTEGER,
+    n_ocr_outputs INTEGER
+);
+CREATE INDEX IF NOT EXISTS plates_lp_number ON plates (lp_number, timestamp);
+CREATE INDEX IF NOT EXISTS plates_timestamp ON plates (timestamp);
+CREATE TABLE IF NOT EXISTS crops (
+    plate_id INTEGER PRIMARY KEY REFERENCES plates (id) ON DELETE CASCADE,
+    image BLOB NOT NULL
+);
+'''
+_COLUMNS = ('id', 'lp_number', 'source_id', 'timestamp', 'confidence', 'first_frame_id', 'last_frame_id',
+            'n_ocr_outputs')
+_SELECT = 'SELECT ' + ', '.join(_COLUMNS) + ' FROM plates'
+
+
+# Recognized plates persisted in SQLite database in WAL mode, so queries do not wait for writes. Plates are put in
+# a bounded queue without blocking and written in batches, one transaction per batch, by a background thread. Plates
+# are indexed by lp number and by time, crops are kept in a separate table, so queries do not read them.
+# Plates older than retention_days are deleted by the writer and freed pages are returned to the file system.
+class LPResultsStore:
+
+    def __init__(self, path, batch_size=256, flush_interval=0.5, max_queued=10000, retention_days=None,
+                 retention_interval=3600, crop_format='.png'):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # Seconds after which queued plates are written, even if batch is not full
+        self.retention_days = retention_days
+        self.retention_interval = retention_interval  # Seconds between deletions of old plates
+        self.crop_format = crop_format
+        self.q = Queue(maxsize=max_queued)
+        self.dropped_count = 0  # Plates that did not fit in the queue
+        self.written_count = 0
+        self.failed_count = 0  # Plates that could not be written, the writer keeps running after a failure
+        self.failed_batches = 0
+        self.last_error = None
+        self.readers = local()  # Connection of every thread running queries
+        self._open(self.path).close()  # Schema is created before the writer starts and queries can run
+        self.thread = Thread(target=self._write_plates, daemon=True)
+        self.thread.start()
+
+    def put(self, plate_event):
+        """Queue plate event (see LPTracker.get_plate_event) to be written without blocking. Returns False if the
+        queue is full and the plate was dropped."""
+        if 'timestamp' not in plate_event:
+            plate_event = {**plate_event, 'timestamp': time.time()}
+        try:
+            self.q.put_nowait(plate_event)
+        except Full:
+            self.dropped_count += 1
+            return False
+        return True
+
+    def put_many(self, plate_events):
+        for plate_event in plate_events:
+            self.put(plate_event)
+
+    def flush(self, timeout=None):
+        """Wait until plates put so far are written. Returns False on timeout."""
+        written = Event()
+        self.q.put(written)
+        return written.wait(timeout)
+
+    def close(self):
+        """Write all queued plates and stop the writer."""
+        if self.thread.is_alive():
+            self.q.put(None)
+            self.thread.join()
+        connection = getattr(self.readers, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.readers.connection = None
+
+    def find_by_plate(self, lp_number, start=None, end=None, source_id=None, limit=None):
+        """Get plates with exactly this lp number, optionally from a time range [start, end) of Unix timestamps,
+        newest first."""
+        return self._find('lp_number = ?', [lp_number], start, end, source_id, limit, 'plates_lp_number')
+
+    def find_by_prefix(self, prefix, start=None, end=None, source_id=None, limit=None):
+        """Get plates whose lp number starts with prefix, newest first. Prefix is a range of the lp number index."""
+        if len(prefix) == 0:
+            return self.find_by_time(start, end, source_id, limit)
+        upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return self._find('lp_number >= ? AND lp_number < ?', [prefix, upper_bound], start, end, source_id, limit,
+                          'plates_lp_number')
+
+    def find_by_time(self, start=None, end=None, source_id=None, limit=None):
+        """Get plates from a time range [start, end) of Unix timestamps, newest first."""
+        return self._find(None, [], start, end, source_id, limit)
+
+    def get_crop(self, plate_id):
+        """Get the best crop of a plate as an image or None."""
+        row = self._get_reader().execute('SELECT image FROM crops WHERE plate_id = ?', (plate_id,)).fetchone()
+        if row is None:
+            return None
+        return cv2.imdecode(np.frombuffer(row[0], dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+
+    def delete_older_than(self, timestamp, connection=None):
+        """Delete plates older than timestamp and compact the database. Returns the number of deleted plates."""
+        own_connection = connection is None
+        if own_connection:
+            connection = self._open(self.path)
+        try:
+            with connection:
+                deleted_count = connection.execute('DELETE FROM plates WHERE timestamp < ?', (timestamp,)).rowcount
+            if deleted_count > 0:  # Free pages are released and WAL is truncated, so the file does not keep growing
+                connection.executescript('PRAGMA incremental_vacuum;')  # Runs to completion, execute frees 1 page
+                connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        finally:
+            if own_connection:
+                connection.close()
+        return deleted_count
+
+    def get_stats(self):
+        return {'queued': self.q.qsize(), 'written': self.written_count, 'dropped': self.dropped_count,
+                'failed': self.failed_count, 'failed_batches': self.failed_batches}
+
+    @staticmethod
+    def _open(path):
+        connection = sqlite3.connect(path, timeout=30)
+        connection.execute('PRAGMA auto_vacuum = INCREMENTAL')  # Has effect only on a new database
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')  # In WAL mode commits stay consistent, only durability waits
+        connection.execute('PRAGMA foreign_keys = ON')
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def _get_reader(self):
+        connection = getattr(self.readers, 'connection', None)
+        if connection is None:
+            connection = self.readers.connection = self._open(self.path)
+        return connection
+
+    def _find(self, condition, parameters, start, end, source_id, limit, index=None):
+        conditions = [] if condition is None else [condition]
+        if start is not None:
+            conditions.append('timestamp >= ?')
+            parameters.append(start)
+        if end is not None:
+            conditions.append('timestamp < ?')
+            parameters.append(end)
+        if source_id is not None:
+            conditions.append('source_id = ?')
+            parameters.append(source_id)
+        query = _SELECT
+        if index is not None:  # Otherwise time index can be chosen to avoid sorting, which scans the whole range
+            query += ' INDEXED BY ' + index
+        if len(conditions) > 0:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY timestamp DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            parameters.append(limit)
+        rows = self._get_reader().execute(query, parameters).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def _write_plates(self):
+        connection = self._open(self.path)
+        next_retention = time.monotonic()
+        stopped = False
+        while not stopped:
+            plate_events, flushed = [], []
+            try:
+                item = self.q.get(timeout=self.flush_interval)
+                while True:  # Take everything that is queued, up to batch_size plates
+                    if item is None:
+                        stopped = True
+                    elif isinstance(item, Event):
+                        flushed.append(item)
+                    else:
+                        plate_events.append(item)
+                    if stopped or len(plate_events) >= self.batch_size:
+                        break
+                    item = self.q.get_nowait()
+            except Empty:
+                pass
+            try:
+                if len(plate_events) > 0:
+                    self._write_batch(connection, plate_events)
+                if self.retention_days is not None and time.monotonic() >= next_retention:
+                    next_retention = time.monotonic() + self.retention_interval  # Failed deletion is not retried
+                    self.delete_older_than(time.time() - self.retention_days * 86400, connection)
+            except Exception as e:  # Writer has to keep running, otherwise flush waits forever and the queue fills up
+                self.last_error = e
+            finally:
+                for written in flushed:
+                    written.set()
+        connection.close()
+
+    def _write_batch(self, connection, plate_events):
+        """Insert plates in one transaction. If the batch fails, plates are inserted one by one, so only plates that
+        cannot be written are lost."""
+        try:
+            self._insert_plates(connection, plate_events)
+            return
+        except Exception as e:
+            self.failed_batches += 1
+            self.last_error = e
+        for plate_event in plate_events:
+            try:
+                self._insert_plates(connection, [plate_event])
+            except Exception as e:
+                self.failed_count += 1
+                self.last_error = e
+
+    def _insert_plates(self, connection, plate_events):
+        with connection:  # One transaction for the whole batch
+            for plate_event in plate_events:
+                confidences = plate_event.get('confidences') or []
+                confidence = float(np.mean(confidences)) if len(confidences) > 0 else None
+                plate_id = connection.execute(
+                    'INSERT INTO plates (lp_number, source_id, timestamp, confidence, first_frame_id, last_frame_id, '
+                    'n_ocr_outputs) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (plate_event['lp_number'], plate_event.get('source_id', 0), plate_event['timestamp'], confidence,
+                     plate_event.get('first_frame_id'), plate_event.get('last_frame_id'),
+                     plate_event.get('n_ocr_outputs'))).lastrowid
+                crop = plate_event.get('best_crop')
+                if crop is not None:
+                    ret, encoded_crop = cv2.imencode(self.crop_format, crop)
+                    if ret:
+                        connection.execute('INSERT INTO crops (plate_id, image) VALUES (?, ?)',
+                                           (plate_id, encoded_crop.tobytes()))
+        self.written_count += len(plate_events)
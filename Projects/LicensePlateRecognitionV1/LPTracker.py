@@ -1,42 +1,165 @@
+import heapq
 import numpy as np
-import pandas as pd
+import LPRUtil.LPQuality as LPRuq
+import LPRUtil.OCRMerge as LPRuom
+from OCRCache import OCRCache
 
 
 class LPTracker:
-    def __init__(self):
-        pass
+    def __init__(self, convergence_updates=10, convergence_margin=0.2, metrics=None, source_id=0, ocr_top_k=5,
+                 min_ocr_quality=0.2, max_trajectory_points=64):
+        # OCR outputs are kept only by trackers without running scores, whose outputs are merged when they finish
+        self.ocr_outputs = []
+        self.n_ocr_outputs = 0
+        self.ocr_scores = None  # Running pseudo probabilities, initialized on the first OCR output
+        self.ocr_length_counts = None
+        self.ocr_reading = ''
+        # Reading is considered converged after it did not change and every position's margin between the best and
+        # second-best character stayed above convergence_margin for convergence_updates OCR outputs in a row
+        self.convergence_updates = convergence_updates
+        self.convergence_margin = convergence_margin
+        self.stable_updates = 0
+        self.converged = False
+        # Tracker's own cache for execute_ocr. With an OCR pool, every OCR worker has a cache shared by all trackers.
+        self.ocr_cache = OCRCache(max_size=32)
+        self.metrics = metrics  # LPMetrics of the process owning the tracker
+        self.source_id = source_id  # Trackers of many sources share processes, frame ids are unique within a source
+        self.first_frame_id = None
+        self.last_frame_id = None
+        # (frame id, bounding box) of every trajectory_stride-th update. When there are more than
+        # max_trajectory_points positions, every other one is dropped and the stride is doubled.
+        self.trajectory = []
+        self.trajectory_stride = 1
+        self.max_trajectory_points = max_trajectory_points
+        self.last_position = None
+        self.position_count = 0
+        # Only crops that are among the ocr_top_k best ones seen so far and have at least min_ocr_quality are read
+        self.ocr_top_k = ocr_top_k
+        self.min_ocr_quality = min_ocr_quality
+        self.best_crops = []  # Min-heap of (quality, crop number) of the best crops
+        self.pending_crops = {}  # Crop number -> (crop, quality) of the best crops, which were not read yet
+        self.crop_count = 0
+        self.skipped_crop_count = 0
+        self.best_crop = None  # Best crop of the track so far, stored with its results
+        self.best_crop_quality = None
+
+    def add_crop(self, cut_out_lp, quality=None):
+        """Score quality of a license plate crop and keep it for OCR if it is among the best crops of the track.
+        Kept crops are read after getting them with pop_crops_for_ocr, a crop pushed out of the best ones before
+        that is never read. Returns True if the crop was kept."""
+        if quality is None:
+            quality = self._get_crop_quality(cut_out_lp)
+        crop_number = self.crop_count
+        self.crop_count += 1
+        if quality < self.min_ocr_quality or (len(self.best_crops) >= self.ocr_top_k and
+                                              quality <= self.best_crops[0][0]):
+            self._skip_crop()
+            return False
+        self.pending_crops[crop_number] = (cut_out_lp.copy(), quality)  # Frame the crop is cut from gets reused
+        if self.best_crop_quality is None or quality > self.best_crop_quality:
+            self.best_crop, self.best_crop_quality = self.pending_crops[crop_number]
+        if len(self.best_crops) < self.ocr_top_k:
+            heapq.heappush(self.best_crops, (quality, crop_number))
+            return True
+        _, worst_crop_number = heapq.heapreplace(self.best_crops, (quality, crop_number))
+        if self.pending_crops.pop(worst_crop_number, None) is not None:
+            self._skip_crop()
+        return True
+
+    def pop_crops_for_ocr(self):
+        """Get (crop, quality) of every kept crop, which was not read yet. OCR outputs should be added with their
+        crop's quality."""
+        crops = list(self.pending_crops.values())
+        self.pending_crops.clear()
+        return crops
+
+    def _get_crop_quality(self, cut_out_lp):
+        if self.metrics is None:
+            return LPRuq.get_lp_quality(cut_out_lp)
+        with self.metrics.time('crop_quality'):
+            return LPRuq.get_lp_quality(cut_out_lp)
+
+    def _skip_crop(self):
+        self.skipped_crop_count += 1
+        if self.metrics is not None:
+            self.metrics.count('skipped_ocr_crops')
+
+    def add_ocr_output(self, ocr_output, quality=1.0):
+        """Update running scores with a new OCR output, weighted by quality of its crop, and check if the reading has
+        converged. Outputs are not kept, running scores contain all information needed to merge them."""
+        self.n_ocr_outputs += 1
+        if self.ocr_scores is None:
+            self.ocr_scores, self.ocr_length_counts = LPRuom.init_running_scores(self.min_lp_length,
+                                                                                 self.max_lp_length)
+        if len(ocr_output) == 0:  # Failed OCR attempts carry no information
+            return
+        LPRuom.add_to_running_scores(self.ocr_scores, self.ocr_length_counts, ocr_output, self.min_lp_length, quality)
+        lp_number, margins = LPRuom.get_running_lp_number(self.ocr_scores, self.ocr_length_counts,
+                                                          self.min_lp_length)
+        if lp_number == self.ocr_reading and margins.size > 0 and np.min(margins) >= self.convergence_margin:
+            self.stable_updates += 1
+        else:
+            self.stable_updates = 0
+        self.ocr_reading = lp_number
+        self.converged = self.stable_updates >= self.convergence_updates
+
+    def add_position(self, frame_id, bounding_box):
+        if self.first_frame_id is None:
+            self.first_frame_id = frame_id
+        self.last_frame_id = frame_id
+        self.last_position = (frame_id, tuple(int(v) for v in bounding_box))
+        if self.position_count % self.trajectory_stride == 0:
+            self.trajectory.append(self.last_position)
+            if len(self.trajectory) > self.max_trajectory_points:  # Kept positions stay evenly spaced
+                self.trajectory = self.trajectory[::2]
+                self.trajectory_stride *= 2
+        self.position_count += 1
+
+    def get_trajectory(self):
+        """Kept positions of the track, which always include the first and the last one."""
+        if self.last_position is None or self.trajectory[-1] is self.last_position:
+            return list(self.trajectory)
+        return self.trajectory + [self.last_position]
+
+    def get_confidences(self):
+        """Confidence of every character of the merged lp number, from running scores."""
+        if self.ocr_scores is None or np.sum(self.ocr_length_counts) == 0:
+            return []
+        return LPRuom.get_running_confidences(self.ocr_scores, self.ocr_length_counts, self.min_lp_length).tolist()
+
+    def get_plate_event(self):
+        """Summary of a finished track, which is sent to the main process and yielded by LPRecognition.stream."""
+        return {'source_id': self.source_id, 'lp_number': self.merge_ocr_results(),
+                'confidences': self.get_confidences(), 'first_frame_id': self.first_frame_id,
+                'last_frame_id': self.last_frame_id, 'trajectory': self.get_trajectory(),
+                'n_ocr_outputs': self.n_ocr_outputs + len(self.ocr_outputs), 'n_skipped_crops': self.skipped_crop_count,
+                'best_crop': self.best_crop, 'best_crop_quality': self.best_crop_quality}
+
+    def needs_ocr(self):
+        """OCR can be skipped for trackers whose reading has already converged."""
+        return not self.converged
 
     def merge_ocr_results(self):
-        lp_length = self._get_lp_length()  # Get most probable length of lp
-        # Create a DF to gather pseudo probabilities of characters appearing at certain positions in lp
-        number_range = np.arange(48, 58)  # 0 - 9
-        letter_range = np.arange(65, 91)  # A - Z
-        char_range = np.concatenate((number_range, letter_range))
-        chars = [chr(char_ascii) for char_ascii in char_range]
-        character_prob = pd.DataFrame(index=chars,
-                                      columns=np.arange(lp_length),
-                                      data=np.zeros((char_range.size, lp_length)))
-        # Calculate pseudo probabilities for characters
-        for ocr_output in self.ocr_outputs:
-            ocr_len = len(ocr_output)
-            for i, character in enumerate(ocr_output):
-                if 0 <= i - 2 < lp_length:
-                    character_prob.loc[character, i - 2] += 0.05 / (np.abs(lp_length - ocr_len) + 1)
-                if 0 <= i - 1 < lp_length:
-                    character_prob.loc[character, i - 1] += 0.1 / (np.abs(lp_length - ocr_len) + 1)
-                if i < lp_length:
-                    character_prob.loc[character, i] += 0.7 / (np.abs(lp_length - ocr_len) + 1)
-                if i + 1 < lp_length:
-                    character_prob.loc[character, i + 1] += 0.1 / (np.abs(lp_length - ocr_len) + 1)
-                if i + 2 < lp_length:
-                    character_prob.loc[character, i + 2] += 0.05 / (np.abs(lp_length - ocr_len) + 1)
-        # Get most 'probable' lp number
-        lp_number = ''.join([c for c in character_prob.idxmax()])
-        return lp_number
-    
-    def _get_lp_length(self):
-        lp_lengths = np.array([len(ocr_output) for ocr_output in self.ocr_outputs])
-        length_counts = np.zeros(self.max_lp_length - self.min_lp_length + 1)
-        for length in range(self.min_lp_length, self.max_lp_length + 1):
-            length_counts[length - self.min_lp_length] = np.where(lp_lengths == length)[0].size
-        return np.argmax(length_counts) + self.min_lp_length
\ No newline at end of file
+        """Get most probable lp number by checking at what positions what characters appeared most frequently."""
+        if self.metrics is None:
+            return self._merge_ocr_results()
+        with self.metrics.time('merge_ocr_results'):
+            return self._merge_ocr_results()
+
+    def _merge_ocr_results(self):
+        if self.ocr_scores is not None:
+            return LPRuom.get_running_lp_number(self.ocr_scores, self.ocr_length_counts, self.min_lp_length)[0]
+        return LPRuom.merge_ocr_outputs(self.ocr_outputs, self.min_lp_length, self.max_lp_length)
+
+    @staticmethod
+    def merge_trackers_ocr_results(trackers):
+        """Merge OCR results of many finished trackers. Running scores of all trackers which have them are merged in
+        one call. All trackers must share lp length bounds."""
+        lp_numbers = [None if tracker.ocr_scores is not None else tracker._merge_ocr_results() for tracker in trackers]
+        scored = [tracker for tracker in trackers if tracker.ocr_scores is not None]
+        if len(scored) > 0:
+            merged = iter(LPRuom.get_running_lp_numbers(np.stack([tracker.ocr_scores for tracker in scored]),
+                                                        np.stack([tracker.ocr_length_counts for tracker in scored]),
+                                                        trackers[0].min_lp_length))
+            lp_numbers = [next(merged) if lp_number is None else lp_number for lp_number in lp_numbers]
+        return lp_numbers
@@ -0,0 +1,47 @@
+import numpy as np
+
+
+# Places new trackers on tracker processes by estimated cost instead of tracker count. Tracker update and OCR time grows
+# with the area of the track window, so the cost of a tracker is estimated by its window's area. Tracker processes
+# report only the number of trackers they run, so trackers that finished are assumed to have had the mean cost of
+# trackers of their process.
+class LPTrackerScheduler:
+
+    def __init__(self, n_processes, max_trackers_per_process):
+        self.max_trackers_per_process = max_trackers_per_process
+        self.process_costs = np.zeros(n_processes)  # Estimated cost of trackers running on every process
+        self.process_counts = np.zeros(n_processes, dtype=np.int64)  # Number of trackers process_costs are made of
+        self.dropped_count = 0
+
+    @staticmethod
+    def estimate_cost(track_window):
+        return track_window[2] * track_window[3]
+
+    def update_counts(self, tracker_counts):
+        """Fit estimated costs to the current numbers of trackers of processes. Trackers missing from an estimate, e.g.
+        ones created before the scheduler, get the mean cost of all estimated trackers."""
+        counts = np.array(tracker_counts, dtype=np.int64)
+        total_count = np.sum(self.process_counts)
+        mean_cost = np.sum(self.process_costs) / total_count if total_count > 0 else 0.0
+        mean_costs = np.full(len(counts), mean_cost)
+        np.divide(self.process_costs, self.process_counts, out=mean_costs, where=self.process_counts > 0)
+        self.process_costs = mean_costs * counts
+        self.process_counts = counts
+
+    def assign(self, track_windows, tracker_counts):
+        """Get indexes of processes chosen for new track windows, None for windows that were dropped because every
+        process already has max_trackers_per_process trackers. tracker_counts are the current numbers of trackers of
+        processes. Windows are placed from the most expensive one on the process with the lowest estimated cost."""
+        self.update_counts(tracker_counts)
+        window_costs = [self.estimate_cost(track_window) for track_window in track_windows]
+        assignments = [None] * len(track_windows)
+        for i in sorted(range(len(track_windows)), key=lambda i: -window_costs[i]):
+            available = self.process_counts < self.max_trackers_per_process
+            if not np.any(available):
+                self.dropped_count += 1
+                continue
+            process_idx = int(np.argmin(np.where(available, self.process_costs, np.inf)))
+            assignments[i] = process_idx
+            self.process_counts[process_idx] += 1
+            self.process_costs[process_idx] += window_costs[i]
+        return assignments
@@ -0,0 +1,128 @@
+from collections import deque
+from threading import Condition, Thread
+import time
+import numpy as np
+import cv2
+
+POLICIES = ('lossless', 'drop_oldest', 'skip')
+
+
+# Video reader decoding frames ahead on a background thread into a bounded buffer of preallocated frames, so decoding
+# does not add to the time of the main loop. It can be used in place of cv2.VideoCapture.
+# Policies for a full buffer:
+# - lossless: decoding waits for free space, for offline files,
+# - drop_oldest: the oldest decoded frame is dropped, so a live source never lags behind,
+# - skip: new frames are only grabbed, without retrieving them, which is cheaper than dropping decoded frames.
+# Independently of the policy, only every frame_stride-th frame is retrieved, other ones are only grabbed.
+class LPVideoReader:
+
+    def __init__(self, source, policy='lossless', n_slots=8, frame_stride=1):
+        if policy not in POLICIES:
+            raise ValueError('Unknown frame buffer policy: ' + policy)
+        self.cap = cv2.VideoCapture(source)
+        self.policy = policy
+        self.frame_stride = frame_stride
+        self.frames = [None] * n_slots  # Preallocated on first use of a slot, decoder writes into them in place
+        self.free_slots = list(range(n_slots))
+        self.decoded_slots = deque()  # (slot, timestamp in ms, frame position) in decoding order
+        self.condition = Condition()
+        self.ended = False
+        self.stopped = False
+        self.last_timestamp_ms = 0.0
+        self.last_position = 0.0
+        self.decoded_count = 0
+        self.dropped_count = 0
+        self.skipped_count = 0
+        self.start_time = time.monotonic()
+        self.thread = Thread(target=self._decode_frames, daemon=True)
+        if self.cap.isOpened():
+            self.thread.start()
+        else:
+            self.ended = True
+
+    @property
+    def decode_fps(self):
+        return self.decoded_count / max(time.monotonic() - self.start_time, 1e-9)
+
+    def isOpened(self):
+        with self.condition:
+            return not self.ended or len(self.decoded_slots) > 0
+
+    def read(self, timeout=None, out=None):
+        """Get the oldest decoded frame as (True, frame) or (False, None) once the source has ended. Returned frame
+        is a copy, slot of the buffer is reused right away. Frame is copied into out if it has the same shape and
+        type, so no memory is allocated."""
+        with self.condition:
+            while len(self.decoded_slots) == 0 and not self.ended:
+                if not self.condition.wait(timeout):
+                    return False, None
+            if len(self.decoded_slots) == 0:
+                return False, None
+            slot, self.last_timestamp_ms, self.last_position = self.decoded_slots.popleft()
+        frame = self.frames[slot]  # Slot is neither free nor decoded, so decoder does not touch it
+        if out is not None and out.shape == frame.shape and out.dtype == frame.dtype:
+            np.copyto(out, frame)
+            frame = out
+        else:
+            frame = frame.copy()
+        with self.condition:
+            self.free_slots.append(slot)
+            self.condition.notify_all()
+        return True, frame
+
+    def get(self, prop_id):
+        """Timestamp and position are those of the last frame returned by read, other properties are source's."""
+        if prop_id == cv2.CAP_PROP_POS_MSEC:
+            return self.last_timestamp_ms
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            return self.last_position
+        return self.cap.get(prop_id)
+
+    def get_stats(self):
+        return {'decode_fps': self.decode_fps, 'decoded': self.decoded_count, 'dropped': self.dropped_count,
+                'skipped': self.skipped_count, 'buffered': len(self.decoded_slots)}
+
+    def release(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.cap.release()
+
+    def _decode_frames(self):
+        frame_idx = -1
+        while True:
+            with self.condition:
+                # With drop_oldest decoding waits only while the only slots are held by read, which copies them
+                while len(self.free_slots) == 0 and not self.stopped and (
+                        self.policy == 'lossless' or (self.policy == 'drop_oldest' and len(self.decoded_slots) == 0)):
+                    self.condition.wait()
+                if self.stopped:
+                    break
+            if not self.cap.grab():
+                break
+            frame_idx += 1
+            slot = None
+            if frame_idx % self.frame_stride == 0:
+                with self.condition:  # Oldest frame is dropped only once there is a new one
+                    if len(self.free_slots) == 0 and self.policy == 'drop_oldest' and len(self.decoded_slots) > 0:
+                        self.free_slots.append(self.decoded_slots.popleft()[0])
+                        self.dropped_count += 1
+                    if len(self.free_slots) > 0:
+                        slot = self.free_slots.pop()
+            if slot is None:  # Frame is skipped without retrieving it
+                self.skipped_count += 1
+                continue
+            ret, frame = self.cap.retrieve(self.frames[slot])
+            if not ret:
+                break
+            self.frames[slot] = frame  # Same array, unless frame size has changed
+            with self.condition:
+                self.decoded_slots.append((slot, self.cap.get(cv2.CAP_PROP_POS_MSEC),
+                                           self.cap.get(cv2.CAP_PROP_POS_FRAMES)))
+                self.decoded_count += 1
+                self.condition.notify_all()
+        with self.condition:
+            self.ended = True
+            self.condition.notify_all()
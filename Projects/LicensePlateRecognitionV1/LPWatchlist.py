@@ -0,0 +1,98 @@
+from collections import defaultdict
+from threading import Thread
+import numpy as np
+import LPRUtil.PlateMatch as LPRupm
+
+
+# Fuzzy matching of lp numbers against a watchlist of plates, e.g. a hotlist of stolen cars. Distance of plates is
+# an edit distance in which substitutions of characters OCR confuses (0/O, 0/D, 1/I, 2/Z, 5/S, 7/Z, 8/B) cost less.
+# Index keeps hashes of all variants of normalized plates with up to max_distance characters deleted. A plate within
+# distance k of a query shares a variant with at most k deletions with it, so only plates sharing a variant hash are
+# checked with the exact distance.
+class LPWatchlist:
+
+    def __init__(self, lp_numbers=(), max_distance=1.0):
+        self.max_distance = max_distance  # Largest k of queries, index size grows quickly with it
+        self.index = _WatchlistIndex([], max_distance)
+        self.reload_thread = None
+        self.load(lp_numbers)
+
+    def __len__(self):
+        return len(self.index.lp_numbers)
+
+    def load(self, lp_numbers):
+        """Build index of new watchlist and replace the old one. Queries running in other threads use the old index
+        until the new one is ready, so they never wait for it."""
+        self.index = _WatchlistIndex(lp_numbers, self.max_distance)
+
+    def load_file(self, path):
+        """Load watchlist from a text file with one plate per line. Text after the first comma is ignored."""
+        with open(path) as f:
+            self.load([line.split(',')[0].strip() for line in f if len(line.strip()) > 0])
+
+    def reload_async(self, path):
+        """Load watchlist file in a background thread, recognition keeps matching plates against the old list."""
+        self.reload_thread = Thread(target=self.load_file, args=(path,), daemon=True)
+        self.reload_thread.start()
+        return self.reload_thread
+
+    def query(self, lp_number, k=1.0, limit=None):
+        """Get (watchlist plate, distance) of plates within distance k of lp_number, closest first."""
+        return self.query_batch([lp_number], k, limit)[0]
+
+    def query_batch(self, lp_numbers, k=1.0, limit=None):
+        """Query many lp numbers at once, e.g. results of all tracks finished in an update cycle. Returns a list of
+        query results in the same order as lp_numbers."""
+        if k > self.max_distance:
+            raise ValueError('Distance k=%s is above max_distance=%s of the index' % (k, self.max_distance))
+        index = self.index  # The same index is used for the whole batch, even if a new one is loaded meanwhile
+        return index.query_batch(lp_numbers, k, limit)
+
+
+class _WatchlistIndex:
+
+    def __init__(self, lp_numbers, max_distance):
+        self.lp_numbers = sorted(set(lp_number.upper() for lp_number in lp_numbers))
+        self.max_deletions = int(np.floor(max_distance))
+        # Distance of normalized plates is at most their distance, so deletions are counted on normalized plates
+        normalized = [LPRupm.normalize_lp_number(lp_number) for lp_number in self.lp_numbers]
+        hashes, ids = get_variant_hashes(normalized, self.max_deletions)
+        order = np.argsort(hashes, kind='stable')
+        self.hashes, self.ids = hashes[order], ids[order]
+
+    def query_batch(self, lp_numbers, k, limit):
+        max_deletions = int(np.floor(k))
+        normalized = [LPRupm.normalize_lp_number(lp_number) for lp_number in lp_numbers]
+        query_hashes, query_idx = get_variant_hashes(normalized, max_deletions)
+        starts = np.searchsorted(self.hashes, query_hashes, side='left')
+        ends = np.searchsorted(self.hashes, query_hashes, side='right')
+        candidates = defaultdict(set)
+        for i, start, end in zip(query_idx[ends > starts], starts[ends > starts], ends[ends > starts]):
+            candidates[i].update(self.ids[start:end].tolist())
+        results = []
+        for i, lp_number in enumerate(lp_numbers):
+            lp_number = lp_number.upper()
+            matches = []
+            for candidate_id in candidates.get(i, ()):
+                candidate = self.lp_numbers[candidate_id]
+                distance = LPRupm.get_lp_distance(lp_number, candidate, k)
+                if distance <= k:
+                    matches.append((candidate, distance))
+            matches.sort(key=lambda match: (match[1], match[0]))
+            results.append(matches if limit is None else matches[:limit])
+        return results
+
+
+def get_variant_hashes(lp_numbers, max_deletions):
+    """Hashes of deletion variants of all lp numbers and index of the lp number of every hash."""
+    by_length = defaultdict(list)
+    for i, lp_number in enumerate(lp_numbers):
+        by_length[len(lp_number)].append(i)
+    hashes, ids = [np.zeros(0, dtype=np.uint64)], [np.zeros(0, dtype=np.int64)]
+    for length, idx in by_length.items():  # Plates of the same length are processed together as a matrix of codes
+        encoded = ''.join(lp_numbers[i] for i in idx).encode('ascii', errors='replace')
+        codes = np.frombuffer(encoded, dtype=np.uint8).reshape((len(idx), length))
+        variant_hashes = LPRupm.get_deletion_hashes(codes, max_deletions)
+        hashes.append(variant_hashes.ravel())
+        ids.append(np.repeat(np.array(idx, dtype=np.int64), variant_hashes.shape[1]))
+    return np.concatenate(hashes), np.concatenate(ids)
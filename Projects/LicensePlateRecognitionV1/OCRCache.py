@@ -0,0 +1,52 @@
+from collections import OrderedDict
+import time
+
+
+# LRU cache of OCR results keyed by perceptual hashes of license plate images. Images whose hashes differ by at most
+# max_distance bits are treated as duplicates, so a plate that barely changes between frames is read only once.
+class OCRCache:
+
+    def __init__(self, max_size=256, max_distance=4, ttl=2.0):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.ttl = ttl  # Seconds after which a result is evicted, even if it keeps being used
+        self.entries = OrderedDict()  # Image hash -> (lp number, time of adding), least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image_hash):
+        """Get cached lp number of an image with similar hash or None."""
+        min_time = time.monotonic() - self.ttl
+        self._evict_expired(min_time)
+        match_hash = self._find_similar(image_hash)
+        if match_hash is not None and self.entries[match_hash][1] < min_time:  # Recently used, but expired
+            del self.entries[match_hash]
+            match_hash = None
+        if match_hash is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(match_hash)
+        return self.entries[match_hash][0]
+
+    def _find_similar(self, image_hash):
+        """Hash of the entry closest to image_hash within max_distance bits or None."""
+        if image_hash in self.entries:
+            return image_hash
+        match_hash, match_distance = None, self.max_distance + 1
+        for entry_hash in self.entries:
+            distance = (entry_hash ^ image_hash).bit_count()
+            if distance < match_distance:
+                match_hash, match_distance = entry_hash, distance
+        return match_hash
+
+    def put(self, image_hash, lp_number):
+        self.entries[image_hash] = (lp_number, time.monotonic())
+        self.entries.move_to_end(image_hash)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def _evict_expired(self, min_time):
+        # Expired entries are removed only from the least recently used end, which keeps eviction cheap
+        while len(self.entries) > 0 and next(iter(self.entries.values()))[1] < min_time:
+            self.entries.popitem(last=False)
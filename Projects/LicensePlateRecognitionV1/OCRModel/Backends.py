@@ -0,0 +1,47 @@
+from importlib import import_module
+
+# OCR backends by name: module and class of the model and libraries it imports when loaded. Modules are imported only
+# when a backend is loaded, so processes that do not run OCR (e.g. detection processes) never import OCR libraries.
+OCR_BACKENDS = {
+    'none': ('OCRModel.OCRModel', 'OCRModel', ()),  # Reads nothing, e.g. for detection only
+    'easyocr': ('OCRModel.EasyOCR', 'EasyOCR', ('torch', 'easyocr')),
+    'tesseract': ('OCRModel.PyTesseract', 'PyTesseract', ('pandas', 'pytesseract')),
+}
+
+_loaded_models = {}  # Models loaded by this process, by backend
+
+
+def get_ocr_model_class(backend):
+    """Get model class of a backend name. A model class can be passed instead of a name and is returned as it is."""
+    if not isinstance(backend, str):
+        return backend
+    if backend not in OCR_BACKENDS:
+        raise ValueError('Unknown OCR backend: ' + backend)
+    module_name, class_name, _ = OCR_BACKENDS[backend]
+    return getattr(import_module(module_name), class_name)
+
+
+def get_preload_modules(backends):
+    """Modules of backends and their libraries, which can be imported once by a forkserver, see LPRecognition."""
+    modules = []
+    for backend in backends:
+        if isinstance(backend, str):
+            module_name, _, libraries = OCR_BACKENDS[backend]
+            modules.extend((module_name,) + libraries)
+        else:
+            modules.append(backend.__module__)
+    return modules
+
+
+def load_ocr_model(backend):
+    """Get model of a backend, loaded only once in a process. A process forked from one which has already loaded
+    the model reuses it."""
+    model = _loaded_models.get(backend)
+    if model is None:
+        model = _loaded_models[backend] = get_ocr_model_class(backend)()
+    return model
+
+
+def register_ocr_backend(name, module_name, class_name, libraries=()):
+    """Add or replace a backend. Its module is imported when the backend is loaded for the first time."""
+    OCR_BACKENDS[name] = (module_name, class_name, tuple(libraries))
@@ -1,18 +1,37 @@
-import OCRModel
-import easyocr
+import numpy as np
+import LPRUtil.LPImage as LPRui
+from OCRModel.OCRModel import OCRModel
+
+ALLOWLIST = '0123456789QWERTYUIOPASDFGHJKLZXCVBNM'
 
 
 class EasyOCR(OCRModel):
     def __init__(self):
         super().__init__()
+        import easyocr  # Imports torch, only processes which load the model pay for it
         self.model = easyocr.Reader(['en'])
 
     def run(self, image):
         """Input image should be a binary image containing only license plate
         characters with adequate margin and border. Characters should be black and background white."""
-        ocr_result = self.model.readtext(image, allowlist='0123456789QWERTYUIOPASDFGHJKLZXCVBNM')
+        ocr_result = self.model.readtext(image, allowlist=ALLOWLIST)
         if len(ocr_result) > 0:
             text = ocr_result[0][1]
         else:
             text = ''
         return text
+
+    def run_batch(self, images):
+        """Input images should be prepared the same way as for run. Images are stacked into one and every image's
+        region is passed to the recognizer as a text line, so text detection is skipped and all images are
+        recognized in a single batch."""
+        if len(images) == 0:
+            return []
+        stacked_image, offsets = LPRui.stack_images(images)
+        horizontal_list = [[0, image.shape[1], y, y + image.shape[0]] for image, y in zip(images, offsets)]
+        ocr_result = self.model.recognize(stacked_image, horizontal_list=horizontal_list, free_list=[],
+                                          batch_size=len(images), allowlist=ALLOWLIST)
+        texts = [''] * len(images)
+        for box, text, _ in ocr_result:  # Map results back to images by top edge of their region
+            texts[np.searchsorted(offsets, box[0][1], side='right') - 1] = text
+        return texts
@@ -5,3 +5,8 @@ class OCRModel:
 
     def run(self, image):
         return ''
+
+    def run_batch(self, images):
+        """Run OCR on many images, returns results in the same order as images. Models that can process many images
+        in one call should override this."""
+        return [self.run(image) for image in images]
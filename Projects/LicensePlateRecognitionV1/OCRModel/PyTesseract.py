@@ -1,18 +1,49 @@
-import OCRModel
-import pytesseract
+import numpy as np
+import LPRUtil.LPImage as LPRui
+from OCRModel.OCRModel import OCRModel
+
+CONFIG = '-c tessedit_char_whitelist=0123456789QWERTYUIOPASDFGHJKLZXCVBNM -c load_system_dawg=false ' \
+         '-c load_freq_dawg=false'
+# Words are read as strings, otherwise pandas parses plates with only digits as numbers (e.g. '0123' as 123.0) and
+# empty words or plates like 'NAN' as NaN
+PANDAS_CONFIG = {'dtype': {'text': str}, 'keep_default_na': False}
 
 
 class PyTesseract(OCRModel):
-    def __init__(self):
+    def __init__(self, batch_gap=20, exact_batch=True):
         super().__init__()
+        import pytesseract  # Data frame output imports pandas, only processes which load the model pay for it
+        self.pytesseract = pytesseract
+        self.batch_gap = batch_gap  # Background pixels between images stacked for batch OCR
+        # Batches are read one image at a time with run by default, stacked batches give different results
+        self.exact_batch = exact_batch
 
     def run(self, image):
         """Input image should be a binary image containing only license plate
         characters with adequate margin and border. Characters should be black and background white."""
-        result = pytesseract.image_to_data(image, output_type='data.frame', lang='eng',
-                                    config='--psm 8 -c tessedit_char_whitelist=0123456789QWERTYUIOPASDFGHJKLZXCVBNM -c '
-                                           'load_system_dawg=false -c load_freq_dawg=false')
+        result = self.pytesseract.image_to_data(image, output_type='data.frame', lang='eng', config='--psm 8 ' + CONFIG,
+                                                pandas_config=PANDAS_CONFIG)
         if result["conf"].iloc[-1] == 0:  # Based on result analysis best results had confidence equal 0
-            return str(result["text"].iloc[-1])
+            return result["text"].iloc[-1]
         else:
             return ''
+
+    def run_batch(self, images):
+        """Input images should be prepared the same way as for run. Images are stacked into one page, which is read
+        by a single Tesseract call as a block of text lines (--psm 6), and found words are mapped back to images by
+        their vertical position. Results are not the same as run's: run reads a single word (--psm 8) and keeps it
+        only if its confidence is 0, which does not hold for words of a block, so every word found is kept. Stacked
+        pages are read only with exact_batch=False, by default images are read one at a time with run."""
+        if self.exact_batch:
+            return super().run_batch(images)
+        if len(images) == 0:
+            return []
+        page, offsets = LPRui.stack_images(images, gap=self.batch_gap, bg_colour=255)
+        result = self.pytesseract.image_to_data(page, output_type='data.frame', lang='eng', config='--psm 6 ' + CONFIG,
+                                                pandas_config=PANDAS_CONFIG)
+        result = result[(result["conf"] >= 0) & (result["text"].str.strip() != '')]  # Keep only recognized words
+        texts = [''] * len(images)
+        word_centers = result["top"].to_numpy() + result["height"].to_numpy() / 2
+        for i, text in zip(np.searchsorted(offsets, word_centers, side='right') - 1, result["text"]):
+            texts[i] += text
+        return texts
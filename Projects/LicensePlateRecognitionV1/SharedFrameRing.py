@@ -0,0 +1,110 @@
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+
+# Fixed ring of preallocated frame slots in shared memory. Frames are written once by the main process, subprocesses
+# map the slots as numpy views, so only slot indexes and frame ids need to be sent through queues.
+class SharedFrameRing:
+
+    def __init__(self, n_slots, frame_shape, dtype=np.uint8, name=None):
+        self.n_slots = n_slots
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.is_owner = name is None  # Only the process that created the ring can free shared memory
+        ids_size = n_slots * np.dtype(np.int64).itemsize
+        frames_size = n_slots * int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=self.is_owner, size=ids_size + frames_size)
+        # Id of a frame stored in every slot, -1 means that a slot is empty or being written to
+        self.frame_ids = np.ndarray((n_slots,), dtype=np.int64, buffer=self.shm.buf)
+        self.frames = np.ndarray((n_slots,) + self.frame_shape, dtype=self.dtype, buffer=self.shm.buf,
+                                 offset=ids_size)
+        if self.is_owner:
+            self.frame_ids[:] = -1
+        self.next_slot = 0
+
+    @classmethod
+    def attach(cls, spec):
+        """Map a ring created by another process."""
+        n_slots, frame_shape, dtype, name = spec
+        return cls(n_slots, frame_shape, dtype, name)
+
+    @staticmethod
+    def share_resource_tracker():
+        """Has to be called before starting subprocesses that attach to rings. Otherwise every subprocess starts its
+        own resource tracker, which unlinks rings' shared memory when the subprocess exits."""
+        resource_tracker.ensure_running()
+
+    def spec(self):
+        """Picklable description of the ring that allows other processes to attach to it."""
+        return self.n_slots, self.frame_shape, self.dtype.str, self.shm.name
+
+    def fits(self, frame):
+        return frame.shape == self.frame_shape and frame.dtype == self.dtype
+
+    def put(self, frame, frame_id):
+        """Copy frame to the oldest slot. Ring has to have more slots than frames used by subprocesses at once,
+        otherwise readers will find their frames overwritten."""
+        slot = self.next_slot
+        self.frame_ids[slot] = -1
+        np.copyto(self.frames[slot], frame)
+        self.frame_ids[slot] = frame_id
+        self.next_slot = (slot + 1) % self.n_slots
+        return slot
+
+    def get(self, slot, frame_id):
+        """Get a view of a frame in a slot or None if the frame was already overwritten. View must not be modified and
+        the frame can be overwritten while it is used, see is_current."""
+        if not self.is_current(slot, frame_id):
+            return None
+        return self.frames[slot]
+
+    def is_current(self, slot, frame_id):
+        """Check if a slot still holds a frame. put marks a slot as empty before it starts writing, so a frame which is
+        still current after it was used was not overwritten meanwhile, like in a seqlock."""
+        return self.frame_ids[slot] == frame_id
+
+    def task_data(self, frame, frame_id):
+        """Put frame in the ring and get data to send to a subprocess instead of the frame."""
+        return {'frame_ring': self.spec(), 'slot': self.put(frame, frame_id), 'frame_id': frame_id}
+
+    def close(self):
+        # Views have to be released before shared memory can be closed
+        self.frame_ids = None
+        self.frames = None
+        self.shm.close()
+        if self.is_owner:
+            self.shm.unlink()
+
+
+def read_task_frame(task_data, frame_ring=None):
+    """Get a frame sent to a subprocess either directly or as a slot of a shared frame ring. Subprocess attaches to
+    the ring on first use, returned ring should be passed to subsequent calls."""
+    if 'frame_ring' not in task_data:
+        return task_data.get('frame'), frame_ring
+    spec = task_data['frame_ring']
+    if frame_ring is None or frame_ring.spec() != spec:
+        if frame_ring is not None:
+            frame_ring.close()
+        frame_ring = SharedFrameRing.attach(spec)
+    return frame_ring.get(task_data['slot'], task_data['frame_id']), frame_ring
+
+
+def is_task_frame_current(task_data, frame_ring):
+    """Check if a frame read by read_task_frame was not overwritten while it was used. Results computed from an
+    overwritten frame have to be discarded. Frames sent directly are always current."""
+    if 'frame_ring' not in task_data:
+        return True
+    return frame_ring is not None and frame_ring.is_current(task_data['slot'], task_data['frame_id'])
+
+
+def read_source_task_frame(task_data, frame_rings):
+    """Version of read_task_frame for frames of many sources, each of which has its own ring. frame_rings is a dict
+    of rings attached so far by source id, which is updated in place."""
+    source_id = task_data.get('source_id', 0)
+    frame, frame_rings[source_id] = read_task_frame(task_data, frame_rings.get(source_id))
+    return frame
+
+
+def is_source_task_frame_current(task_data, frame_rings):
+    """Version of is_task_frame_current for frames read by read_source_task_frame."""
+    return is_task_frame_current(task_data, frame_rings.get(task_data.get('source_id', 0)))
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modules are imported like the benchmarks import them, project and LPRUtil directories are on the path
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [PROJECT_DIR, os.path.join(PROJECT_DIR, 'LPRUtil'), os.path.join(PROJECT_DIR, 'Benchmarks')]
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = sorted(name[:-3] for name in os.listdir(PROJECT_DIR) if name.endswith('.py'))
+BENCHMARKS_DIR = os.path.join(PROJECT_DIR, 'Benchmarks')
+BENCHMARKS = sorted(name[:-3] for name in os.listdir(BENCHMARKS_DIR) if name.endswith('.py')) \
+    if os.path.isdir(BENCHMARKS_DIR) else []
+
+
+@pytest.mark.parametrize('module', MODULES + ['Benchmarks.' + name for name in BENCHMARKS])
+def test_module_imports(module):
+    """Every module is imported first in a fresh interpreter, so an import cycle fails whichever module starts it."""
+    code = 'import sys; sys.path[:0] = %r; import %s' % ([PROJECT_DIR, os.path.join(PROJECT_DIR, 'LPRUtil')], module)
+    result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
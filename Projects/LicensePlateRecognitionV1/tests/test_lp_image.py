@@ -0,0 +1,63 @@
+import os
+import numpy as np
+import cv2
+import pytest
+import LPRUtil.LPImage as LPRui
+from LPMetrics import LPMetrics
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE_IMAGES_DIR = os.path.join(PROJECT_DIR, '..', '..', 'example_images', 'LPRV1')
+OCR_PARAMS = (44, 3, 8, 4, 6)  # Default parameters of execute_ocr: ih, mh, mw, btb, blr
+LP_IMAGE_NAMES = sorted(name for name in os.listdir(EXAMPLE_IMAGES_DIR) if '_lp' in name)
+
+
+def prepare_lp_for_ocr_reference(lp_image, ih, mh, mw, btb, blr):
+    """prepare_lp_for_ocr before its steps were timed."""
+    lp_image = cv2.cvtColor(lp_image, cv2.COLOR_BGR2GRAY)
+    lp_image = LPRui.rescale_lp_by_height(lp_image, target_h=300)
+    lp_image = cv2.bilateralFilter(lp_image, 5, 255, 255)
+    lp_image = LPRui.level_lp(lp_image, apply_filter=False)
+    lp_image = LPRui.threshold_lp(lp_image)
+    lp_image = LPRui.remove_non_lp_elements(lp_image)
+    lp_image = LPRui.remove_remaining_noise(lp_image)
+    lp_image = LPRui.rescale_lp_by_height(lp_image, ih)
+    lp_image[lp_image < 128] = 0
+    lp_image = LPRui.image_padding(lp_image, (mw, mh), 255)
+    return LPRui.image_padding(lp_image, (btb, blr), 0)
+
+
+@pytest.fixture(scope='module', params=LP_IMAGE_NAMES)
+def lp_image(request):
+    return cv2.imread(os.path.join(EXAMPLE_IMAGES_DIR, request.param))
+
+
+def test_prepare_lp_for_ocr_output(lp_image):
+    ih, mh, mw, btb, blr = OCR_PARAMS
+    prepared = LPRui.prepare_lp_for_ocr(lp_image, *OCR_PARAMS)
+    assert prepared.dtype == np.uint8 and prepared.shape[0] == ih + 2 * mw + 2 * btb
+    assert np.all((prepared == 0) | (prepared >= 128))  # Dark interpolated pixels are black
+    # Black border around a white margin
+    assert np.all(prepared[:btb] == 0) and np.all(prepared[-btb:] == 0)
+    assert np.all(prepared[:, :blr] == 0) and np.all(prepared[:, -blr:] == 0)
+    assert np.all(prepared[btb:btb + mw, blr:-blr] == 255) and np.all(prepared[btb:-btb, blr:blr + mh] == 255)
+    assert np.mean(prepared[btb + mw:-btb - mw, blr + mh:-blr - mh] == 0) > 0.1  # Characters are left
+
+
+def test_prepare_lp_for_ocr_matches_reference(lp_image):
+    expected = prepare_lp_for_ocr_reference(lp_image, *OCR_PARAMS)
+    assert np.array_equal(LPRui.prepare_lp_for_ocr(lp_image, *OCR_PARAMS), expected)
+    # Timing steps does not change the result
+    assert np.array_equal(LPRui.prepare_lp_for_ocr(lp_image, *OCR_PARAMS, metrics=LPMetrics(enabled=True)), expected)
+
+
+def test_prepare_lp_for_ocr_fast_agrees():
+    agreements = []
+    for name in LP_IMAGE_NAMES:
+        lp_image = cv2.imread(os.path.join(EXAMPLE_IMAGES_DIR, name))
+        prepared = LPRui.prepare_lp_for_ocr(lp_image, *OCR_PARAMS)
+        fast_prepared = LPRui.prepare_lp_for_ocr_fast(lp_image, *OCR_PARAMS)
+        assert fast_prepared.shape[0] == prepared.shape[0]
+        fast_prepared = cv2.resize(fast_prepared, (prepared.shape[1], prepared.shape[0]),
+                                   interpolation=cv2.INTER_NEAREST)
+        agreements.append(np.mean((prepared < 128) == (fast_prepared < 128)))
+    assert np.median(agreements) > 0.95
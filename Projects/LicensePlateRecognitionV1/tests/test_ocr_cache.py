@@ -0,0 +1,52 @@
+from queue import Queue
+import numpy as np
+from LPOCRProcess import LPOCRProcess
+from OCRCache import OCRCache
+from OCRModel.OCRModel import OCRModel
+
+
+class CountingOCRModel(OCRModel):
+    def __init__(self, lp_number):
+        super().__init__()
+        self.lp_number = lp_number
+        self.n_images = 0
+
+    def run(self, image):
+        self.n_images += 1
+        return self.lp_number
+
+
+def get_ocr_process(lp_number):
+    ocr_process = LPOCRProcess([Queue()], None, None)
+    ocr_process.ocr_model = CountingOCRModel(lp_number)
+    return ocr_process
+
+
+def get_tasks(cropped_lps):
+    return [{'client_id': 0, 'track_id': 0, 'frame_id': i, 'cropped_lp': cropped_lp, 'quality': 1.0}
+            for i, cropped_lp in enumerate(cropped_lps)]
+
+
+def test_similar_hash_gets_closest_entry():
+    ocr_cache = OCRCache(max_distance=4)
+    ocr_cache.put(0b0000, 'FIRST')
+    ocr_cache.put(0b0111, 'CLOSEST')
+    assert ocr_cache.get(0b1111) == 'CLOSEST'
+    assert ocr_cache.get(0b11111111) is None
+
+
+def test_ocr_process_reads_cached_plates_once():
+    cropped_lp = np.tile(np.arange(0, 250, 5, dtype=np.uint8), (44, 4))
+    ocr_process = get_ocr_process('WX12345')
+    for _ in range(3):
+        ocr_process._send_ocr_results(get_tasks([cropped_lp, cropped_lp.copy()]))
+    assert ocr_process.ocr_model.n_images == 2  # Both copies of the first batch miss the cache
+    assert [ocr_process.qs_to[0].get()['lp_number'] for _ in range(6)] == ['WX12345'] * 6
+
+
+def test_ocr_process_does_not_cache_failed_readings():
+    cropped_lp = np.tile(np.arange(0, 250, 5, dtype=np.uint8), (44, 4))
+    ocr_process = get_ocr_process('')
+    for _ in range(3):
+        ocr_process._send_ocr_results(get_tasks([cropped_lp]))
+    assert ocr_process.ocr_model.n_images == 3
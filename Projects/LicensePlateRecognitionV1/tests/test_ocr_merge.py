@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+import LPRUtil.OCRMerge as LPRuom
+
+MIN_LP_LENGTH, MAX_LP_LENGTH = 4, 8
+
+
+def merge_ocr_outputs_pandas(ocr_outputs, min_lp_length, max_lp_length):
+    """LPTracker.merge_ocr_results before the NumPy merge engine."""
+    pd = pytest.importorskip('pandas')
+    lp_lengths = np.array([len(ocr_output) for ocr_output in ocr_outputs])
+    length_counts = np.zeros(max_lp_length - min_lp_length + 1)
+    for length in range(min_lp_length, max_lp_length + 1):
+        length_counts[length - min_lp_length] = np.where(lp_lengths == length)[0].size
+    lp_length = np.argmax(length_counts) + min_lp_length
+    char_range = np.concatenate((np.arange(48, 58), np.arange(65, 91)))
+    character_prob = pd.DataFrame(index=[chr(char_ascii) for char_ascii in char_range], columns=np.arange(lp_length),
+                                  data=np.zeros((char_range.size, lp_length)))
+    for ocr_output in ocr_outputs:
+        ocr_len = len(ocr_output)
+        for i, character in enumerate(ocr_output):
+            for offset, weight in zip((-2, -1, 0, 1, 2), (0.05, 0.1, 0.7, 0.1, 0.05)):
+                if 0 <= i + offset < lp_length:
+                    character_prob.loc[character, i + offset] += weight / (np.abs(lp_length - ocr_len) + 1)
+    return ''.join([c for c in character_prob.idxmax()])
+
+
+def get_track_ocr_outputs(rng, n_outputs):
+    """Noisy readings of one plate: characters replaced, dropped or added and readings of other lengths."""
+    lp_number = ''.join(rng.choice(list(LPRuom.LP_CHARS), int(rng.integers(MIN_LP_LENGTH, MAX_LP_LENGTH + 1))))
+    ocr_outputs = []
+    for _ in range(n_outputs):
+        chars = list(lp_number)
+        for _ in range(int(rng.integers(0, 3))):
+            i, change = int(rng.integers(0, len(chars))), rng.random()
+            if change < 0.6:
+                chars[i] = rng.choice(list(LPRuom.LP_CHARS))
+            elif change < 0.8 and len(chars) > 1:
+                del chars[i]
+            else:
+                chars.insert(i, rng.choice(list(LPRuom.LP_CHARS)))
+        ocr_outputs.append(''.join(chars))
+    return ocr_outputs
+
+
+def test_merge_matches_pandas_baseline():
+    rng = np.random.default_rng(0)
+    tracks_ocr_outputs = [get_track_ocr_outputs(rng, int(rng.integers(1, 12))) for _ in range(200)]
+    expected = [merge_ocr_outputs_pandas(ocr_outputs, MIN_LP_LENGTH, MAX_LP_LENGTH)
+                for ocr_outputs in tracks_ocr_outputs]
+    assert [LPRuom.merge_ocr_outputs(ocr_outputs, MIN_LP_LENGTH, MAX_LP_LENGTH)
+            for ocr_outputs in tracks_ocr_outputs] == expected
+    assert LPRuom.merge_ocr_outputs_batch(tracks_ocr_outputs, MIN_LP_LENGTH, MAX_LP_LENGTH) == expected
+
+
+def test_running_scores_match_batch_merge():
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        ocr_outputs = get_track_ocr_outputs(rng, int(rng.integers(1, 12)))
+        weights = rng.random(len(ocr_outputs))
+        running_scores, length_counts = LPRuom.init_running_scores(MIN_LP_LENGTH, MAX_LP_LENGTH)
+        for ocr_output, weight in zip(ocr_outputs, weights):
+            LPRuom.add_to_running_scores(running_scores, length_counts, ocr_output, MIN_LP_LENGTH, weight)
+        if np.max(length_counts) == 0:  # No output of valid length, batch merge falls back to min_lp_length
+            continue
+        lp_number, _ = LPRuom.get_running_lp_number(running_scores, length_counts, MIN_LP_LENGTH)
+        assert lp_number == LPRuom.merge_ocr_outputs(ocr_outputs, MIN_LP_LENGTH, MAX_LP_LENGTH, weights)
+
+
+def test_stacked_running_scores_match_single_tracks():
+    rng = np.random.default_rng(2)
+    tracks_scores = [LPRuom.init_running_scores(MIN_LP_LENGTH, MAX_LP_LENGTH) for _ in range(30)]
+    for running_scores, length_counts in tracks_scores:
+        for ocr_output in get_track_ocr_outputs(rng, int(rng.integers(1, 12))):
+            LPRuom.add_to_running_scores(running_scores, length_counts, ocr_output, MIN_LP_LENGTH)
+    expected = [LPRuom.get_running_lp_number(running_scores, length_counts, MIN_LP_LENGTH)[0]
+                for running_scores, length_counts in tracks_scores]
+    assert LPRuom.get_running_lp_numbers(np.stack([running_scores for running_scores, _ in tracks_scores]),
+                                         np.stack([length_counts for _, length_counts in tracks_scores]),
+                                         MIN_LP_LENGTH) == expected
+
+
+def test_merge_rejects_characters_not_on_plates():
+    with pytest.raises(ValueError):
+        LPRuom.merge_ocr_outputs(['AB-123'], MIN_LP_LENGTH, MAX_LP_LENGTH)
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+import LPRUtil.OCR as LPRuo
+import LPRUtil.PlateFormat as LPRupf
+from OCRPostprocessing import get_ocr_outputs, process_ocr_result_regex
+
+
+@pytest.fixture(scope='module')
+def ocr_outputs():
+    return get_ocr_outputs(np.random.default_rng(0), 5000) + ['', 'I1', 'I1I1', ' ', '0', 'I1 ZZ 0O', '\n\n']
+
+
+def test_single_lp_numbers_match_regex(ocr_outputs):
+    assert [LPRuo.process_ocr_result(ocr_output) for ocr_output in ocr_outputs] == \
+           [process_ocr_result_regex(ocr_output) for ocr_output in ocr_outputs]
+
+
+@pytest.mark.parametrize('batch_size', [1, LPRupf.MIN_VECTORIZED_BATCH - 1, LPRupf.MIN_VECTORIZED_BATCH, 500])
+def test_batches_match_regex(ocr_outputs, batch_size):
+    for i in range(0, len(ocr_outputs), batch_size):
+        batch = ocr_outputs[i:i + batch_size]
+        assert LPRuo.process_ocr_results(batch) == [process_ocr_result_regex(ocr_output) for ocr_output in batch]
+
+
+def test_matches_plate_format():
+    compiled_format = LPRupf.get_compiled_plate_format('PL')
+    assert LPRupf.matches_plate_format('WA12345', compiled_format)
+    assert not LPRupf.matches_plate_format('W1', compiled_format)  # Too short
+    assert not LPRupf.matches_plate_format('WA1B345', compiled_format)  # B cannot appear on vehicle's characters
@@ -0,0 +1,30 @@
+import numpy as np
+import cv2
+import pytest
+import LPRUtil.RectArray as LPRura
+
+
+def get_random_rects(rng, n, clustered):
+    """Random rectangles, clustered ones are jittered copies of a few rectangles, so most of them get grouped."""
+    if not clustered:
+        return np.column_stack((rng.integers(0, 500, (n, 2)), rng.integers(5, 120, (n, 2))))
+    centers = np.column_stack((rng.integers(0, 500, (max(n // 4, 1), 2)), rng.integers(20, 120, (max(n // 4, 1), 2))))
+    rects = centers[rng.integers(0, centers.shape[0], n)] + rng.integers(-6, 7, (n, 4))
+    rects[:, 2:] = np.maximum(rects[:, 2:], 1)
+    return rects
+
+
+@pytest.mark.parametrize('clustered', [False, True])
+@pytest.mark.parametrize('group_threshold,eps,copies', [(1, 0.5, 1), (1, 0.5, 2), (2, 0.2, 1), (3, 0.8, 3)])
+def test_group_rects_matches_opencv(clustered, group_threshold, eps, copies):
+    rng = np.random.default_rng(group_threshold * 10 + copies)
+    for n in (0, 1, 2, 7, 40, 150):
+        rects = get_random_rects(rng, n, clustered)
+        expected, _ = cv2.groupRectangles([list(map(int, r)) for r in rects] * copies, group_threshold, eps)
+        grouped = LPRura.group_rects(rects, group_threshold, eps, copies=copies)
+        assert np.array_equal(np.asarray(grouped).reshape(-1, 4), np.asarray(expected).reshape(-1, 4))
+
+
+def test_group_rects_without_threshold_keeps_rects():
+    rects = [(0, 0, 10, 10), (1, 1, 10, 10)]
+    assert np.array_equal(LPRura.group_rects(rects, group_threshold=0), rects)